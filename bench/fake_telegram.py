@@ -0,0 +1,72 @@
+"""Локальная заглушка Telegram Bot API для бенчмарков.
+
+Отвечает на методы, которыми пользуется бот (sendMessage, editMessageText,
+deleteMessage, answerCallbackQuery, getMe), настоящими по форме объектами,
+так что python-telegram-bot проходит весь путь сериализации и HTTP.
+"""
+import json
+import time
+import asyncio
+import itertools
+from collections import Counter
+
+from aiohttp import web
+
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "HR Bot", "username": "hr_bench_bot",
+            "can_join_groups": False, "can_read_all_group_messages": False, "supports_inline_queries": False}
+
+
+class FakeTelegram:
+    """aiohttp-приложение на месте https://api.telegram.org/bot<token>/<method>.
+
+    latency - задержка каждого ответа, с; calls - счетчик вызовов по методам.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self._message_ids = itertools.count(1000)
+        self.app = web.Application()
+        self.app.router.add_post('/bot{token}/{method}', self.handle)
+        self._runner = None
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Запускает сервер; возвращает base_url для ApplicationBuilder().base_url()"""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}/bot"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def handle(self, request):
+        method = request.match_info['method']
+        self.calls[method] += 1
+        if request.content_type == 'application/json':
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method == 'getMe':
+            result = BOT_USER
+        elif method in ('sendMessage', 'editMessageText'):
+            chat_id = int(params.get('chat_id', 0))
+            message_id = int(params['message_id']) if 'message_id' in params else next(self._message_ids)
+            result = {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": BOT_USER,
+                "text": params.get('text', '')
+            }
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result}, dumps=lambda o: json.dumps(o, ensure_ascii=False))
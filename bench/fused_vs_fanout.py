@@ -0,0 +1,122 @@
+"""Сравнение режимов анализа ответа: fanout (запрос на каждого агента) и fused (один запрос).
+
+Меряет латентность хода и расход токенов GigaChat на один ответ кандидата:
+
+    python bench/fused_vs_fanout.py --repeats 3 --json bench_fused.json
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Без кэша ответов: при --repeats > 1 иначе сравнивались бы попадания в кэш, а не вызовы GigaChat
+os.environ["GIGACHAT_CACHE"] = "0"
+
+import bot  # noqa: E402
+from gigachat_transport import CallCounter  # noqa: E402
+
+
+SAMPLES = [
+    {
+        "question": "Чем отличается list от tuple и когда что использовать?",
+        "answer": "list изменяемый, tuple нет. Tuple можно использовать как ключ словаря, "
+                  "он занимает меньше памяти. List - когда коллекция меняется.",
+        "type": "technical",
+    },
+    {
+        "question": "Как вы поступите, если коллега постоянно срывает сроки?",
+        "answer": "Сначала поговорю один на один, выясню причины. Если проблема в нагрузке - "
+                  "предложу перераспределить задачи, если нет - подключу тимлида.",
+        "type": "situational",
+    },
+    {
+        "question": "Напишите функцию, которая находит дубликаты в списке.",
+        "answer": "def dups(xs):\n    seen, out = set(), set()\n    for x in xs:\n"
+                  "        (out if x in seen else seen).add(x)\n    return out",
+        "type": "practical",
+    },
+]
+
+
+class _Context:
+    """Минимальный контекст с тем, что агенты читают из telegram-контекста"""
+
+    def __init__(self, role_name):
+        self.user_data = {"role_name": role_name}
+
+
+async def _fanout_turn(panel, data, context):
+    # Как в handle_message: сначала HR-фидбек, затем параллельные консультации агентов
+    await bot.client.chat_completion([
+        {"role": "system", "content": "Ты - опытный HR-специалист. Дай обратную связь кандидату на его ответ."},
+        {"role": "user", "content": f"Вопрос: {data['question']}\n\nОтвет кандидата: {data['answer']}"}
+    ], max_tokens=200)
+    await asyncio.gather(*(panel._consult_with_deadline(agent, data, context)
+                           for agent in panel.agents_for(data["type"])))
+
+
+async def _fused_turn(panel, data, context):
+    await panel.consult_fused(data, context, with_hr_feedback=True)
+
+
+async def run_mode(name, turn, repeats, role_name):
+    panel = bot.AgentPanel(bot.agent_pool, ["all"])
+    context = _Context(role_name)
+    latencies, calls, prompt_tokens, completion_tokens = [], [], [], []
+
+    for _ in range(repeats):
+        for sample in SAMPLES:
+            data = dict(sample, level=role_name)
+            with CallCounter() as counter:
+                started = time.perf_counter()
+                await turn(panel, data, context)
+                latencies.append(time.perf_counter() - started)
+            calls.append(counter.calls)
+            prompt_tokens.append(counter.prompt_tokens)
+            completion_tokens.append(counter.completion_tokens)
+
+    return {
+        "mode": name,
+        "turns": len(latencies),
+        "latency_p50_s": statistics.median(latencies),
+        "latency_mean_s": statistics.mean(latencies),
+        "latency_max_s": max(latencies),
+        "llm_calls_per_answer": statistics.mean(calls),
+        "prompt_tokens_per_answer": statistics.mean(prompt_tokens),
+        "completion_tokens_per_answer": statistics.mean(completion_tokens),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=1, help="сколько раз прогнать набор ответов")
+    parser.add_argument("--role", default="Middle Python разработчика")
+    parser.add_argument("--json", help="куда сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    await bot.init_services()
+    try:
+        results = [
+            await run_mode("fanout", _fanout_turn, args.repeats, args.role),
+            await run_mode("fused", _fused_turn, args.repeats, args.role),
+        ]
+    finally:
+        await bot.container.shutdown()
+
+    print(f"{'режим':<8} {'p50, с':>8} {'mean, с':>8} {'вызовов':>8} {'prompt tok':>11} {'compl tok':>10}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['latency_p50_s']:>8.2f} {r['latency_mean_s']:>8.2f} "
+              f"{r['llm_calls_per_answer']:>8.1f} {r['prompt_tokens_per_answer']:>11.0f} "
+              f"{r['completion_tokens_per_answer']:>10.0f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
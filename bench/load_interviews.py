@@ -0,0 +1,216 @@
+"""Нагрузочный прогон: K кандидатов одновременно проходят интервью через настоящие хендлеры.
+
+launch_interview, handle_message и finish_interview работают как в бою, но
+Telegram Bot API и GigaChat заменены локальными заглушками (bench/fake_telegram.py,
+bench/mock_gigachat.py), поэтому числа воспроизводимы без сети и ключей:
+
+    python bench/load_interviews.py --candidates 20 --length short --json bench_load.json
+
+Результат - латентность хода p50/p95/p99, интервью в минуту, LLM-вызовы на ответ, пиковый RSS,
+задержка event loop и суммарное время по этапам трассировки.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import resource
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Update  # noqa: E402
+from telegram.ext import Application, CallbackContext  # noqa: E402
+
+from fake_telegram import FakeTelegram  # noqa: E402
+from mock_gigachat import MockGigaChat  # noqa: E402
+from utils.loop_monitor import LoopStallDetector  # noqa: E402
+from utils.tracing import metrics  # noqa: E402
+
+
+BOT_TOKEN = "123456:bench"
+
+ANSWERS = [
+    "Я бы начал с профилирования, чтобы найти узкое место, а потом уже оптимизировал.",
+    "В прошлом проекте мы решали это через очередь задач и идемпотентные обработчики.",
+    "Использую контекстные менеджеры и проверяю граничные случаи тестами.",
+    "Сначала обсудил бы проблему с командой, затем предложил пару вариантов решения.",
+]
+
+
+def _percentile(values, q):
+    """Перцентиль методом ближайшего ранга"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def _peak_rss_mb():
+    # ru_maxrss в Linux - в килобайтах, в macOS - в байтах
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+class Candidate:
+    """Один симулированный кандидат: свой user_id, чат и счетчик update_id"""
+
+    def __init__(self, application, user_id, rng):
+        self.application = application
+        self.user_id = user_id
+        self.rng = rng
+        self.user = {"id": user_id, "is_bot": False, "first_name": f"Candidate{user_id}"}
+        self.chat = {"id": user_id, "type": "private"}
+        self._update_id = user_id * 1000
+
+    def _update(self, payload):
+        self._update_id += 1
+        return Update.de_json(dict(payload, update_id=self._update_id), self.application.bot)
+
+    def callback(self, data):
+        return self._update({"callback_query": {
+            "id": str(self._update_id), "from": self.user, "chat_instance": str(self.user_id), "data": data,
+            "message": {"message_id": 1, "date": int(time.time()), "chat": self.chat, "text": "menu"}
+        }})
+
+    def message(self, text):
+        return self._update({"message": {
+            "message_id": self._update_id, "date": int(time.time()), "chat": self.chat,
+            "from": self.user, "text": text
+        }})
+
+    def context(self, update):
+        return CallbackContext.from_update(update, self.application)
+
+
+async def run_candidate(bot, candidate, role, length, types, think_time, results):
+    update = candidate.callback(f"types_{types}")
+    context = candidate.context(update)
+    context.user_data["selected_role"] = role
+    context.user_data["interview_length"] = length
+
+    started = time.perf_counter()
+    await bot.launch_interview(update, context)
+    results["first_question_s"].append(time.perf_counter() - started)
+
+    session = bot.user_sessions[candidate.user_id]
+    while session.state == "in_progress":
+        if think_time:
+            await asyncio.sleep(candidate.rng.uniform(0, think_time))
+        last = session.current_question + 1 >= session.total_questions
+        update = candidate.message(candidate.rng.choice(ANSWERS))
+        started = time.perf_counter()
+        await bot.handle_message(update, candidate.context(update))
+        # Последний ход включает финальный отчет - считаем его отдельно
+        results["final_report_s" if last else "turn_s"].append(time.perf_counter() - started)
+    results["llm_calls"].extend(session.llm_calls)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--candidates", type=int, default=10, help="сколько кандидатов одновременно")
+    parser.add_argument("--length", default="short", choices=["short", "medium", "long"])
+    parser.add_argument("--types", default="all", choices=["all", "technical", "situational", "practical"])
+    parser.add_argument("--role", default="role_middle_python")
+    parser.add_argument("--think-time", type=float, default=0.0, help="макс. пауза кандидата перед ответом, с")
+    parser.add_argument("--latency-median", type=float, default=0.8, help="медиана задержки GigaChat, с")
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-5xx", type=float, default=0.0)
+    parser.add_argument("--tg-latency", type=float, default=0.02, help="задержка Telegram Bot API, с")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--cache", action="store_true",
+                        help="оставить кэш ответов GigaChat (по умолчанию выключен: одинаковые промпты "
+                             "заглушки иначе отдаются из кэша и занижают вызовы и латентность)")
+    parser.add_argument("--json", help="куда сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    mock = MockGigaChat(latency_median=args.latency_median, latency_sigma=args.latency_sigma,
+                        rate_429=args.rate_429, rate_5xx=args.rate_5xx, seed=args.seed)
+    telegram = FakeTelegram(latency=args.tg_latency)
+    base_url, oauth_url = await mock.start()
+    tg_url = await telegram.start()
+
+    workdir = tempfile.mkdtemp(prefix="bench_load_")
+    # bot читает адреса и пути при импорте, поэтому окружение готовим заранее;
+    # все, что прогон пишет на диск, остается во workdir, а не в репозитории
+    os.environ.update({
+        "GIGACHAT_API_URL": base_url,
+        "GIGACHAT_OAUTH_URL": oauth_url,
+        "GIGACHAT_AUTH_CODE": os.getenv("GIGACHAT_AUTH_CODE", "bench"),
+        "GIGACHAT_CACHE": "1" if args.cache else "0",
+        "QUESTION_POOL_DB": os.path.join(workdir, "question_pool.db"),
+        "SESSION_DB": os.path.join(workdir, "sessions.db"),
+        "INTERVIEW_HISTORY_DB": os.path.join(workdir, "interview_history.db"),
+        "LLM_LEDGER_PATH": os.path.join(workdir, "llm_ledger.jsonl"),
+        "TRACE_DIR": os.path.join(workdir, "traces"),
+    })
+    random.seed(args.seed)
+    import bot
+
+    application = Application.builder().token(BOT_TOKEN).base_url(tg_url).request(bot.TracedRequest()).build()
+    await application.initialize()
+    await bot.init_services()
+
+    # Заглушки крутятся в том же loop, так что блокировки бота видны и по ним
+    watchdog = LoopStallDetector()
+    watchdog.start()
+
+    results = {"first_question_s": [], "turn_s": [], "final_report_s": [], "llm_calls": []}
+    candidates = [Candidate(application, 10_000 + i, random.Random(args.seed + i)) for i in range(args.candidates)]
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(
+            run_candidate(bot, c, args.role, args.length, args.types, args.think_time, results)
+            for c in candidates
+        ))
+        elapsed = time.perf_counter() - started
+    finally:
+        watchdog.stop()
+        await application.shutdown()
+        await bot.container.shutdown()
+        await telegram.stop()
+        await mock.stop()
+
+    turns = results["turn_s"] + results["final_report_s"]
+    report = {
+        "config": vars(args),
+        "candidates": args.candidates,
+        "answers": len(turns),
+        "wall_time_s": elapsed,
+        "interviews_per_min": args.candidates / elapsed * 60,
+        "turn_latency_s": {
+            "p50": _percentile(results["turn_s"], 50),
+            "p95": _percentile(results["turn_s"], 95),
+            "p99": _percentile(results["turn_s"], 99),
+            "max": max(results["turn_s"], default=0.0),
+        },
+        "first_question_p50_s": _percentile(results["first_question_s"], 50),
+        "final_report_p50_s": _percentile(results["final_report_s"], 50),
+        "llm_calls_per_answer": statistics.mean(results["llm_calls"]) if results["llm_calls"] else 0.0,
+        "gigachat_requests": mock.counters["completions"],
+        "gigachat_max_in_flight": mock.counters["max_in_flight"],
+        "telegram_calls": dict(telegram.calls),
+        "peak_rss_mb": _peak_rss_mb(),
+        "event_loop": watchdog.stats(),
+        "stages": metrics.summary(),
+    }
+
+    print(f"👥 {args.candidates} кандидатов, {len(turns)} ответов за {elapsed:.1f} с "
+          f"({report['interviews_per_min']:.1f} интервью/мин)")
+    latency = report["turn_latency_s"]
+    print(f"⏱ ход: p50 {latency['p50']:.2f} с, p95 {latency['p95']:.2f} с, p99 {latency['p99']:.2f} с")
+    print(f"🧠 LLM-вызовов на ответ: {report['llm_calls_per_answer']:.1f}, "
+          f"пиковый RSS: {report['peak_rss_mb']:.0f} МБ")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
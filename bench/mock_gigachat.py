@@ -0,0 +1,288 @@
+"""Локальная заглушка GigaChat: OAuth ngw и /chat/completions с задержками и отказами.
+
+Позволяет гонять бота и бенчмарки без сети и ключей Сбера:
+
+    python bench/mock_gigachat.py --port 8090 --latency-median 0.8 --rate-429 0.05 --seed 1
+
+    GIGACHAT_API_URL=http://127.0.0.1:8090/api/v1 \\
+    GIGACHAT_OAUTH_URL=http://127.0.0.1:8090/api/v2/oauth \\
+    GIGACHAT_AUTH_CODE=mock python bot.py
+
+На промпты агентов отвечает JSON по схеме из самого промпта (ФОРМАТ ОТВЕТА /
+ФОРМАТ СЕКЦИИ / "Верни JSON:"), на генерацию вопросов - вопросами, на остальное - текстом.
+Счетчики запросов и отказов: GET /stats.
+"""
+import re
+import json
+import math
+import time
+import uuid
+import random
+import asyncio
+import argparse
+
+from aiohttp import web
+
+
+PHRASES = [
+    "Кандидат уверенно владеет базовыми концепциями",
+    "Стоит глубже разобрать граничные случаи",
+    "Ответ структурирован и по делу",
+    "Не хватает примеров из реальных проектов",
+    "Хорошо объясняет компромиссы решения",
+    "Рекомендуется изучить профилирование и оптимизацию",
+]
+
+QUESTIONS = [
+    "Как устроен GIL и когда он мешает?",
+    "Чем отличается процесс от потока?",
+    "Как бы вы спроектировали кэш для медленного API?",
+    "Расскажите о случае, когда вы не согласились с решением команды.",
+    "Как найти утечку памяти в долгоживущем сервисе?",
+    "Что такое идемпотентность и зачем она нужна?",
+    "Как вы оцениваете сроки задачи?",
+    "Чем asyncio отличается от многопоточности?",
+]
+
+_FUSED_KEYS = re.compile(r'ВЕРНИ ОДИН JSON-объект[^:]*:\s*(.+)')
+_SECTION = re.compile(r'"(\w+)" - .*?ФОРМАТ СЕКЦИИ:\s*', re.S)
+
+
+def _template_at(text, start):
+    """JSON-шаблон из промпта, начиная с первой '{' после start; диапазоны 1-10 и X - числа"""
+    begin = text.find('{', start)
+    if begin == -1:
+        return None
+    depth = 0
+    for i in range(begin, len(text)):
+        if text[i] == '{':
+            depth += 1
+        elif text[i] == '}':
+            depth -= 1
+            if depth == 0:
+                raw = text[begin:i + 1].replace('{{', '{').replace('}}', '}')
+                raw = re.sub(r':\s*1-10\b', ': 10', raw)
+                raw = re.sub(r':\s*X\b', ': 10', raw)
+                try:
+                    return json.loads(raw)
+                except ValueError:
+                    return None
+    return None
+
+
+class MockGigaChat:
+    """aiohttp-приложение, изображающее два эндпоинта GigaChat.
+
+    Задержка ответа - логнормальная с медианой latency_median и разбросом latency_sigma;
+    rate_401/rate_429/rate_5xx - доли запросов, на которые отвечаем ошибкой;
+    токены живут token_ttl секунд, после чего дают 401.
+    """
+
+    def __init__(self, latency_median=0.8, latency_sigma=0.5, oauth_latency=0.05,
+                 rate_401=0.0, rate_429=0.0, rate_5xx=0.0, retry_after=1,
+                 token_ttl=1800, stream_chunk_delay=0.05, seed=None):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.oauth_latency = oauth_latency
+        self.rate_401 = rate_401
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.retry_after = retry_after
+        self.token_ttl = token_ttl
+        self.stream_chunk_delay = stream_chunk_delay
+        self.random = random.Random(seed)
+        self.tokens = {}
+        self.counters = {"oauth": 0, "completions": 0, "streams": 0, "in_flight": 0, "max_in_flight": 0,
+                         "401": 0, "429": 0, "5xx": 0}
+
+        self.app = web.Application()
+        self.app.router.add_post('/api/v2/oauth', self.oauth)
+        self.app.router.add_post('/api/v1/chat/completions', self.chat_completions)
+        self.app.router.add_get('/stats', self.stats)
+        self._runner = None
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Запускает сервер; возвращает (base_url, oauth_url) для GigaChatTransport"""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}/api/v1", f"http://{host}:{port}/api/v2/oauth"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _latency(self):
+        if self.latency_median <= 0:
+            return 0.0
+        return self.random.lognormvariate(math.log(self.latency_median), self.latency_sigma)
+
+    async def oauth(self, request):
+        self.counters["oauth"] += 1
+        if not request.headers.get('Authorization', '').startswith('Basic '):
+            return web.json_response({"code": 6, "message": "credentials doesn't match db data"}, status=401)
+        await asyncio.sleep(self.oauth_latency)
+        token = uuid.uuid4().hex
+        expires_at = time.time() + self.token_ttl
+        self.tokens[token] = expires_at
+        return web.json_response({"access_token": token, "expires_at": int(expires_at * 1000)})
+
+    def _injected_error(self, request):
+        """Ответ-ошибка, если токен недействителен или так выпало по заданным долям"""
+        token = request.headers.get('Authorization', '')[len('Bearer '):]
+        expires_at = self.tokens.get(token)
+        roll = self.random.random()
+        if expires_at is None or time.time() >= expires_at or roll < self.rate_401:
+            self.tokens.pop(token, None)
+            self.counters["401"] += 1
+            return web.json_response({"status": 401, "message": "Token has expired"}, status=401)
+        roll -= self.rate_401
+        if roll < self.rate_429:
+            self.counters["429"] += 1
+            return web.json_response({"status": 429, "message": "Too Many Requests"}, status=429,
+                                     headers={"Retry-After": str(self.retry_after)})
+        roll -= self.rate_429
+        if roll < self.rate_5xx:
+            self.counters["5xx"] += 1
+            status = self.random.choice([500, 502, 503])
+            return web.json_response({"status": status, "message": "Internal Server Error"}, status=status)
+        return None
+
+    async def chat_completions(self, request):
+        self.counters["completions"] += 1
+        self.counters["in_flight"] += 1
+        self.counters["max_in_flight"] = max(self.counters["max_in_flight"], self.counters["in_flight"])
+        try:
+            body = await request.json()
+            await asyncio.sleep(self._latency())
+            error = self._injected_error(request)
+            if error is not None:
+                return error
+
+            messages = body.get('messages', [])
+            content = self.reply(messages)
+            usage = {
+                "prompt_tokens": sum(len(m.get('content', '')) for m in messages) // 4,
+                "completion_tokens": len(content) // 4,
+            }
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+            if body.get('stream'):
+                return await self._stream(request, body, content, usage)
+            return web.json_response({
+                "choices": [{"message": {"role": "assistant", "content": content},
+                             "index": 0, "finish_reason": "stop"}],
+                "created": int(time.time()),
+                "model": body.get('model', 'GigaChat'),
+                "object": "chat.completion",
+                "usage": usage
+            })
+        finally:
+            self.counters["in_flight"] -= 1
+
+    async def _stream(self, request, body, content, usage):
+        self.counters["streams"] += 1
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        words = content.split(' ')
+        for i, word in enumerate(words):
+            delta = word if i == 0 else ' ' + word
+            chunk = {"choices": [{"delta": {"content": delta}, "index": 0}], "model": body.get('model')}
+            if i == len(words) - 1:
+                chunk["usage"] = usage
+            await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+            await asyncio.sleep(self.stream_chunk_delay)
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def stats(self, request):
+        return web.json_response(self.counters)
+
+    def reply(self, messages):
+        """Правдоподобный ответ по виду промпта"""
+        prompt = "\n".join(m.get('content', '') for m in messages)
+
+        fused = _FUSED_KEYS.search(prompt)
+        if fused:
+            keys = re.findall(r'"(\w+)"', fused.group(1))
+            sections = {m.group(1): _template_at(prompt, m.end()) for m in _SECTION.finditer(prompt)}
+            result = {}
+            for key in keys:
+                if key == "hr_feedback":
+                    result[key] = self._sentences(3)
+                else:
+                    result[key] = self._fill(sections.get(key) or {})
+            return json.dumps(result, ensure_ascii=False)
+
+        for marker in ("ФОРМАТ ОТВЕТА (JSON):", "Верни JSON:"):
+            position = prompt.find(marker)
+            if position != -1:
+                template = _template_at(prompt, position)
+                if template is not None:
+                    return json.dumps(self._fill(template), ensure_ascii=False)
+
+        if re.search(r'(Сгенерируй|Создай) 5', prompt):
+            questions = self.random.sample(QUESTIONS, 5)
+            return "\n".join(f"{i}. {q}" for i, q in enumerate(questions, 1))
+        if "Сгенерируй" in prompt:
+            return self.random.choice(QUESTIONS)
+        return self._sentences(4)
+
+    def _sentences(self, count):
+        return ". ".join(self.random.sample(PHRASES, count)) + "."
+
+    def _fill(self, template, key=None):
+        """Заполняет шаблон значениями того же типа"""
+        if isinstance(template, dict):
+            filled = {k: self._fill(v, k) for k, v in template.items()}
+            scores = filled.get("scores")
+            if isinstance(scores, dict) and "average_score" in filled and scores:
+                filled["average_score"] = f"{sum(scores.values()) / len(scores):.1f}"
+            return filled
+        if isinstance(template, list):
+            return [self.random.choice(PHRASES) for _ in range(self.random.randint(1, 3))]
+        if isinstance(template, bool):
+            return template
+        if isinstance(template, float):
+            return round(self.random.uniform(0.6, 0.95), 2)
+        if isinstance(template, int):
+            return self.random.randint(4, 10)
+        if isinstance(template, str):
+            if "отлично/хорошо" in template:
+                return self.random.choice(["отлично", "хорошо", "средне"])
+            return self.random.choice(PHRASES)
+        return template
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-median", type=float, default=0.8, help="медиана задержки ответа, с")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="разброс логнормальной задержки")
+    parser.add_argument("--oauth-latency", type=float, default=0.05, help="задержка выдачи токена, с")
+    parser.add_argument("--rate-401", type=float, default=0.0, help="доля ответов 401")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="доля ответов 500/502/503")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After для 429, с")
+    parser.add_argument("--token-ttl", type=float, default=1800, help="время жизни токена, с")
+    parser.add_argument("--stream-chunk-delay", type=float, default=0.05, help="пауза между фрагментами потока, с")
+    parser.add_argument("--seed", type=int, help="зерно для воспроизводимых прогонов")
+    args = parser.parse_args()
+
+    mock = MockGigaChat(
+        latency_median=args.latency_median, latency_sigma=args.latency_sigma,
+        oauth_latency=args.oauth_latency, rate_401=args.rate_401, rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx, retry_after=args.retry_after, token_ttl=args.token_ttl,
+        stream_chunk_delay=args.stream_chunk_delay, seed=args.seed
+    )
+    print(f"🧪 Заглушка GigaChat на http://{args.host}:{args.port}")
+    web.run_app(mock.app, host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Память на одно активное интервью: прежняя раскладка сессии (словари списков словарей
+с полным JSON каждого агента) против записей из interview_records.
+
+Строит N завершенных 10-вопросных интервью в обеих раскладках с ответами агентов,
+заполненными по их RESPONSE_FORMAT (как в bench/mock_gigachat.py), и меряет
+tracemalloc прирост памяти и размер снимка JSON, который пишет SessionStore:
+
+    python bench/session_memory.py --interviews 200 --json bench_memory.json
+"""
+import os
+import sys
+import json
+import uuid
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot  # noqa: E402
+from interview_records import Analysis, Answer, InterviewSession  # noqa: E402
+from mock_gigachat import MockGigaChat, QUESTIONS, _template_at  # noqa: E402
+
+
+QUESTION_TYPES = ["technical", "situational", "practical"]
+ANSWERS = [
+    "В первую очередь я бы профилировал сервис, чтобы найти узкое место, и только потом оптимизировал.",
+    "Обычно начинаю с того, что уточняю требования и ограничения, затем предлагаю пару вариантов.",
+    "Использую кэш с ограничением по размеру и времени жизни, а инвалидацию делаю по событиям.",
+    "Договорился бы с командой о правилах ревью и зафиксировал их в документации проекта.",
+]
+
+
+class Generator:
+    """Ответы модели для одного хода: одни и те же тексты для обеих раскладок"""
+
+    def __init__(self, seed):
+        self.mock = MockGigaChat(seed=seed)
+        self.random = self.mock.random
+        self.pool = bot.AgentPool(client=None)
+        self.agents = self.pool.select(QUESTION_TYPES)
+        self.templates = {agent.role: _template_at(agent.RESPONSE_FORMAT, 0) for agent in self.agents}
+
+    def interview(self, questions):
+        """Сырые данные интервью - строки JSON, как их возвращает GigaChat"""
+        turns = []
+        for _ in range(questions):
+            turns.append(json.dumps({
+                "question": self.random.choice(QUESTIONS),
+                "type": self.random.choice(QUESTION_TYPES),
+                "answer": self.random.choice(ANSWERS),
+                "feedback": self.mock._sentences(3),
+                "analyses": {role: self.mock._fill(template) for role, template in self.templates.items()},
+                "llm_calls": self.random.randint(2, 4),
+            }, ensure_ascii=False))
+        return turns
+
+
+def build_legacy(generator, turns):
+    """Сессия в прежнем виде - как ее собирали launch_interview и handle_message"""
+    session = {
+        "role": "python_developer",
+        "role_name": "Python Developer",
+        "interview_length": "standard",
+        "question_types": ["all"],
+        "current_question": 0,
+        "total_questions": len(turns),
+        "questions": [],
+        "answers": [],
+        "feedbacks": [],
+        "agent_analyses": [],
+        "question_categories": [],
+        "active_agents": [{"name": agent.name, "emoji": agent.emoji, "role": agent.role,
+                           "expertise": agent.expertise} for agent in generator.agents],
+        "state": "completed",
+        "discussions": [],
+        "llm_calls": [],
+        "consults_saved": 0,
+        "session_id": uuid.uuid4().hex[:12],
+    }
+    for raw in turns:
+        turn = json.loads(raw)
+        session["questions"].append(turn["question"])
+        session["question_categories"].append(turn["type"])
+        session["answers"].append({"question": turn["question"], "answer": turn["answer"],
+                                   "type": turn["type"], "level": session["role_name"]})
+        session["feedbacks"].append(turn["feedback"])
+        session["agent_analyses"].append([
+            {"agent": agent.name, "emoji": agent.emoji, "role": agent.role,
+             "analysis": turn["analyses"][agent.role],
+             "confidence": turn["analyses"][agent.role].get("confidence", 0.7)}
+            for agent in generator.agents
+        ])
+        session["llm_calls"].append(turn["llm_calls"])
+        session["current_question"] += 1
+    return session
+
+
+def build_compact(generator, turns):
+    session = InterviewSession(
+        session_id=uuid.uuid4().hex[:12],
+        role="python_developer",
+        role_name="Python Developer",
+        interview_length="standard",
+        question_types=["all"],
+        total_questions=len(turns),
+        agents=tuple(agent.id for agent in generator.agents),
+        state="completed",
+    )
+    for raw in turns:
+        turn = json.loads(raw)
+        session.questions.append(turn["question"])
+        session.question_categories.append(turn["type"])
+        answer = Answer(turn["answer"])
+        answer.feedback = turn["feedback"]
+        answer.analyses = tuple(Analysis.from_json(agent.id, turn["analyses"][agent.role])
+                                for agent in generator.agents)
+        session.answers.append(answer)
+        session.llm_calls.append(turn["llm_calls"])
+        session.current_question += 1
+    return session
+
+
+def measure(build, generator, interviews):
+    """Байт на интервью по tracemalloc; исходные строки JSON в замер не входят"""
+    raw = [generator.interview(10) for _ in range(interviews)]
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    sessions = [build(generator, turns) for turns in raw]
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return sessions, (after - before) / interviews, (peak - before) / interviews
+
+
+def snapshot_bytes(sessions, encode):
+    sizes = [len(json.dumps(encode(session), ensure_ascii=False).encode("utf-8")) for session in sessions]
+    return sum(sizes) / len(sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interviews", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="куда сохранить результат")
+    args = parser.parse_args()
+
+    results = {}
+    for name, build, encode in (
+        ("legacy", build_legacy, lambda session: session),
+        ("compact", build_compact, InterviewSession.to_dict),
+    ):
+        # Одинаковый seed - одинаковые тексты в обеих раскладках
+        generator = Generator(args.seed)
+        sessions, resident, peak = measure(build, generator, args.interviews)
+        results[name] = {
+            "bytes_per_interview": round(resident),
+            "peak_bytes_per_interview": round(peak),
+            "snapshot_bytes": round(snapshot_bytes(sessions, encode)),
+        }
+        del sessions
+
+    legacy, compact = results["legacy"], results["compact"]
+    results["ratio"] = round(legacy["bytes_per_interview"] / compact["bytes_per_interview"], 2)
+
+    print(f"{args.interviews} интервью по 10 вопросов, {len(Generator(args.seed).agents)} агента")
+    print(f"{'':10} {'в памяти, Б':>12} {'пик, Б':>10} {'снимок JSON, Б':>15}")
+    for name in ("legacy", "compact"):
+        entry = results[name]
+        print(f"{name:10} {entry['bytes_per_interview']:>12} {entry['peak_bytes_per_interview']:>10} "
+              f"{entry['snapshot_bytes']:>15}")
+    print(f"Экономия памяти: в {results['ratio']} раза")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
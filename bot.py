@@ -1,60 +1,124 @@
 import os
-import requests
-import uuid
+import html
+import time
 import asyncio
 import random
 import json
+import uuid
+import importlib
+
+# Отметки времени старта для отчета в on_startup; первая - до тяжелых импортов
+_startup_marks = {"start": time.perf_counter()}
+
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ContextTypes, filters
+from telegram.request import HTTPXRequest
 from dotenv import load_dotenv
 
+from gigachat_transport import CallCounter, GigaChatError, create_api, get_api
+from interview_records import AgentId, Analysis, Answer, InterviewSession
+from loader import container
+from utils.live_message import LiveMessage, render_html
+from utils.logger import get_logger, log_context, setup_logging
+from utils.loop_monitor import LoopStallDetector
+from utils.scheduler import Priority
+from utils.session_store import SessionStore
+from utils.tracing import Trace, span, start_metrics_server, trace_scope
+
 load_dotenv()
-print("🤖 AI HR Interview Bot запускается...")
-print("🔗 Включен P2P мультиагентный режим...")
+setup_logging()
+logger = get_logger("bot")
+logger.info("🤖 AI HR Interview Bot запускается...")
+logger.info("🔗 Включен P2P мультиагентный режим...")
 
 
 
 # АГЕНТИКИ
 
+# Сколько секунд ждем анализ одного агента, прежде чем вернуть деградированный результат
+AGENT_CONSULT_TIMEOUT = float(os.getenv("AGENT_CONSULT_TIMEOUT", "25"))
+
+# "fanout" - отдельный запрос на каждого агента, "fused" - один общий запрос на всю панель
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "fanout")
+# В режиме fused заодно просим у модели и HR-фидбек, экономя еще один запрос
+FUSED_HR_FEEDBACK = os.getenv("FUSED_HR_FEEDBACK", "1") == "1"
+
+
 class Agent:
-    """Базовый класс для всех агентов"""
+    """Базовый класс для всех агентов.
+
+    Агенты не хранят состояния конкретного пользователя: один экземпляр
+    из AgentPool обслуживает все сессии, а связи между агентами живут в AgentPanel.
+    """
 
-    def __init__(self, name, role, emoji):
+    def __init__(self, name, role, emoji, deadline=None):
         self.name = name
         self.role = role
+        self.id = AgentId.from_role(role)
         self.emoji = emoji
-        self.peers = []
-        self.opinions = []
+        self.deadline = deadline if deadline is not None else AGENT_CONSULT_TIMEOUT
 
     async def consult(self, data, context):
         """Консультация агента по данным - ДОЛЖЕН БЫТЬ ПЕРЕОПРЕДЕЛЕН"""
         raise NotImplementedError
 
-    def connect_peer(self, peer):
-        if peer not in self.peers:
-            self.peers.append(peer)
-            peer.peers.append(self)
-
-    async def whisper_to_peers(self, message, client):
-        whispers = []
-        for peer in self.peers:
-            if hasattr(peer, 'react_to_whisper'):
-                reaction = await peer.react_to_whisper(message, self, client)
-                whispers.append(f"{peer.emoji} {peer.name}: {reaction}")
-        return whispers
-
     async def react_to_whisper(self, message, from_agent, client):
         """Реакция на шепот другого агента - ДОЛЖЕН БЫТЬ ПЕРЕОПРЕДЕЛЕН"""
         raise NotImplementedError
 
+    def _record(self, analysis_json, confidence=None):
+        """Разобранный ответ модели -> компактная запись Analysis"""
+        return Analysis.from_json(self.id, analysis_json, confidence)
+
+    def _unavailable_result(self, error):
+        """Результат без выдуманных баллов, когда GigaChat недоступен"""
+        return self._record({"error": str(error), "verdict": "Эксперт временно недоступен, анализ неполный"}, 0.1)
+
 
 class TechnicalAgent(Agent):
     """НАСТОЯЩИЙ агент-Технический специалист"""
 
+    RESPONSE_FORMAT = """{
+    "scores": {
+        "technical_correctness": 1-10,
+        "optimization": 1-10,
+        "code_quality": 1-10,
+        "scalability": 1-10,
+        "security": 1-10
+    },
+    "average_score": "средний балл",
+    "strengths": ["список сильных сторон"],
+    "weaknesses": ["список слабых сторон"],
+    "specific_errors": ["конкретные ошибки если есть"],
+    "improvement_suggestions": ["конкретные предложения"],
+    "verdict": "краткое заключение (1-2 предложения)",
+    "confidence": 0.85
+}"""
+
     def __init__(self):
         super().__init__("Технический специалист", "technical", "🔧")
+        self.max_tokens = 800
         self.expertise = "Python, алгоритмы, архитектура, базы данных, оптимизация"
 
+    def _fallback_analysis(self, analysis_result):
+        """Анализ-заглушка, если ответ модели не удалось разобрать как JSON"""
+        return {
+            "scores": {
+                "technical_correctness": random.randint(5, 9),
+                "optimization": random.randint(5, 9),
+                "code_quality": random.randint(5, 9),
+                "scalability": random.randint(5, 9),
+                "security": random.randint(5, 9)
+            },
+            "average_score": "7.5",
+            "strengths": ["Хорошее понимание базовых концепций"],
+            "weaknesses": ["Можно улучшить оптимизацию"],
+            "specific_errors": [],
+            "improvement_suggestions": ["Изучить паттерны проектирования"],
+            "verdict": analysis_result[:200] if len(analysis_result) > 50 else "Технически грамотный ответ",
+            "confidence": 0.7
+        }
+
     async def consult(self, data, context):
         try:
             question = data.get('question', '')
@@ -90,22 +154,7 @@ class TechnicalAgent(Agent):
 - Будь прямолинеен, но уважителен
 
 ФОРМАТ ОТВЕТА (JSON):
-{{
-    "scores": {{
-        "technical_correctness": 1-10,
-        "optimization": 1-10,
-        "code_quality": 1-10,
-        "scalability": 1-10,
-        "security": 1-10
-    }},
-    "average_score": "средний балл",
-    "strengths": ["список сильных сторон"],
-    "weaknesses": ["список слабых сторон"],
-    "specific_errors": ["конкретные ошибки если есть"],
-    "improvement_suggestions": ["конкретные предложения"],
-    "verdict": "краткое заключение (1-2 предложения)",
-    "confidence": 0.85
-}}"""
+{self.RESPONSE_FORMAT}"""
                 },
                 {
                     "role": "user",
@@ -122,46 +171,25 @@ class TechnicalAgent(Agent):
                 }
             ]
 
-            analysis_result = await client.chat_completion(messages, max_tokens=800)
+            analysis_result = await client.chat_completion(
+                messages, max_tokens=self.max_tokens, priority=Priority.ANALYSIS
+            )
 
             # Пытаемся распарсить JSON
             try:
                 analysis_json = json.loads(analysis_result)
             except:
-                analysis_json = {
-                    "scores": {
-                        "technical_correctness": random.randint(5, 9),
-                        "optimization": random.randint(5, 9),
-                        "code_quality": random.randint(5, 9),
-                        "scalability": random.randint(5, 9),
-                        "security": random.randint(5, 9)
-                    },
-                    "average_score": "7.5",
-                    "strengths": ["Хорошее понимание базовых концепций"],
-                    "weaknesses": ["Можно улучшить оптимизацию"],
-                    "specific_errors": [],
-                    "improvement_suggestions": ["Изучить паттерны проектирования"],
-                    "verdict": analysis_result[:200] if len(analysis_result) > 50 else "Технически грамотный ответ",
-                    "confidence": 0.7
-                }
+                analysis_json = self._fallback_analysis(analysis_result)
 
-            return {
-                "agent": self.name,
-                "emoji": self.emoji,
-                "role": self.role,
-                "analysis": analysis_json,
-                "confidence": analysis_json.get("confidence", 0.7)
-            }
+            return self._record(analysis_json)
+
+        except GigaChatError as e:
+            logger.warning("⚠️ GigaChat недоступен для TechnicalAgent.consult: %s", e)
+            return self._unavailable_result(e)
 
         except Exception as e:
-            print(f"❌ Ошибка в TechnicalAgent.consult: {e}")
-            return {
-                "agent": self.name,
-                "emoji": self.emoji,
-                "role": self.role,
-                "analysis": {"error": str(e), "verdict": "Ошибка анализа"},
-                "confidence": 0.3
-            }
+            logger.exception("❌ Ошибка в TechnicalAgent.consult: %s", e)
+            return self._record({"error": str(e), "verdict": "Ошибка анализа"}, 0.3)
 
     async def react_to_whisper(self, message, from_agent, client):
         try:
@@ -183,7 +211,7 @@ class TechnicalAgent(Agent):
 
             reaction = await client.chat_completion([
                 {"role": "system", "content": reaction_prompt}
-            ], max_tokens=100)
+            ], max_tokens=100, priority=Priority.BACKGROUND)
 
             return reaction.strip()
 
@@ -200,10 +228,47 @@ class TechnicalAgent(Agent):
 class CareerAgent(Agent):
     """НАСТОЯЩИЙ агент-Карьерный консультант"""
 
+    RESPONSE_FORMAT = """{
+    "scores": {
+        "goal_clarity": 1-10,
+        "growth_potential": 1-10,
+        "realism": 1-10,
+        "learning_readiness": 1-10,
+        "market_understanding": 1-10
+    },
+    "average_score": "средний балл",
+    "career_trajectory": "прогноз роста (1-3 года)",
+    "immediate_recommendations": ["что делать в первые 3 месяца"],
+    "learning_resources": ["курсы", "книги", "проекты"],
+    "salary_expectations": "рекомендации по зарплате",
+    "verdict": "карьерный прогноз (1-2 предложения)",
+    "confidence": 0.8
+}"""
+
     def __init__(self):
         super().__init__("Карьерный консультант", "career", "📈")
+        self.max_tokens = 700
         self.expertise = "Рост в IT, планирование карьеры, рынок труда, развитие навыков"
 
+    def _fallback_analysis(self, analysis_result):
+        """Анализ-заглушка, если ответ модели не удалось разобрать как JSON"""
+        return {
+            "scores": {
+                "goal_clarity": random.randint(5, 9),
+                "growth_potential": random.randint(6, 10),
+                "realism": random.randint(5, 9),
+                "learning_readiness": random.randint(6, 10),
+                "market_understanding": random.randint(4, 8)
+            },
+            "average_score": "7.2",
+            "career_trajectory": "Рост до Middle уровня за 1-2 года",
+            "immediate_recommendations": ["Изучить архитектурные паттерны", "Практиковаться в code review"],
+            "learning_resources": ["Курсы по системному дизайну", "Книга 'Чистый код'"],
+            "salary_expectations": "Соответствует рынку для данного уровня",
+            "verdict": analysis_result[:200] if len(analysis_result) > 50 else "Хороший карьерный потенциал",
+            "confidence": 0.75
+        }
+
     async def consult(self, data, context):
         try:
             answer = data.get('answer', '')
@@ -247,22 +312,7 @@ class CareerAgent(Agent):
 - Практические рекомендации
 
 ФОРМАТ ОТВЕТА (JSON):
-{{
-    "scores": {{
-        "goal_clarity": 1-10,
-        "growth_potential": 1-10,
-        "realism": 1-10,
-        "learning_readiness": 1-10,
-        "market_understanding": 1-10
-    }},
-    "average_score": "средний балл",
-    "career_trajectory": "прогноз роста (1-3 года)",
-    "immediate_recommendations": ["что делать в первые 3 месяца"],
-    "learning_resources": ["курсы", "книги", "проекты"],
-    "salary_expectations": "рекомендации по зарплате",
-    "verdict": "карьерный прогноз (1-2 предложения)",
-    "confidence": 0.8
-}}"""
+{self.RESPONSE_FORMAT}"""
                 },
                 {
                     "role": "user",
@@ -277,45 +327,24 @@ class CareerAgent(Agent):
                 }
             ]
 
-            analysis_result = await client.chat_completion(messages, max_tokens=700)
+            analysis_result = await client.chat_completion(
+                messages, max_tokens=self.max_tokens, priority=Priority.ANALYSIS
+            )
 
             try:
                 analysis_json = json.loads(analysis_result)
             except:
-                analysis_json = {
-                    "scores": {
-                        "goal_clarity": random.randint(5, 9),
-                        "growth_potential": random.randint(6, 10),
-                        "realism": random.randint(5, 9),
-                        "learning_readiness": random.randint(6, 10),
-                        "market_understanding": random.randint(4, 8)
-                    },
-                    "average_score": "7.2",
-                    "career_trajectory": "Рост до Middle уровня за 1-2 года",
-                    "immediate_recommendations": ["Изучить архитектурные паттерны", "Практиковаться в code review"],
-                    "learning_resources": ["Курсы по системному дизайну", "Книга 'Чистый код'"],
-                    "salary_expectations": "Соответствует рынку для данного уровня",
-                    "verdict": analysis_result[:200] if len(analysis_result) > 50 else "Хороший карьерный потенциал",
-                    "confidence": 0.75
-                }
+                analysis_json = self._fallback_analysis(analysis_result)
 
-            return {
-                "agent": self.name,
-                "emoji": self.emoji,
-                "role": self.role,
-                "analysis": analysis_json,
-                "confidence": analysis_json.get("confidence", 0.7)
-            }
+            return self._record(analysis_json)
+
+        except GigaChatError as e:
+            logger.warning("⚠️ GigaChat недоступен для CareerAgent.consult: %s", e)
+            return self._unavailable_result(e)
 
         except Exception as e:
-            print(f"❌ Ошибка в CareerAgent.consult: {e}")
-            return {
-                "agent": self.name,
-                "emoji": self.emoji,
-                "role": self.role,
-                "analysis": {"error": str(e), "verdict": "Ошибка анализа"},
-                "confidence": 0.3
-            }
+            logger.exception("❌ Ошибка в CareerAgent.consult: %s", e)
+            return self._record({"error": str(e), "verdict": "Ошибка анализа"}, 0.3)
 
     async def react_to_whisper(self, message, from_agent, client):
         try:
@@ -336,7 +365,7 @@ class CareerAgent(Agent):
 
             reaction = await client.chat_completion([
                 {"role": "system", "content": reaction_prompt}
-            ], max_tokens=100)
+            ], max_tokens=100, priority=Priority.BACKGROUND)
 
             return reaction.strip()
 
@@ -353,10 +382,52 @@ class CareerAgent(Agent):
 class PsychologistAgent(Agent):
     """НАСТОЯЩИЙ агент-Психолог/Тимлид"""
 
+    RESPONSE_FORMAT = """{
+    "scores": {
+        "communication": 1-10,
+        "teamwork": 1-10,
+        "problem_solving": 1-10,
+        "leadership": 1-10,
+        "emotional_intelligence": 1-10,
+        "adaptability": 1-10,
+        "ethics": 1-10
+    },
+    "average_score": "средний балл",
+    "team_fit": "насколько подходит команде (отлично/хорошо/средне/плохо)",
+    "observations": ["конкретные наблюдения о поведении"],
+    "potential_issues": ["возможные проблемы в команде"],
+    "development_areas": ["зоны развития soft skills"],
+    "verdict": "оценка командной совместимости (1-2 предложения)",
+    "confidence": 0.8
+}"""
+
     def __init__(self):
         super().__init__("Психолог-Тимлид", "psychologist", "👨‍💼")
+        self.max_tokens = 750
         self.expertise = "Soft skills, командная динамика, эмоциональный интеллект, лидерство"
 
+    def _fallback_analysis(self, analysis_result):
+        """Анализ-заглушка, если ответ модели не удалось разобрать как JSON"""
+        return {
+            "scores": {
+                "communication": random.randint(6, 10),
+                "teamwork": random.randint(6, 10),
+                "problem_solving": random.randint(5, 9),
+                "leadership": random.randint(4, 8),
+                "emotional_intelligence": random.randint(5, 9),
+                "adaptability": random.randint(6, 10),
+                "ethics": random.randint(7, 10)
+            },
+            "average_score": "7.5",
+            "team_fit": "хорошо",
+            "observations": ["Четко формулирует мысли", "Упоминает командную работу"],
+            "potential_issues": ["Может быть слишком прямолинеен"],
+            "development_areas": ["Развитие лидерских качеств"],
+            "verdict": analysis_result[:200] if len(
+                analysis_result) > 50 else "Хорошие soft skills для командной работы",
+            "confidence": 0.75
+        }
+
     async def consult(self, data, context):
         try:
             answer = data.get('answer', '')
@@ -394,24 +465,7 @@ class PsychologistAgent(Agent):
 - Фокусируется на развитии, а не критике
 
 ФОРМАТ ОТВЕТА (JSON):
-{{
-    "scores": {{
-        "communication": 1-10,
-        "teamwork": 1-10,
-        "problem_solving": 1-10,
-        "leadership": 1-10,
-        "emotional_intelligence": 1-10,
-        "adaptability": 1-10,
-        "ethics": 1-10
-    }},
-    "average_score": "средний балл",
-    "team_fit": "насколько подходит команде (отлично/хорошо/средне/плохо)",
-    "observations": ["конкретные наблюдения о поведении"],
-    "potential_issues": ["возможные проблемы в команде"],
-    "development_areas": ["зоны развития soft skills"],
-    "verdict": "оценка командной совместимости (1-2 предложения)",
-    "confidence": 0.8
-}}"""
+{self.RESPONSE_FORMAT}"""
                 },
                 {
                     "role": "user",
@@ -428,48 +482,24 @@ class PsychologistAgent(Agent):
                 }
             ]
 
-            analysis_result = await client.chat_completion(messages, max_tokens=750)
+            analysis_result = await client.chat_completion(
+                messages, max_tokens=self.max_tokens, priority=Priority.ANALYSIS
+            )
 
             try:
                 analysis_json = json.loads(analysis_result)
             except:
-                analysis_json = {
-                    "scores": {
-                        "communication": random.randint(6, 10),
-                        "teamwork": random.randint(6, 10),
-                        "problem_solving": random.randint(5, 9),
-                        "leadership": random.randint(4, 8),
-                        "emotional_intelligence": random.randint(5, 9),
-                        "adaptability": random.randint(6, 10),
-                        "ethics": random.randint(7, 10)
-                    },
-                    "average_score": "7.5",
-                    "team_fit": "хорошо",
-                    "observations": ["Четко формулирует мысли", "Упоминает командную работу"],
-                    "potential_issues": ["Может быть слишком прямолинеен"],
-                    "development_areas": ["Развитие лидерских качеств"],
-                    "verdict": analysis_result[:200] if len(
-                        analysis_result) > 50 else "Хорошие soft skills для командной работы",
-                    "confidence": 0.75
-                }
+                analysis_json = self._fallback_analysis(analysis_result)
 
-            return {
-                "agent": self.name,
-                "emoji": self.emoji,
-                "role": self.role,
-                "analysis": analysis_json,
-                "confidence": analysis_json.get("confidence", 0.7)
-            }
+            return self._record(analysis_json)
+
+        except GigaChatError as e:
+            logger.warning("⚠️ GigaChat недоступен для PsychologistAgent.consult: %s", e)
+            return self._unavailable_result(e)
 
         except Exception as e:
-            print(f"❌ Ошибка в PsychologistAgent.consult: {e}")
-            return {
-                "agent": self.name,
-                "emoji": self.emoji,
-                "role": self.role,
-                "analysis": {"error": str(e), "verdict": "Ошибка анализа"},
-                "confidence": 0.3
-            }
+            logger.exception("❌ Ошибка в PsychologistAgent.consult: %s", e)
+            return self._record({"error": str(e), "verdict": "Ошибка анализа"}, 0.3)
 
     async def react_to_whisper(self, message, from_agent, client):
         try:
@@ -490,7 +520,7 @@ class PsychologistAgent(Agent):
 
             reaction = await client.chat_completion([
                 {"role": "system", "content": reaction_prompt}
-            ], max_tokens=100)
+            ], max_tokens=100, priority=Priority.BACKGROUND)
 
             return reaction.strip()
 
@@ -504,46 +534,97 @@ class PsychologistAgent(Agent):
             return random.choice(reactions)
 
 
-class InterviewerAgent:
+def _extract_json(text):
+    """Достает JSON-объект из ответа модели, даже если он обернут в markdown"""
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end <= start:
+        return None
+    try:
+        parsed = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+class AgentPool:
+    """Переиспользуемые агенты без состояния - по одному экземпляру на роль"""
 
     def __init__(self, client):
-        self.active_agents = []
         self.client = client
+        self.agents = {
+            agent.role: agent
+            for agent in (TechnicalAgent(), CareerAgent(), PsychologistAgent())
+        }
 
-    def activate_agents(self, question_types, client):
-        self.active_agents = []
-        self.client = client
+    def get(self, agent_id):
+        """Агент по AgentId из записей сессии"""
+        return self.agents[agent_id.role]
 
+    def select(self, question_types):
+        """Агенты для выбранных типов вопросов в стабильном порядке"""
         # Всегда активируем технического агента
-        tech_agent = TechnicalAgent()
-        tech_agent.client = client
-        self.active_agents.append(tech_agent)
+        selected = [self.agents["technical"]]
 
         # Активируем карьерного агента если есть ситуационные вопросы
         if "situational" in question_types or "all" in question_types:
-            career_agent = CareerAgent()
-            career_agent.client = client
-            self.active_agents.append(career_agent)
+            selected.append(self.agents["career"])
 
         # Активируем психолога если есть практические или ситуационные вопросы
         if "practical" in question_types or "situational" in question_types or "all" in question_types:
-            psych_agent = PsychologistAgent()
-            psych_agent.client = client
-            self.active_agents.append(psych_agent)
+            selected.append(self.agents["psychologist"])
 
-        # Создаем P2P связи между всеми активированными агентами
-        for i, agent1 in enumerate(self.active_agents):
-            for agent2 in self.active_agents[i + 1:]:
-                agent1.connect_peer(agent2)
+        return selected
+
+
+class AgentPanel:
+    """Панель экспертов одной сессии интервью.
 
-        return self.active_agents
+    Весь изменяемый per-user state (состав панели, P2P связи) живет здесь,
+    а не на общих экземплярах агентов из AgentPool.
+    """
 
-    async def consult_all(self, data, context):
-        all_analyses = []
+    def __init__(self, pool, question_types):
+        self.pool = pool
+        self.client = pool.client
+        self.active_agents = pool.select(question_types)
 
-        # Имитация обсуждения между агентами
-        if random.random() > 0.3 and self.active_agents:
-            discussion_text = await self._simulate_discussion(data, context)
+        # Создаем P2P связи между всеми активированными агентами
+        self.peers = {
+            agent.role: [peer for peer in self.active_agents if peer is not agent]
+            for agent in self.active_agents
+        }
+
+    async def whisper_to_peers(self, agent, message):
+        whispers = []
+        for peer in self.peers.get(agent.role, []):
+            reaction = await peer.react_to_whisper(message, agent, self.client)
+            whispers.append(f"{peer.emoji} {peer.name}: {reaction}")
+        return whispers
+
+    def agents_for(self, question_type):
+        """Активные агенты, которым QUESTION_TYPES поручает данный тип вопроса"""
+        roles = QUESTION_TYPES.get(question_type, QUESTION_TYPES["all"])["agents"]
+        routed = [agent for agent in self.active_agents if agent.role in roles]
+        # Если ни один активный агент не отвечает за тип, спрашиваем всех
+        return routed or list(self.active_agents)
+
+    async def consult_all(self, data, context, analyses=None):
+        """Анализы агентов по ответу; analyses - уже готовый результат fused-запроса"""
+        agents = self.agents_for(data.get("type", "all"))
+
+        if analyses is not None:
+            all_analyses = analyses
+        elif ANALYSIS_MODE == "fused":
+            all_analyses = (await self.consult_fused(data, context))["analyses"]
+        else:
+            # Агенты работают параллельно, gather сохраняет порядок active_agents
+            all_analyses = list(await asyncio.gather(
+                *(self._consult_with_deadline(agent, data, context) for agent in agents)
+            ))
+
+        # Имитация обсуждения между агентами поверх уже готовых анализов
+        if random.random() > 0.3 and all_analyses:
+            discussion_text = await self._simulate_discussion(data, all_analyses)
             if discussion_text:
                 await context.bot.send_message(
                     chat_id=context._chat_id,
@@ -551,29 +632,97 @@ class InterviewerAgent:
                     parse_mode="HTML"
                 )
 
-        for agent in self.active_agents:
-            try:
-                analysis = await agent.consult(data, context)
-                all_analyses.append(analysis)
-            except Exception as e:
-                print(f"❌ Ошибка при консультации агента {agent.name}: {e}")
-                all_analyses.append({
-                    "agent": agent.name,
-                    "emoji": agent.emoji,
-                    "role": agent.role,
-                    "analysis": {"error": str(e), "verdict": "Не удалось проанализировать"},
-                    "confidence": 0.1
-                })
-
         return all_analyses
 
-    async def _simulate_discussion(self, data, context):
+    async def consult_fused(self, data, context, with_hr_feedback=False):
+        """Один запрос к GigaChat вместо отдельного запроса на каждого агента.
+
+        Модель возвращает JSON с секцией на каждого агента (и, по желанию,
+        с HR-фидбеком); секции раскладываются в те же структуры, что и consult.
+        """
+        agents = self.agents_for(data.get("type", "all"))
+        role_name = context.user_data.get('role_name', 'разработчика')
+
+        sections = []
+        for agent in agents:
+            sections.append(f'''"{agent.role}" - {agent.emoji} {agent.name}, экспертиза: {agent.expertise}.
+ФОРМАТ СЕКЦИИ:
+{agent.RESPONSE_FORMAT}''')
+        keys = [f'"{agent.role}"' for agent in agents]
+        if with_hr_feedback:
+            sections.append('''"hr_feedback" - 👔 HR-интервьюер: естественная, дружелюбная обратная связь кандидату (2-4 предложения), отметь сильные стороны и конструктивно укажи на слабые.
+ФОРМАТ СЕКЦИИ: строка''')
+            keys.append('"hr_feedback"')
+
+        sections_text = "\n\n".join(sections)
+        messages = [
+            {
+                "role": "system",
+                "content": f"""Ты - панель экспертов на собеседовании на позицию {role_name}.
+Каждый эксперт оценивает ответ кандидата только в своей области, баллы от 1 до 10.
+
+ЭКСПЕРТЫ:
+{sections_text}
+
+ВЕРНИ ОДИН JSON-объект без markdown с ключами: {", ".join(keys)}."""
+            },
+            {
+                "role": "user",
+                "content": f"""ВОПРОС КАНДИДАТУ:
+{data.get('question', '')}
+
+ОТВЕТ КАНДИДАТА:
+{data.get('answer', '')}
+
+ПОЗИЦИЯ: {role_name}
+УРОВЕНЬ: {data.get('level', 'Middle')}"""
+            }
+        ]
+
+        max_tokens = sum(agent.max_tokens for agent in agents) + (200 if with_hr_feedback else 0)
+        # С HR-фидбеком кандидат ждет этот ответ напрямую
+        priority = Priority.INTERACTIVE if with_hr_feedback else Priority.ANALYSIS
+        try:
+            with span("consult_fused"):
+                result = await self.client.chat_completion(messages, max_tokens=max_tokens, priority=priority)
+        except GigaChatError as e:
+            logger.warning("⚠️ GigaChat недоступен для fused-анализа: %s", e)
+            return {"hr_feedback": None, "analyses": [agent._unavailable_result(e) for agent in agents]}
+
+        parsed = _extract_json(result)
+        if parsed is None:
+            logger.error("❌ Не удалось разобрать fused-анализ: %s", result[:100])
+            parsed = {}
+
+        analyses = []
+        for agent in agents:
+            section = parsed.get(agent.role)
+            analysis_json = section if isinstance(section, dict) else agent._fallback_analysis("")
+            analyses.append(agent._record(analysis_json))
+
+        hr_feedback = parsed.get("hr_feedback") if with_hr_feedback else None
+        return {
+            "hr_feedback": hr_feedback if isinstance(hr_feedback, str) and hr_feedback else None,
+            "analyses": analyses
+        }
+
+    async def _consult_with_deadline(self, agent, data, context):
+        try:
+            with span("consult", agent=agent.role):
+                return await asyncio.wait_for(agent.consult(data, context), timeout=agent.deadline)
+        except asyncio.TimeoutError:
+            logger.warning("⏱️ Агент %s не уложился в %.0f с", agent.name, agent.deadline)
+            return agent._record({"error": "timeout", "verdict": "Эксперт не успел завершить анализ"}, 0.1)
+        except Exception as e:
+            logger.exception("❌ Ошибка при консультации агента %s: %s", agent.name, e)
+            return agent._record({"error": str(e), "verdict": "Не удалось проанализировать"}, 0.1)
+
+    async def _simulate_discussion(self, data, analyses):
         try:
             opinions = []
-            for agent in self.active_agents:
-                temp_analysis = await agent.consult(data, context)
-                verdict = temp_analysis.get('analysis', {}).get('verdict', 'Нет вердикта')
-                opinions.append(f"{agent.emoji} {agent.name}: {verdict[:100]}...")
+            for analysis in analyses:
+                agent = self.pool.get(analysis.agent)
+                opinions.append(f"{agent.emoji} {agent.name}: {analysis.verdict[:100]}...")
 
             opinions_text = "\n".join(opinions)
 
@@ -601,14 +750,16 @@ class InterviewerAgent:
 
 ОБСУЖДЕНИЕ:"""
 
-            discussion = await self.client.chat_completion([
-                {"role": "system", "content": discussion_prompt}
-            ], max_tokens=400)
+            # Обсуждение ждут вердикты экспертов - это тот же этап анализа, а не фон
+            with span("discussion"):
+                discussion = await self.client.chat_completion([
+                    {"role": "system", "content": discussion_prompt}
+                ], max_tokens=400, priority=Priority.ANALYSIS)
 
             return discussion.strip()
 
         except Exception as e:
-            print(f"❌ Ошибка в обсуждении агентов: {e}")
+            logger.exception("❌ Ошибка в обсуждении агентов: %s", e)
             return None
 
 
@@ -616,84 +767,106 @@ class InterviewerAgent:
 # GigaChat Client
 
 class GigaChatClient:
-    def __init__(self):
-        self.auth_key = os.getenv("GIGACHAT_AUTH_CODE")
-        self.access_token = None
-        self._update_access_token()
+    def __init__(self, api=None, base_url=None, oauth_url=None):
+        # base_url/oauth_url - свой путь запросов, например к bench/mock_gigachat.py
+        if api is None:
+            api = create_api(base_url, oauth_url) if base_url or oauth_url else get_api()
+        self.api = api
+        self.transport = self.api.transport
+        self.tokens = self.api.tokens
+        self.scheduler = self.api.scheduler
+
+    async def chat_completion(self, messages, max_tokens=500, temperature=0.7, priority=Priority.INTERACTIVE,
+                              cache=True):
+        """Отправляет запрос к GigaChat API; при сбое бросает GigaChatError.
+
+        cache=False - для генерации, где нужно разнообразие.
+        """
+        return await self.api.complete(
+            messages, max_tokens=max_tokens, temperature=temperature, priority=priority, cache=cache
+        )
 
-    def _update_access_token(self):
-        """Получаем access token для GigaChat"""
-        try:
-            url = "https://ngw.devices.sberbank.ru:9443/api/v2/oauth"
-            rq_uid = str(uuid.uuid4())
-
-            headers = {
-                'Content-Type': 'application/x-www-form-urlencoded',
-                'Accept': 'application/json',
-                'RqUID': rq_uid,
-                'Authorization': f'Basic {self.auth_key}'
-            }
+    async def chat_completion_stream(self, messages, on_delta, max_tokens=500, temperature=0.7,
+                                     priority=Priority.INTERACTIVE):
+        """Потоковый запрос: on_delta(фрагмент) вызывается по мере генерации, возвращается весь текст"""
+        return await self.api.complete_stream(
+            messages, on_delta, max_tokens=max_tokens, temperature=temperature, priority=priority
+        )
 
-            data = {'scope': 'GIGACHAT_API_PERS'}
 
-            print("🔐 Получаем токен GigaChat...")
-            response = requests.post(url, headers=headers, data=data, verify=False, timeout=30)
+# Клиент и агенты живут в общем контейнере loader.py, поверх его api и пула соединений
+container.register("client", lambda c: GigaChatClient(api=c.api))
+container.register("agent_pool", lambda c: AgentPool(c.client))
+# В хранилище сессия лежит как InterviewSession.to_dict(); задачи предзагрузки, панель агентов
+# и трасса не сериализуются - _restore_session строит их заново
+# Завершенные сессии нужны только для отчета - их выгружаем из памяти раньше остальных
+container.register("sessions", lambda c: SessionStore(
+    c.session_backend, "bot",
+    encode=InterviewSession.to_dict,
+    restore=_restore_session,
+    max_entries=SESSION_CACHE_MAX,
+    max_bytes=int(SESSION_CACHE_MAX_MB * 1024 * 1024),
+    idle_ttl=SESSION_IDLE_TTL,
+    spill=lambda session: session.state == "completed",
+    spill_ttl=SESSION_SPILL_TTL,
+    on_evict=cancel_prefetch
+), SessionStore.close)
 
-            if response.status_code == 200:
-                token_data = response.json()
-                self.access_token = token_data['access_token']
-                print("✅ GigaChat token получен")
-                return True
-            else:
-                print(f"❌ Ошибка получения token: {response.status_code}")
-                return False
+# Заполняются в init_services() из post_init: импорт bot.py не ходит ни в сеть, ни на диск
+client = None
+agent_pool = None
+question_pool = None
+user_sessions = None
 
-        except Exception as e:
-            print(f"💥 Ошибка: {str(e)}")
-            return False
+# Вызовы экспертов, которые маршрутизация по типу вопроса не сделала, - за время работы процесса
+routing_stats = {"consults_saved": 0}
 
-    async def chat_completion(self, messages, max_tokens=500):
-        """Отправляет запрос к GigaChat API"""
-        if not self.access_token:
-            if not self._update_access_token():
-                return "❌ Ошибка подключения к GigaChat"
 
-        try:
-            url = "https://gigachat.devices.sberbank.ru/api/v1/chat/completions"
+@container.on_startup
+async def _seed_question_pool():
+    # Общие HR-вопросы - отдельный бакет, который выручает, пока у роли пусто
+    await asyncio.to_thread(container.question_pool.seed_from_json, os.path.join("data", "hr_questions.json"))
 
-            headers = {
-                'Authorization': f'Bearer {self.access_token}',
-                'Content-Type': 'application/json',
-                'Accept': 'application/json'
-            }
 
-            data = {
-                'model': 'GigaChat',
-                'messages': messages,
-                'temperature': 0.7,
-                'max_tokens': max_tokens
-            }
+async def init_services():
+    """Поднимает общие ресурсы контейнера и раскладывает их по глобальным именам модуля"""
+    global client, agent_pool, question_pool, user_sessions
+    await container.startup()
+    client, agent_pool, question_pool = container.client, container.agent_pool, container.question_pool
+    user_sessions = container.sessions
 
-            response = requests.post(url, headers=headers, json=data, verify=False, timeout=30)
 
-            if response.status_code == 200:
-                result = response.json()
-                return result['choices'][0]['message']['content']
-            else:
-                return f"❌ Ошибка API: {response.status_code}"
+# Потоковая выдача HR-фидбека и финального отчета с правкой сообщения в Telegram
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "1") == "1"
+LIVE_EDIT_INTERVAL = float(os.getenv("LIVE_EDIT_INTERVAL", "1.5"))
+HR_HEADER = "👔 <b>HR-интервьюер:</b>\n\n"
 
-        except Exception as e:
-            return f"❌ Ошибка: {str(e)}"
+# Пул пополняется, только пока к GigaChat летит не больше запросов, чем это
+POOL_IDLE_MAX_IN_FLIGHT = int(os.getenv("POOL_IDLE_MAX_IN_FLIGHT", "2"))
+
+# Доля пишущихся в лог частых записей (счетчик LLM-вызовов на каждый ответ)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
 
+# Трассировка: /metrics для Prometheus (0 - выключить) и водопады медленных интервью
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+TRACE_SLOW_INTERVIEW_S = float(os.getenv("TRACE_SLOW_INTERVIEW_S", "300"))
+TRACE_DIR = os.getenv("TRACE_DIR", "traces")
 
-client = GigaChatClient()
-interviewer_agent = InterviewerAgent(client)
+# Служебная статистика (/llmstats) - только этим пользователям Telegram, через запятую; пусто - никому
+ADMIN_USER_IDS = {int(user_id) for user_id in os.getenv("ADMIN_USER_IDS", "").replace(",", " ").split()}
 
+# Сторож event loop (по желанию): гистограмма задержки и стеки блокирующих вызовов
+LOOP_WATCHDOG = os.getenv("LOOP_WATCHDOG", "0") == "1"
+LOOP_STALL_THRESHOLD = float(os.getenv("LOOP_STALL_THRESHOLD", "0.25"))
 
-# Хранилище сессий и константы
+# Границы сессий в памяти: остальные лежат в SESSION_DB и поднимаются по первому сообщению
+SESSION_CACHE_MAX = int(os.getenv("SESSION_CACHE_MAX", "1000"))
+SESSION_CACHE_MAX_MB = float(os.getenv("SESSION_CACHE_MAX_MB", "64"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+SESSION_SPILL_TTL = float(os.getenv("SESSION_SPILL_TTL", "60"))
 
 
-user_sessions = {}
+# Константы
 
 INTERVIEW_LENGTHS = {
     "short": {"questions": 3, "name": "Короткое (3 вопроса)", "emoji": "⚡"},
@@ -701,6 +874,14 @@ INTERVIEW_LENGTHS = {
     "long": {"questions": 10, "name": "Полное (10 вопросов)", "emoji": "📊"}
 }
 
+ROLE_MAPPING = {
+    "role_junior_python": "Junior Python разработчика",
+    "role_middle_python": "Middle Python разработчика",
+    "role_senior_python": "Senior Python разработчика",
+    "role_data_scientist": "Data Scientist",
+    "role_team_lead": "Python Team Lead"
+}
+
 QUESTION_TYPES = {
     "technical": {
         "name": "Технические вопросы",
@@ -761,8 +942,11 @@ async def show_agents(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
 
     user_id = query.from_user.id
-    if user_id in user_sessions and 'active_agents' in user_sessions[user_id]:
-        active_agents = user_sessions[user_id]['active_agents']
+    if user_id in user_sessions:
+        active_agents = [
+            {"name": agent.name, "emoji": agent.emoji, "expertise": agent.expertise}
+            for agent in map(agent_pool.get, user_sessions[user_id].agents)
+        ]
         status = "🟢 Активен сейчас"
     else:
         active_agents = [
@@ -809,47 +993,30 @@ async def launch_interview(update: Update, context: ContextTypes.DEFAULT_TYPE):
     length_type = context.user_data["interview_length"]
     total_questions = INTERVIEW_LENGTHS[length_type]["questions"]
 
-    role_mapping = {
-        "role_junior_python": "Junior Python разработчика",
-        "role_middle_python": "Middle Python разработчика",
-        "role_senior_python": "Senior Python разработчика",
-        "role_data_scientist": "Data Scientist",
-        "role_team_lead": "Python Team Lead"
-    }
-    role_name = role_mapping.get(selected_role, "Python разработчика")
+    role_name = ROLE_MAPPING.get(selected_role, "Python разработчика")
     context.user_data["role_name"] = role_name
 
 
-    active_agents_list = interviewer_agent.activate_agents(selected_types, client)
-
-    agents_info = []
-    for agent in active_agents_list:
-        agents_info.append({
-            "name": agent.name,
-            "emoji": agent.emoji,
-            "role": agent.role,
-            "expertise": agent.expertise
-        })
-
-    user_sessions[user_id] = {
-        "role": selected_role.replace("role_", ""),
-        "role_name": role_name,
-        "interview_length": length_type,
-        "question_types": selected_types,
-        "current_question": 0,
-        "total_questions": total_questions,
-        "questions": [],
-        "answers": [],
-        "feedbacks": [],
-        "agent_analyses": [],
-        "question_categories": [],
-        "active_agents": agents_info,
-        "state": "in_progress",
-        "discussions": []
-    }
+    # Прежнее незавершенное интервью брошено - его предзагрузка больше не нужна
+    if user_id in user_sessions:
+        cancel_prefetch(user_sessions[user_id])
+
+    panel = AgentPanel(agent_pool, selected_types)
+
+    user_sessions[user_id] = InterviewSession(
+        session_id=uuid.uuid4().hex[:12],
+        role=selected_role.replace("role_", ""),
+        role_name=role_name,
+        interview_length=length_type,
+        question_types=selected_types,
+        total_questions=total_questions,
+        agents=tuple(agent.id for agent in panel.active_agents),
+        panel=panel,
+        trace=Trace(f"interview {user_id} {selected_role.replace('role_', '')}")
+    )
 
     types_text = QUESTION_TYPES[selected_types[0]]["name"] if selected_types else "Разные типы"
-    agents_text = ", ".join([f"{a['emoji']} {a['name']}" for a in agents_info])
+    agents_text = ", ".join([f"{a.emoji} {a.name}" for a in panel.active_agents])
 
     await query.edit_message_text(
         f"🚀 <b>Запускаем P2P интервью!</b>\n\n"
@@ -863,15 +1030,45 @@ async def launch_interview(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode="HTML"
     )
 
-    await generate_next_question(update, user_id, context)
+    session = user_sessions[user_id]
+    with user_sessions.pinned(user_id), trace_scope(session.trace), span("next_question", role=session.role):
+        await generate_next_question(update, user_id, context)
+    user_sessions.save(user_id)
 
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Ход кандидата целиком - этап turn в трассировке интервью"""
+    user_id = update.effective_user.id
+    # После перезапуска сессия поднимается из хранилища на первом же сообщении
+    session = await user_sessions.ensure(user_id)
+    if session is None or session.state != "in_progress":
+        with log_context(user_id=user_id):
+            await _handle_answer(update, context)
+        return
+
+    if session.current_question >= len(session.questions):
+        # Прошлый вопрос сгенерировать не удалось - сообщение кандидата считаем просьбой повторить
+        with user_sessions.pinned(user_id), log_context(user_id=user_id, session=session.session_id), \
+                trace_scope(session.trace), span("next_question", role=session.role):
+            await generate_next_question(update, user_id, context)
+        user_sessions.save(user_id)
+        return
+
+    question_type = session.question_categories[session.current_question]
+    with user_sessions.pinned(user_id), log_context(user_id=user_id, session=session.session_id), \
+            trace_scope(session.trace), span("turn", role=session.role, question_type=question_type):
+        await _handle_answer(update, context)
+    user_sessions.save(user_id)
+    if session.state == "completed":
+        _dump_trace_if_slow(session)
+
+
+async def _handle_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     user_text = update.message.text
     context._chat_id = update.effective_chat.id
 
-    if user_id not in user_sessions or user_sessions[user_id]["state"] != "in_progress":
+    if user_id not in user_sessions or user_sessions[user_id].state != "in_progress":
         keyboard = [[InlineKeyboardButton("🚀 Начать интервью", callback_data="show_interview_menu")]]
         await update.message.reply_text(
             "🤨 <b>Сначала выберите тип интервью</b>",
@@ -881,16 +1078,18 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     session = user_sessions[user_id]
-    current_q_index = session["current_question"]
+    current_q_index = session.current_question
 
+    # Входные данные агентов на этот ход; в сессии остается только компактная запись Answer
     answer_data = {
-        "question": session["questions"][current_q_index],
+        "question": session.questions[current_q_index],
         "answer": user_text,
-        "type": session["question_categories"][current_q_index],
-        "level": session["role_name"]
+        "type": session.question_categories[current_q_index],
+        "level": session.role_name
     }
 
-    session["answers"].append(answer_data)
+    answer = Answer(user_text)
+    session.answers.append(answer)
 
     processing_msg = await update.message.reply_text(
         f"👥 <b>Агенты запускают P2P анализ...</b>\n"
@@ -910,23 +1109,43 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
          Указывай на слабые места конструктивно.
          Будь человечным: выражай удивление, одобрение, интерес."""},
         {"role": "user",
-         "content": f"Вопрос на позицию {session['role_name']}: {answer_data['question']}\n\nОтвет кандидата: {user_text}"}
+         "content": f"Вопрос на позицию {session.role_name}: {answer_data['question']}\n\nОтвет кандидата: {user_text}"}
     ]
 
-    hr_feedback = await client.chat_completion(hr_feedback_messages, max_tokens=200)
+    # Считаем запросы к GigaChat на этот ответ: HR-фидбек, анализы агентов и обсуждение
+    llm_calls = CallCounter()
+    fused = None
+    live = None
+    with llm_calls, span("hr_feedback"):
+        if ANALYSIS_MODE == "fused" and FUSED_HR_FEEDBACK:
+            # HR-фидбек и анализы всех агентов приходят одним запросом
+            fused = await session.panel.consult_fused(answer_data, context, with_hr_feedback=True)
+            hr_feedback = fused["hr_feedback"]
+        else:
+            try:
+                if STREAM_RESPONSES:
+                    # Фидбек появляется у кандидата по мере генерации, а не целиком через 10+ секунд
+                    live = LiveMessage(
+                        await update.message.reply_text(f"{HR_HEADER}<i>печатает...</i>", parse_mode="HTML"),
+                        header=HR_HEADER, min_interval=LIVE_EDIT_INTERVAL
+                    )
+                    hr_feedback = await client.chat_completion_stream(hr_feedback_messages, live.update,
+                                                                      max_tokens=200)
+                else:
+                    hr_feedback = await client.chat_completion(hr_feedback_messages, max_tokens=200)
+            except GigaChatError as e:
+                logger.warning("⚠️ HR-фидбек недоступен: %s", e)
+                hr_feedback = None
     await processing_msg.delete()
 
-    if not hr_feedback.startswith("❌"):
-        session["feedbacks"].append(hr_feedback)
-        await update.message.reply_text(
-            f"👔 <b>HR-интервьюер:</b>\n\n{hr_feedback}",
-            parse_mode="HTML"
-        )
-    else:
+    if not hr_feedback:
         hr_feedback = "Спасибо за развернутый ответ! Передаю его нашим экспертам для глубокого анализа."
-        session["feedbacks"].append(hr_feedback)
+    answer.feedback = hr_feedback
+    if live is not None:
+        await live.finish(hr_feedback)
+    else:
         await update.message.reply_text(
-            f"👔 <b>HR-интервьюер:</b>\n\n{hr_feedback}",
+            render_html(HR_HEADER, hr_feedback),
             parse_mode="HTML"
         )
 
@@ -936,28 +1155,36 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode="HTML"
     )
 
-    agents_analyses = await interviewer_agent.consult_all(answer_data, context)
+    with llm_calls, span("consult_all"):
+        agents_analyses = await session.panel.consult_all(
+            answer_data, context, analyses=fused["analyses"] if fused else None
+        )
 
-    session["agent_analyses"].append(agents_analyses)
+    answer.analyses = tuple(agents_analyses)
+    saved = len(session.panel.active_agents) - len(agents_analyses)
+    session.consults_saved += saved
+    routing_stats["consults_saved"] += saved
 
 
     for analysis in agents_analyses:
-        agent_name = analysis.get("agent", "Агент")
-        agent_emoji = analysis.get("emoji", "👤")
-        verdict = analysis.get("analysis", {}).get("verdict", "Нет вердикта")
-        confidence = analysis.get("confidence", 0.5)
+        agent = agent_pool.get(analysis.agent)
+        confidence = analysis.confidence
 
         confidence_star = "⭐" * int(confidence * 5)
 
         await update.message.reply_text(
-            f"{agent_emoji} <b>{agent_name}:</b>\n"
-            f"{verdict}\n"
+            f"{agent.emoji} <b>{agent.name}:</b>\n"
+            f"{analysis.verdict}\n"
             f"<i>Уверенность: {confidence_star} ({confidence:.1%})</i>",
             parse_mode="HTML"
         )
 
-    session["current_question"] += 1
-    if session["current_question"] >= session["total_questions"]:
+    session.llm_calls.append(llm_calls.calls)
+    logger.info("📊 Пользователь %s: %s LLM-вызовов на ответ", user_id, llm_calls.calls,
+                extra={"llm_calls": llm_calls.calls, "sample": LOG_SAMPLE_RATE})
+
+    session.current_question += 1
+    if session.current_question >= session.total_questions:
         await finish_interview(update, user_id, context)
         return
 
@@ -965,11 +1192,13 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "🧠 <b>Агенты согласовывают следующий вопрос...</b>",
         parse_mode="HTML"
     )
-    await generate_next_question(update, user_id, context)
+    with span("next_question"):
+        await generate_next_question(update, user_id, context)
 
 
 async def finish_interview(update: Update, user_id: int, context: ContextTypes.DEFAULT_TYPE):
     session = user_sessions[user_id]
+    cancel_prefetch(session)
 
     analysis_msg = await update.message.reply_text(
         "📊 <b>Агенты готовят сводный P2P отчет...</b>\n"
@@ -979,18 +1208,18 @@ async def finish_interview(update: Update, user_id: int, context: ContextTypes.D
     )
 
     all_analyses_data = []
-    for i, agents_analyses in enumerate(session["agent_analyses"]):
+    for question, answer in zip(session.questions, session.answers):
         question_data = {
-            "question": session["questions"][i],
-            "answer": session["answers"][i]["answer"],
-            "analyses": agents_analyses
+            "question": question,
+            "answer": answer.text,
+            "analyses": [{"agent": agent_pool.get(a.agent).name, **a.report()} for a in answer.analyses]
         }
         all_analyses_data.append(question_data)
 
     # промпт для сводного отчета
     summary_prompt = f"""Ты - главный HR-специалист, координирующий работу команды экспертов.
 На основе  анализов технического специалиста, карьерного консультанта и психолога-тимлида,
-создай развернутый финальный отчет о кандидате на позицию. МАКСИМУМ 2000 СИМВОЛОВ {session['role_name']}.
+создай развернутый финальный отчет о кандидате на позицию. МАКСИМУМ 2000 СИМВОЛОВ {session.role_name}.
 
 АНАЛИЗЫ ЭКСПЕРТОВ ПО ВСЕМ ВОПРОСАМ:
 {json.dumps(all_analyses_data, ensure_ascii=False, indent=2)}
@@ -1021,14 +1250,32 @@ async def finish_interview(update: Update, user_id: int, context: ContextTypes.D
 Отчет должен быть профессиональным, подробным, с конкретными примерами и рекомендациями.
 Используй эмодзи для наглядности, но не злоупотребляй."""
 
-    final_report = await client.chat_completion(
-        [{"role": "system", "content": summary_prompt}],
-        max_tokens=1500
-    )
+    live = None
+    try:
+        with span("final_report"):
+            if STREAM_RESPONSES:
+                # Пока отчет генерируется, кандидат читает его в сообщении-заглушке
+                live = LiveMessage(analysis_msg, header="📊 <b>Сводный P2P отчет:</b>\n\n",
+                                   min_interval=LIVE_EDIT_INTERVAL)
+                final_report = await client.chat_completion_stream(
+                    [{"role": "system", "content": summary_prompt}], live.update,
+                    max_tokens=1500
+                )
+            else:
+                final_report = await client.chat_completion(
+                    [{"role": "system", "content": summary_prompt}],
+                    max_tokens=1500
+                )
+    except GigaChatError as e:
+        logger.warning("⚠️ Финальный отчет недоступен: %s", e)
+        final_report = None
 
-    await analysis_msg.delete()
+    # Отчет дописан в потоке - финальная правка того же сообщения; иначе заглушку заменяем новым
+    streamed = live is not None and bool(final_report)
+    if not streamed:
+        await analysis_msg.delete()
 
-    if final_report.startswith("❌"):
+    if not final_report:
         final_report = """📊 ФИНАЛЬНЫЙ P2P ОТЧЕТ
 
 🔧 ТЕХНИЧЕСКИЙ СПЕЦИАЛИСТ:
@@ -1051,14 +1298,14 @@ async def finish_interview(update: Update, user_id: int, context: ContextTypes.D
 2. Месяц 2: Участие в код-ревью, изучение архитектуры
 3. Месяц 3: Самостоятельный проект под руководством ментора"""
 
-    # Формируем финальный отчет
+    # Формируем финальный отчет: разметка вокруг, текст модели экранируется в render_html
     report = "🏁 <b>P2P ИНТЕРВЬЮ ЗАВЕРШЕНО!</b>\n\n"
-    report += f"🎯 <b>Позиция:</b> {session['role_name']}\n"
-    report += f"📏 <b>Вопросов:</b> {session['total_questions']}\n"
+    report += f"🎯 <b>Позиция:</b> {session.role_name}\n"
+    report += f"📏 <b>Вопросов:</b> {session.total_questions}\n"
 
     agents_list = []
-    for a in session['active_agents']:
-        agents_list.append(f"{a['emoji']} {a['name']}")
+    for a in map(agent_pool.get, session.agents):
+        agents_list.append(f"{a.emoji} {a.name}")
     report += f"👥 <b>Анализировали:</b> {', '.join(agents_list)}\n\n"
 
     report += "=" * 40 + "\n\n"
@@ -1066,13 +1313,15 @@ async def finish_interview(update: Update, user_id: int, context: ContextTypes.D
 
     # Чистим отчет от лишних даунов
     cleaned_report = final_report.replace('##', '').replace('**', '').replace('```', '')
-    report += f"{cleaned_report}\n\n"
 
-    report += "=" * 40 + "\n\n"
-    report += "💡 <i>Используйте /start для нового P2P собеседования с экспертами</i>"
+    footer = "\n\n" + "=" * 40 + "\n\n"
+    footer += "💡 <i>Используйте /start для нового P2P собеседования с экспертами</i>"
 
-    total_analyses = sum(len(agents) for agents in session["agent_analyses"])
-    report += f"\n\n📈 <i>Всего проведено {total_analyses} глубоких экспертных анализов</i>"
+    total_analyses = sum(len(answer.analyses) for answer in session.answers)
+    footer += f"\n\n📈 <i>Всего проведено {total_analyses} глубоких экспертных анализов</i>"
+    # Внутренняя метрика стоимости - в лог и /llmstats, кандидату она ни к чему
+    logger.info("🎯 Интервью %s: маршрутизация по типу вопроса сэкономила %s вызовов экспертов",
+                session.session_id, session.consults_saved, extra={"user_id": user_id})
 
     keyboard = [
         [InlineKeyboardButton("🔄 Новое P2P интервью", callback_data="show_interview_menu")],
@@ -1080,60 +1329,157 @@ async def finish_interview(update: Update, user_id: int, context: ContextTypes.D
         [InlineKeyboardButton("👁️‍🗨️ История", callback_data="show_history")]
     ]
 
-    await update.message.reply_text(
-        report,
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode="HTML"
-    )
+    if streamed:
+        await live.finish(cleaned_report, header=report, footer=footer, reply_markup=InlineKeyboardMarkup(keyboard))
+    else:
+        await update.message.reply_text(
+            render_html(report, cleaned_report, footer),
+            reply_markup=InlineKeyboardMarkup(keyboard),
+            parse_mode="HTML"
+        )
 
-    session["state"] = "completed"
+    session.state = "completed"
 
 
 
 # Остальные функции
 
 
-async def generate_next_question(update: Update, user_id: int, context: ContextTypes.DEFAULT_TYPE):
-    """Генерирует следующий вопрос"""
-    session = user_sessions[user_id]
-
+async def _generate_question(session):
+    """Выбирает тип и генерирует вопрос; возвращает (вопрос, тип) или None при ошибке"""
     # Выбираем случайный тип вопроса из выбранных
-    question_type = random.choice(session["question_types"])
+    question_type = random.choice(session.question_types)
     if question_type == "all":
         question_type = random.choice(["technical", "situational", "practical"])
 
+    # Сначала ищем готовый вопрос в пуле - это локальный поиск без запроса к GigaChat
+    pooled = question_pool.take(session.role, question_type, exclude=session.questions)
+    if pooled:
+        return pooled, question_type
+
     type_info = QUESTION_TYPES.get(question_type, QUESTION_TYPES["technical"])
 
     messages = [
         {"role": "system",
-         "content": f"Ты опытный HR-специалист. Сгенерируй {type_info['prompt']} для собеседования на позицию {session['role_name']}. Вопрос должен быть конкретным и релевантным для этой позиции. Верни только вопрос без дополнительных комментариев."},
+         "content": f"Ты опытный HR-специалист. Сгенерируй {type_info['prompt']} для собеседования на позицию {session.role_name}. Вопрос должен быть конкретным и релевантным для этой позиции. Верни только вопрос без дополнительных комментариев."},
     ]
 
-    question = await client.chat_completion(messages)
+    # Временные сбои уже повторены внутри клиента с backoff
+    try:
+        question = await client.chat_completion(messages, cache=False)
+    except GigaChatError as e:
+        # GigaChat недоступен (например, открыт размыкатель), а бакет типа пуст -
+        # берем любой еще не заданный вопрос из пула, пусть и другой категории
+        fallback = question_pool.take_any(session.role, exclude=session.questions)
+        logger.warning("⚠️ Не удалось сгенерировать вопрос: %s; %s", e,
+                       "берем вопрос из пула" if fallback else "в пуле тоже пусто")
+        return fallback
+    return question, question_type
+
+
+async def _generate_pool_batch(role, question_type):
+    """Генерирует пачку вопросов для пула (роль, тип вопроса)"""
+    type_info = QUESTION_TYPES[question_type]
+    role_name = ROLE_MAPPING.get(f"role_{role}", "Python разработчика")
+    messages = [
+        {"role": "system",
+         "content": f"Ты опытный HR-специалист. Сгенерируй 5 разных вопросов, каждый - {type_info['prompt']}, для собеседования на позицию {role_name}. Верни только вопросы, каждый с новой строки с номером."},
+    ]
+
+    try:
+        text = await client.chat_completion(
+            messages, max_tokens=800, temperature=0.9, priority=Priority.BACKGROUND, cache=False
+        )
+    except GigaChatError:
+        return []
+
+    questions = []
+    for line in text.strip().split('\n'):
+        line = line.strip()
+        if line and (line[0].isdigit() or '?' in line):
+            # Убираем нумерацию "1. ", "2. " и т.д.
+            questions.append(line.split('. ', 1)[-1] if '. ' in line else line)
+    return questions
+
+
+def prefetch_next_question(session):
+    """Заранее генерирует следующий вопрос в фоне, пока кандидат отвечает на текущий"""
+    cancel_prefetch(session)
+    session.prefetch = asyncio.ensure_future(_generate_question(session))
+
 
-    if question.startswith("❌"):
-        question = await client.chat_completion(messages)
+def _restore_session(data):
+    """Сессия, поднятая из хранилища после перезапуска: панель агентов и трасса строятся заново"""
+    session = InterviewSession.from_dict(data)
+    session.panel = AgentPanel(agent_pool, session.question_types)
+    session.trace = Trace(f"interview {session.session_id} {session.role} (восстановлена)")
+    return session
 
-    if question.startswith("❌"):
+
+def cancel_prefetch(session):
+    task, session.prefetch = session.prefetch, None
+    if task is not None and not task.done():
+        task.cancel()
+
+
+def _dump_trace_if_slow(session):
+    """Сохраняет водопад интервью, которое шло дольше TRACE_SLOW_INTERVIEW_S"""
+    trace = session.trace
+    if trace is None or trace.duration() < TRACE_SLOW_INTERVIEW_S:
+        return
+    try:
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        path = os.path.join(TRACE_DIR, f"{trace.name.replace(' ', '_')}_{int(trace.started_at)}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(trace.waterfall() + "\n")
+        logger.warning("🐢 Медленное интервью (%.0f с), водопад сохранен в %s", trace.duration(), path)
+    except OSError as e:
+        logger.error("❌ Не удалось сохранить водопад интервью: %s", e)
+
+
+async def generate_next_question(update: Update, user_id: int, context: ContextTypes.DEFAULT_TYPE):
+    """Выдает следующий вопрос: заранее подготовленный или сгенерированный сейчас"""
+    session = user_sessions[user_id]
+
+    generated = None
+    prefetched, session.prefetch = session.prefetch, None
+    if prefetched is not None and not prefetched.cancelled():
+        try:
+            generated = await prefetched
+        except asyncio.CancelledError:
+            # Отменили предзагрузку (cancel_prefetch, выгрузка сессии) - сгенерируем вопрос сейчас.
+            # Если же отменяют сам хендлер, отмена должна дойти до него
+            if asyncio.current_task().cancelling():
+                raise
+        except Exception as e:
+            logger.exception("❌ Ошибка предзагрузки вопроса: %s", e)
+
+    if generated is None:
+        generated = await _generate_question(session)
+
+    if generated is None:
+        error_text = ("❌ <b>Ошибка при генерации вопроса.</b>\n"
+                      "Напишите любое сообщение, чтобы попробовать еще раз.")
         if hasattr(update, 'message') and update.message:
-            await update.message.reply_text("❌ <b>Ошибка при генерации вопроса.</b>\nПопробуйте еще раз.",
-                                            parse_mode="HTML")
+            await update.message.reply_text(error_text, parse_mode="HTML")
         elif hasattr(update, 'callback_query') and update.callback_query:
-            await update.callback_query.message.reply_text(
-                "❌ <b>Ошибка при генерации вопроса.</b>\nПопробуйте еще раз.", parse_mode="HTML")
+            await update.callback_query.message.reply_text(error_text, parse_mode="HTML")
         return
 
-    session["questions"].append(question)
-    session["question_categories"].append(question_type)
+    question, question_type = generated
+    type_info = QUESTION_TYPES.get(question_type, QUESTION_TYPES["technical"])
+
+    session.questions.append(question)
+    session.question_categories.append(question_type)
 
-    current_q = session["current_question"] + 1
-    total_q = session["total_questions"]
+    current_q = session.current_question + 1
+    total_q = session.total_questions
 
     agents_for_this_question = type_info.get("agents", ["technical"])
     agents_text = ""
-    for agent_info in session["active_agents"]:
-        if agent_info["role"] in agents_for_this_question:
-            agents_text += f"{agent_info['emoji']} "
+    for agent in map(agent_pool.get, session.agents):
+        if agent.role in agents_for_this_question:
+            agents_text += f"{agent.emoji} "
 
     type_emoji = type_info["emoji"]
     type_name = type_info["name"]
@@ -1153,6 +1499,9 @@ async def generate_next_question(update: Update, user_id: int, context: ContextT
             parse_mode="HTML"
         )
 
+    if current_q < total_q:
+        prefetch_next_question(session)
+
 
 async def show_interview_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
@@ -1219,14 +1568,7 @@ async def select_question_types(update: Update, context: ContextTypes.DEFAULT_TY
     context.user_data["interview_length"] = length_type
     selected_role = context.user_data["selected_role"]
 
-    role_mapping = {
-        "role_junior_python": "Junior Python разработчика",
-        "role_middle_python": "Middle Python разработчика",
-        "role_senior_python": "Senior Python разработчика",
-        "role_data_scientist": "Data Scientist",
-        "role_team_lead": "Python Team Lead"
-    }
-    role_name = role_mapping.get(selected_role, "Python разработчика")
+    role_name = ROLE_MAPPING.get(selected_role, "Python разработчика")
 
     text = (
         f"🎯 <b>Интервью: {role_name}</b>\n"
@@ -1256,7 +1598,7 @@ async def show_history(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = query.from_user.id
     await query.answer()
 
-    if user_id not in user_sessions or user_sessions[user_id]["state"] != "completed":
+    if user_id not in user_sessions or user_sessions[user_id].state != "completed":
         await query.edit_message_text(
             "📜 <b>История пуста.</b>\n\nЗавершите хотя бы одно интервью чтобы увидеть историю.",
             parse_mode="HTML"
@@ -1264,33 +1606,32 @@ async def show_history(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     session = user_sessions[user_id]
-    history_text = f"📜 <b>История интервью ({session['role_name']}):</b>\n\n"
+    history_text = f"📜 <b>История интервью ({session.role_name}):</b>\n\n"
 
+    session_agents = [agent_pool.get(agent_id) for agent_id in session.agents]
     agents_emojis = []
-    for a in session['active_agents']:
-        agents_emojis.append(a['emoji'])
+    for a in session_agents:
+        agents_emojis.append(a.emoji)
     history_text += f"👥 <b>Эксперты:</b> {', '.join(agents_emojis)}\n\n"
 
-    for i, (qa, feedback) in enumerate(zip(session["answers"], session["feedbacks"]), 1):
-        question_type = qa.get('type', 'technical')
+    for i, (question, question_type, answer) in enumerate(
+            zip(session.questions, session.question_categories, session.answers), 1):
         type_emoji = QUESTION_TYPES.get(question_type, {}).get('emoji', '🔧')
 
         agents_for_q = []
-        for agent_info in session["active_agents"]:
-            if agent_info["role"] in QUESTION_TYPES.get(question_type, {}).get("agents", ["technical"]):
-                agents_for_q.append(agent_info["emoji"])
+        for agent in session_agents:
+            if agent.role in QUESTION_TYPES.get(question_type, {}).get("agents", ["technical"]):
+                agents_for_q.append(agent.emoji)
 
         agents_str = " ".join(agents_for_q)
-        history_text += f"{agents_str} <b>Вопрос {i}:</b> {qa['question'][:80]}...\n"
+        history_text += f"{agents_str} <b>Вопрос {i}:</b> {question[:80]}...\n"
         history_text += f"<b>Тип:</b> {question_type}\n"
-        history_text += f"<b>Ответ HR:</b> {feedback[:100]}...\n\n"
+        history_text += f"<b>Ответ HR:</b> {answer.feedback[:100]}...\n\n"
 
         # Показываем вердикты экспертов
-        if i <= len(session["agent_analyses"]):
-            for analysis in session["agent_analyses"][i - 1]:
-                agent_name = analysis.get("agent", "Агент")
-                verdict = analysis.get("analysis", {}).get("verdict", "Нет вердикта")[:50]
-                history_text += f"  {analysis.get('emoji', '👤')} {agent_name}: {verdict}...\n"
+        for analysis in answer.analyses:
+            agent = agent_pool.get(analysis.agent)
+            history_text += f"  {agent.emoji} {agent.name}: {analysis.verdict[:50]}...\n"
 
         history_text += "─" * 30 + "\n\n"
 
@@ -1331,26 +1672,28 @@ async def callback_router(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     data = query.data
 
-    try:
-        if data == "show_interview_menu":
-            await show_interview_menu(update, context)
-        elif data == "show_agents":
-            await show_agents(update, context)
-        elif data.startswith("role_"):
-            await start_interview(update, context)
-        elif data.startswith("length_"):
-            await select_question_types(update, context)
-        elif data.startswith("types_"):
-            await launch_interview(update, context)
-        elif data == "show_history":
-            await show_history(update, context)
-        elif data == "back_to_start":
-            await back_to_start(update, context)
-        else:
-            await query.answer("Неизвестная команда")
-    except Exception as e:
-        print(f"💥 Ошибка в callback_router: {e}")
-        await query.answer("Произошла ошибка", show_alert=True)
+    await user_sessions.ensure(query.from_user.id)
+    with log_context(user_id=query.from_user.id):
+        try:
+            if data == "show_interview_menu":
+                await show_interview_menu(update, context)
+            elif data == "show_agents":
+                await show_agents(update, context)
+            elif data.startswith("role_"):
+                await start_interview(update, context)
+            elif data.startswith("length_"):
+                await select_question_types(update, context)
+            elif data.startswith("types_"):
+                await launch_interview(update, context)
+            elif data == "show_history":
+                await show_history(update, context)
+            elif data == "back_to_start":
+                await back_to_start(update, context)
+            else:
+                await query.answer("Неизвестная команда")
+        except Exception as e:
+            logger.exception("💥 Ошибка в callback_router: %s", e)
+            await query.answer("Произошла ошибка", show_alert=True)
 
 
 async def interview_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1361,33 +1704,186 @@ async def agents_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await show_agents(update, context)
 
 
+async def llm_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Очереди планировщика запросов к GigaChat по классам приоритета и статистика кэша"""
+    # Внутренности бота не для кандидатов: для остальных команды как будто нет
+    if update.effective_user.id not in ADMIN_USER_IDS:
+        logger.warning("🚫 /llmstats от пользователя не из ADMIN_USER_IDS", extra={"user_id": update.effective_user.id})
+        return
+    stats = client.scheduler.stats()
+    text = (f"📡 <b>Запросы к GigaChat:</b> {stats['active']}/{stats['max_concurrency']} активно, "
+            f"лимит {stats['rate']:g} запр/с\n\n")
+    for name, s in stats["classes"].items():
+        text += (f"<b>{name}</b>: в очереди {s['queued']}, обслужено {s['served']}, "
+                 f"ожидание ср. {s['avg_wait_s']:.2f} с / макс. {s['max_wait_s']:.2f} с\n")
+    api_stats = client.api.stats()
+    text += (f"\n⚡ <b>Размыкатель цепи:</b> {api_stats['breaker']['state']}, "
+             f"сбоев подряд {api_stats['breaker']['consecutive_failures']}, "
+             f"отклонено {api_stats['breaker']['rejected']}, повторов {api_stats['retries']}\n")
+    if api_stats["ledger"] is not None:
+        ledger = api_stats["ledger"]
+        text += f"📒 <b>Журнал вызовов:</b> записано {ledger['written']}, потеряно {ledger['dropped']}\n"
+    if api_stats["replay"] is not None:
+        replay = api_stats["replay"]
+        text += f"⏪ <b>Replay:</b> попаданий {replay['hits']}, промахов {replay['misses']}\n"
+    watchdog = context.application.bot_data.get("loop_watchdog")
+    if watchdog is not None:
+        loop = watchdog.stats()
+        text += (f"🧊 <b>Event loop:</b> остановок {loop['stalls']}, задержка ср. {loop['avg_lag_s'] * 1000:.1f} мс "
+                 f"/ макс. {loop['max_lag_s'] * 1000:.0f} мс\n")
+    text += f"🎯 <b>Маршрутизация сэкономила вызовов экспертов:</b> {routing_stats['consults_saved']}\n"
+    flights = client.api.singleflight.stats()
+    text += f"🔗 <b>Объединено одинаковых запросов:</b> {flights['coalesced']} (вызовов {flights['calls']})\n"
+    if client.api.cache is not None:
+        cache = client.api.cache.stats()
+        text += (f"🗄 <b>Кэш ответов:</b> {cache['entries']} записей, попаданий {cache['hits']} "
+                 f"(+{cache['disk_hits']} с диска), промахов {cache['misses']}, "
+                 f"hit rate {cache['hit_rate']:.0%}\n")
+    sessions = user_sessions.stats()
+    evicted = ", ".join(f"{reason} {count}" for reason, count in sessions["evictions"].items()) or "нет"
+    text += (f"💾 <b>Сессии:</b> в памяти {sessions['hot']} ({sessions['resident_bytes'] / 1024:.0f} КБ), "
+             f"ждут записи {sessions['dirty']}, записано {sessions['written']}, "
+             f"поднято с диска {sessions['rehydrated']}, выгружено: {evicted}\n")
+    await update.message.reply_text(text, parse_mode="HTML")
+
+
+async def trace_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Водопад текущего (или последнего) интервью пользователя"""
+    session = await user_sessions.ensure(update.effective_user.id)
+    if session is None or session.trace is None:
+        await update.message.reply_text("🤷 <b>Интервью еще не было</b>", parse_mode="HTML")
+        return
+    waterfall = session.trace.waterfall(width=24)
+    # Длинный водопад обрезаем с начала - самое интересное обычно в конце
+    if len(waterfall) > 3900:
+        waterfall = "…\n" + waterfall[-3900:]
+    await update.message.reply_text(f"<pre>{html.escape(waterfall)}</pre>", parse_mode="HTML")
+
+
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
-    print(f"❌ Ошибка: {context.error}")
+    logger.error("❌ Ошибка: %s", context.error, exc_info=context.error)
+
+
+async def on_startup(application: Application):
+    """Создает сервисы, запускает пополнение пула вопросов, а прогрев откладывает в фон.
+
+    Все, что не нужно для первого getUpdates (импорт aiohttp, /metrics, токен GigaChat),
+    делает _warm_up уже после начала polling.
+    """
+    await init_services()
+    _startup_marks["services"] = time.perf_counter()
+
+    roles = [selected_role.replace("role_", "") for selected_role in ROLE_MAPPING]
+    keys = [(role, question_type) for role in roles for question_type in ("technical", "situational", "practical")]
+    application.bot_data["question_pool_worker"] = asyncio.create_task(question_pool.run_worker(
+        keys, _generate_pool_batch,
+        is_idle=lambda: client.transport.in_flight <= POOL_IDLE_MAX_IN_FLIGHT
+    ))
+
+    watchdog = application.bot_data.get("loop_watchdog")
+    if watchdog is not None:
+        watchdog.start()
+        logger.info("🐕 Сторож event loop запущен, порог %.2f с", watchdog.threshold)
+
+    application.bot_data["warm_up"] = asyncio.create_task(_warm_up(application))
+    _log_startup_timing()
+
+
+async def _warm_up(application: Application):
+    # aiohttp импортируется ~0.1 с - в потоке, чтобы не задерживать обработку первых апдейтов
+    await asyncio.to_thread(importlib.import_module, "aiohttp.web")
+
+    if METRICS_PORT:
+        try:
+            application.bot_data["metrics_server"] = await start_metrics_server(METRICS_PORT)
+            logger.info("📈 Метрики: http://127.0.0.1:%s/metrics", METRICS_PORT)
+        except OSError as e:
+            logger.error("❌ Не удалось поднять /metrics на порту %s: %s", METRICS_PORT, e)
+
+    # Токен заранее, чтобы первый кандидат не ждал OAuth; при воспроизведении журнала сеть не нужна
+    if client.api.replay is None:
+        started = time.perf_counter()
+        try:
+            await client.tokens.get_token()
+            logger.info("🔥 Прогрев завершен, токен GigaChat за %.0f мс", (time.perf_counter() - started) * 1000)
+        except GigaChatError as e:
+            logger.error("❌ Прогрев: не удалось получить токен GigaChat: %s", e)
+
+
+def _log_startup_timing():
+    marks = _startup_marks
+    now = time.perf_counter()
+    timings = {
+        "import_ms": (marks["imported"] - marks["start"]) * 1000,
+        "build_ms": (marks.get("built", marks["imported"]) - marks["imported"]) * 1000,
+        "services_ms": (marks["services"] - marks.get("built", marks["imported"])) * 1000,
+        "total_ms": (now - marks["start"]) * 1000,
+    }
+    logger.info("⏱ Старт за %.0f мс: импорт %.0f, сборка приложения %.0f, сервисы %.0f",
+                timings["total_ms"], timings["import_ms"], timings["build_ms"], timings["services_ms"],
+                extra={key: round(value, 1) for key, value in timings.items()})
+
+
+async def on_shutdown(application: Application):
+    """Останавливаем фоновые задачи и закрываем общий пул соединений GigaChat"""
+    for name in ("question_pool_worker", "warm_up"):
+        task = application.bot_data.pop(name, None)
+        if task is not None:
+            task.cancel()
+    watchdog = application.bot_data.get("loop_watchdog")
+    if watchdog is not None:
+        watchdog.stop()
+    metrics_server = application.bot_data.pop("metrics_server", None)
+    if metrics_server is not None:
+        await metrics_server.cleanup()
+    await container.shutdown()
+
+
+class TracedRequest(HTTPXRequest):
+    """HTTP-клиент Bot API, у которого каждый вызов - этап трассировки telegram.<метод>"""
+
+    async def do_request(self, url, *args, **kwargs):
+        with span(f"telegram.{url.rsplit('/', 1)[-1]}"):
+            return await super().do_request(url, *args, **kwargs)
 
 
 def main():
     token = os.getenv("TELEGRAM_BOT_TOKEN")
     if not token:
-        print("❌ ОШИБКА: TELEGRAM_BOT_TOKEN не найден!")
+        logger.error("❌ ОШИБКА: TELEGRAM_BOT_TOKEN не найден!")
         return
 
-    print("🚀 Запускаем бота...")
-    print("👥 Нынешние агенты с ИИ:")
-    print("   🔧 Технический специалист - глубокий анализ кода")
-    print("   📈 Карьерный консультант - план развития")
-    print("   👨‍💼 Психолог-Тимлид - оценка софт скиллов")
-
-    application = Application.builder().token(token).build()
+    logger.info("🚀 Запускаем бота...")
+    logger.info("👥 Нынешние агенты с ИИ: 🔧 Технический специалист - глубокий анализ кода, "
+                "📈 Карьерный консультант - план развития, 👨‍💼 Психолог-Тимлид - оценка софт скиллов")
+
+    application = (
+        Application.builder()
+        .token(token)
+        .request(TracedRequest())
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
+    if LOOP_WATCHDOG:
+        # Стартует в on_startup, когда уже работает event loop приложения
+        application.bot_data["loop_watchdog"] = LoopStallDetector(threshold=LOOP_STALL_THRESHOLD)
     application.add_handler(CallbackQueryHandler(callback_router))
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("interview", interview_command))
     application.add_handler(CommandHandler("agents", agents_command))
+    application.add_handler(CommandHandler("llmstats", llm_stats_command))
+    application.add_handler(CommandHandler("trace", trace_command))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
     application.add_error_handler(error_handler)
+    _startup_marks["built"] = time.perf_counter()
 
-    print("✅ P2P бот запущен с мультиагентной системой!")
+    logger.info("✅ P2P бот запущен с мультиагентной системой!")
     application.run_polling()
 
 
+_startup_marks["imported"] = time.perf_counter()
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,13 +1,21 @@
 import os
-import requests
 import time
-import uuid
 import json
 import sqlite3
+from collections import OrderedDict
+from collections.abc import MutableMapping
 from datetime import datetime
 from typing import Optional, Dict, List, Tuple
 from enum import Enum
 
+from gigachat_transport import GigaChatAPI, GigaChatError, create_api, get_api
+from utils.db import SQLitePool
+from utils.logger import get_logger
+from utils.scheduler import Priority
+
+
+logger = get_logger("gigachat_client")
+
 
 class InterviewState(Enum):
     NOT_STARTED = "not_started"
@@ -23,17 +31,78 @@ class InterviewType(Enum):
     PYTHON_TEAM_LEAD = "python_team_lead"
 
 
+class BoundedSessions(MutableMapping):
+    """Сессии интервью в памяти с ограничением: не больше max_entries (LRU)
+    и не дольше ttl секунд без обращений. Брошенные интервью не копятся вечно.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evicted = 0
+        # Порядок - от давно не использованных к недавним
+        self._items: "OrderedDict[int, Tuple[float, Dict]]" = OrderedDict()
+
+    def __getitem__(self, user_id: int) -> Dict:
+        seen, session = self._items[user_id]
+        if time.monotonic() - seen >= self.ttl:
+            del self._items[user_id]
+            self.evicted += 1
+            raise KeyError(user_id)
+        self._items[user_id] = (time.monotonic(), session)
+        self._items.move_to_end(user_id)
+        return session
+
+    def __setitem__(self, user_id: int, session: Dict):
+        self._items[user_id] = (time.monotonic(), session)
+        self._items.move_to_end(user_id)
+        self._evict()
+
+    def __delitem__(self, user_id: int):
+        del self._items[user_id]
+
+    def __contains__(self, user_id) -> bool:
+        try:
+            self[user_id]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._items:
+            user_id, (seen, _) = next(iter(self._items.items()))
+            if len(self._items) <= self.max_entries and now - seen < self.ttl:
+                break
+            del self._items[user_id]
+            self.evicted += 1
+
+
 class GigaChatHRClient:
-    def __init__(self):
-        self.access_token = None
-        self.token_expires = 0
-        self.interview_sessions = {}
+    def __init__(self, api: Optional[GigaChatAPI] = None, base_url: Optional[str] = None,
+                 oauth_url: Optional[str] = None, db: Optional[SQLitePool] = None,
+                 max_sessions: int = 1000, session_ttl: float = 3600):
+        if api is None:
+            api = create_api(base_url, oauth_url) if base_url or oauth_url else get_api()
+        self.api = api
+        self.interview_sessions = BoundedSessions(max_sessions, session_ttl)
         self.agent_analyses = {}  # Для хранения анализов от агентов
+        self.db = db
         self._init_database()
 
     def _init_database(self):
         """Инициализация базы данных для истории собеседований"""
-        self.conn = sqlite3.connect('interview_history.db', check_same_thread=False)
+        path = os.getenv("INTERVIEW_HISTORY_DB", "interview_history.db")
+        if self.db is not None:
+            self.conn = self.db.connect(path)
+        else:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
         cursor = self.conn.cursor()
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS interviews (
@@ -53,48 +122,6 @@ class GigaChatHRClient:
         ''')
         self.conn.commit()
 
-    def _update_access_token(self) -> bool:
-        """Получаем access token используя Authorization key в Basic Auth"""
-        try:
-            auth_key = os.getenv("GIGACHAT_AUTH_CODE")
-            url = "https://ngw.devices.sberbank.ru:9443/api/v2/oauth"
-            rq_uid = str(uuid.uuid4())
-
-            headers = {
-                'Content-Type': 'application/x-www-form-urlencoded',
-                'Accept': 'application/json',
-                'RqUID': rq_uid,
-                'Authorization': f'Basic {auth_key}'
-            }
-
-            data = {'scope': 'GIGACHAT_API_PERS'}
-
-            response = requests.post(
-                url,
-                headers=headers,
-                data=data,
-                verify=False,
-                timeout=30
-            )
-
-            if response.status_code == 200:
-                token_data = response.json()
-                self.access_token = token_data['access_token']
-                self.token_expires = time.time() + token_data.get('expires_in', 1800) - 60
-                return True
-            else:
-                print(f"❌ Ошибка получения token: {response.status_code}")
-                return False
-
-        except Exception as e:
-            print(f"💥 Исключение: {str(e)}")
-            return False
-
-    def _check_and_refresh_token(self) -> bool:
-        if not self.access_token or time.time() > self.token_expires:
-            return self._update_access_token()
-        return True
-
     def _get_interview_prompt(self, interview_type: InterviewType) -> str:
         """Генерирует промпт для создания уникальных вопросов"""
         prompts = {
@@ -165,45 +192,30 @@ class GigaChatHRClient:
         }
         return prompts.get(interview_type, prompts[InterviewType.MIDDLE_PYTHON])
 
-    def _generate_questions(self, interview_type: InterviewType) -> List[Dict]:
+    async def _generate_questions(self, interview_type: InterviewType) -> List[Dict]:
         """Генерирует уникальные вопросы через GigaChat"""
-        if not self._check_and_refresh_token():
-            # Возвращаем вопросы по умолчанию если GigaChat недоступен
-            return self._get_default_questions(interview_type)
-
         try:
-            url = "https://gigachat.devices.sberbank.ru/api/v1/chat/completions"
-
-            headers = {
-                'Authorization': f'Bearer {self.access_token}',
-                'Content-Type': 'application/json',
-                'Accept': 'application/json'
-            }
-
             messages = [
                 {"role": "system",
                  "content": "Ты - опытный HR-специалист, который создает уникальные вопросы для технических собеседований."},
                 {"role": "user", "content": self._get_interview_prompt(interview_type)}
             ]
 
-            data = {
-                'model': 'GigaChat',
-                'messages': messages,
-                'temperature': 0.9,  # Высокая температура для разнообразия
-                'max_tokens': 1000
-            }
-
-            response = requests.post(url, headers=headers, json=data, verify=False, timeout=30)
+            questions_text = await self.api.complete(
+                messages,
+                temperature=0.9,  # Высокая температура для разнообразия
+                max_tokens=1000,
+                cache=False  # из кэша все кандидаты получали бы один и тот же набор вопросов
+            )
+            return self._parse_questions(questions_text)
 
-            if response.status_code == 200:
-                result = response.json()
-                questions_text = result['choices'][0]['message']['content']
-                return self._parse_questions(questions_text)
-            else:
-                return self._get_default_questions(interview_type)
+        except GigaChatError as e:
+            # Возвращаем вопросы по умолчанию если GigaChat недоступен
+            logger.warning("⚠️ GigaChat недоступен, вопросы по умолчанию: %s", e)
+            return self._get_default_questions(interview_type)
 
         except Exception as e:
-            print(f"💥 Ошибка генерации вопросов: {str(e)}")
+            logger.exception("💥 Ошибка генерации вопросов: %s", e)
             return self._get_default_questions(interview_type)
 
     def _parse_questions(self, questions_text: str) -> List[Dict]:
@@ -290,47 +302,24 @@ class GigaChatHRClient:
         }
         return prompts.get(agent_type, prompts["technical"])
 
-    def _send_message_to_gigachat(self, messages: List[Dict]) -> Optional[str]:
-        """Отправляет сообщение в GigaChat API"""
-        if not self._check_and_refresh_token():
-            return None
-
+    async def _send_message_to_gigachat(self, messages: List[Dict],
+                                        priority: Priority = Priority.INTERACTIVE) -> Optional[str]:
+        """Отправляет сообщение в GigaChat API; None, если GigaChat недоступен"""
         try:
-            url = "https://gigachat.devices.sberbank.ru/api/v1/chat/completions"
-
-            headers = {
-                'Authorization': f'Bearer {self.access_token}',
-                'Content-Type': 'application/json',
-                'Accept': 'application/json'
-            }
-
-            data = {
-                'model': 'GigaChat',
-                'messages': messages,
-                'temperature': 0.7,
-                'max_tokens': 800
-            }
-
-            response = requests.post(url, headers=headers, json=data, verify=False, timeout=30)
-
-            if response.status_code == 200:
-                result = response.json()
-                return result['choices'][0]['message']['content']
-            else:
-                return None
+            return await self.api.complete(messages, temperature=0.7, max_tokens=800, priority=priority)
 
         except Exception as e:
-            print(f"💥 Ошибка GigaChat: {str(e)}")
+            logger.exception("💥 Ошибка GigaChat: %s", e)
             return None
 
-    def analyze_with_agent(self, user_id: int, agent_type: str, question: str, answer: str, role: str) -> Optional[
+    async def analyze_with_agent(self, user_id: int, agent_type: str, question: str, answer: str, role: str) -> Optional[
         Dict]:
         """Анализирует ответ с помощью конкретного агента"""
         prompt = self._get_agent_analysis_prompt(agent_type, question, answer, role)
 
-        result = self._send_message_to_gigachat([
+        result = await self._send_message_to_gigachat([
             {"role": "system", "content": prompt}
-        ])
+        ], priority=Priority.ANALYSIS)
 
         if result:
             try:
@@ -352,10 +341,10 @@ class GigaChatHRClient:
                 }
         return None
 
-    def start_interview(self, user_id: int, interview_type: InterviewType) -> str:
+    async def start_interview(self, user_id: int, interview_type: InterviewType) -> str:
         """Начинает новое интервью с генерацией уникальных вопросов"""
-        print(f"🎯 Генерация вопросов для {interview_type.value}...")
-        questions = self._generate_questions(interview_type)
+        logger.info("🎯 Генерация вопросов для %s...", interview_type.value)
+        questions = await self._generate_questions(interview_type)
 
         self.interview_sessions[user_id] = {
             'state': InterviewState.IN_PROGRESS,
@@ -371,7 +360,7 @@ class GigaChatHRClient:
         type_name = self._get_interview_type_name(interview_type)
         return f"🎯 **Начинаем {type_name}!**\n\n💬 **Вопрос 1/5:**\n{first_question}"
 
-    def process_answer(self, user_id: int, user_answer: str, agents: List[str] = None, role: str = "") -> str:
+    async def process_answer(self, user_id: int, user_answer: str, agents: List[str] = None, role: str = "") -> str:
         """Обрабатывает ответ пользователя с мультиагентным анализом"""
         if user_id not in self.interview_sessions:
             return "❌ Собеседование не начато. Используйте /interview чтобы начать."
@@ -389,7 +378,7 @@ class GigaChatHRClient:
         if agents and role:
             agent_analyses = []
             for agent_type in agents:
-                analysis = self.analyze_with_agent(
+                analysis = await self.analyze_with_agent(
                     user_id,
                     agent_type,
                     session['questions'][current_q_index]['question'],
@@ -409,13 +398,13 @@ class GigaChatHRClient:
 
         # Проверяем, закончилось ли интервью
         if session['current_question'] >= len(session['questions']):
-            return self._generate_multilagent_feedback(user_id)
+            return await self._generate_multilagent_feedback(user_id)
         else:
             next_question = session['questions'][session['current_question']]['question']
             progress = f"({session['current_question'] + 1}/{len(session['questions'])})"
             return f"📝 **Вопрос {progress}:**\n{next_question}"
 
-    def _generate_multilagent_feedback(self, user_id: int) -> str:
+    async def _generate_multilagent_feedback(self, user_id: int) -> str:
         """Генерирует фидбек на основе анализов всех агентов"""
         session = self.interview_sessions[user_id]
         session['state'] = InterviewState.COMPLETED
@@ -434,7 +423,7 @@ class GigaChatHRClient:
 
         summary_prompt += "Создай структурированный отчет с общими выводами и рекомендациями."
 
-        feedback = self._send_message_to_gigachat([
+        feedback = await self._send_message_to_gigachat([
             {"role": "system", "content": summary_prompt}
         ])
 
@@ -470,7 +459,7 @@ class GigaChatHRClient:
             ))
             self.conn.commit()
         except Exception as e:
-            print(f"💥 Ошибка сохранения истории: {str(e)}")
+            logger.exception("💥 Ошибка сохранения истории: %s", e)
 
     def _extract_score(self, feedback: str) -> int:
         """Пытается извлечь оценку из текста фидбека"""
@@ -536,4 +525,8 @@ class GigaChatHRClient:
         if user_id in self.interview_sessions:
             del self.interview_sessions[user_id]
             return "❌ Собеседование прервано."
-        return "❌ Активное собеседование не найдено."
\ No newline at end of file
+        return "❌ Активное собеседование не найдено."
+
+    def close(self):
+        if self.db is None:
+            self.conn.close()
@@ -0,0 +1,695 @@
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import contextvars
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from utils.cache import ResponseCache, make_cache_key
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from utils.db import SQLitePool
+from utils.scheduler import Priority, PriorityScheduler
+from utils.singleflight import SingleFlight
+from utils.ledger import LedgerReplay, LLMLedger
+from utils.logger import get_logger
+from utils.tracing import current_stage, current_tags, span
+
+if TYPE_CHECKING:
+    import aiohttp
+
+
+logger = get_logger("gigachat")
+
+GIGACHAT_OAUTH_URL = "https://ngw.devices.sberbank.ru:9443/api/v2/oauth"
+GIGACHAT_API_URL = "https://gigachat.devices.sberbank.ru/api/v1"
+
+
+class GigaChatError(Exception):
+    """Базовая ошибка обращения к GigaChat"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class GigaChatAuthError(GigaChatError):
+    """Не удалось получить токен или токен отвергнут (401)"""
+
+
+class GigaChatRateLimitError(GigaChatError):
+    """429: превышен лимит запросов; retry_after - подсказка сервера в секундах"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message, status=429)
+        self.retry_after = retry_after
+
+
+class GigaChatServerError(GigaChatError):
+    """5xx на стороне GigaChat"""
+
+
+class GigaChatTransportError(GigaChatError):
+    """Сеть, таймаут или неразборчивый ответ"""
+
+
+class GigaChatRequestError(GigaChatError):
+    """Прочие 4xx - повторять такой запрос бессмысленно"""
+
+
+class GigaChatUnavailableError(GigaChatError):
+    """Размыкатель цепи открыт - запрос отклонен без обращения к GigaChat"""
+
+
+def _raise_for_status(status: int, body: object, headers):
+    if status == 200:
+        return
+    detail = f"{status}: {str(body)[:200]}"
+    if status == 401:
+        raise GigaChatAuthError(detail, status=status)
+    if status == 429:
+        retry_after = headers.get('Retry-After')
+        try:
+            retry_after = float(retry_after) if retry_after is not None else None
+        except ValueError:
+            retry_after = None
+        raise GigaChatRateLimitError(detail, retry_after=retry_after)
+    if status >= 500:
+        raise GigaChatServerError(detail, status=status)
+    raise GigaChatRequestError(detail, status=status)
+
+
+_call_counter = contextvars.ContextVar("gigachat_call_counter", default=None)
+
+
+class CallCounter:
+    """Считает запросы /chat/completions внутри блока `with CallCounter() as counter:`.
+
+    Счетчик хранится в contextvar, поэтому учитываются и вызовы из задач,
+    запущенных внутри блока (например, параллельные консультации агентов).
+    Вложенные счетчики считают вызов каждый.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._parent = None
+        self._token = None
+
+    def __enter__(self):
+        parent = _call_counter.get()
+        if parent is not self:
+            self._parent = parent
+        self._token = _call_counter.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _call_counter.reset(self._token)
+        return False
+
+
+def _count_call():
+    counter = _call_counter.get()
+    while counter is not None:
+        counter.calls += 1
+        counter = counter._parent
+
+
+def _count_usage(usage: Dict):
+    counter = _call_counter.get()
+    while counter is not None:
+        counter.prompt_tokens += usage.get('prompt_tokens', 0)
+        counter.completion_tokens += usage.get('completion_tokens', 0)
+        counter = counter._parent
+
+
+class GigaChatTransport:
+    """Асинхронный транспорт к GigaChat поверх общего пула keep-alive соединений.
+
+    Один экземпляр разделяется всеми клиентами, агентами и хендлерами,
+    поэтому TCP/TLS-соединения переиспользуются между запросами.
+    """
+
+    def __init__(self, limit: Optional[int] = None, limit_per_host: Optional[int] = None,
+                 timeout: float = 30, keepalive_timeout: float = 60,
+                 base_url: Optional[str] = None, oauth_url: Optional[str] = None):
+        # Адреса переопределяются, чтобы направить бота на локальную заглушку (bench/mock_gigachat.py)
+        self.base_url = (base_url or os.getenv("GIGACHAT_API_URL") or GIGACHAT_API_URL).rstrip('/')
+        self.oauth_url = oauth_url or os.getenv("GIGACHAT_OAUTH_URL") or GIGACHAT_OAUTH_URL
+        self.limit = limit if limit is not None else int(os.getenv("GIGACHAT_POOL_LIMIT", "100"))
+        self.limit_per_host = (limit_per_host if limit_per_host is not None
+                               else int(os.getenv("GIGACHAT_POOL_LIMIT_PER_HOST", "20")))
+        self.timeout = timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.in_flight = 0
+        self._session: Optional["aiohttp.ClientSession"] = None
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        """Лениво создает сессию внутри работающего event loop"""
+        # aiohttp импортируется при первом запросе, а не при импорте бота: это ~0.1 с старта
+        import aiohttp
+
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ssl=False  # как и verify=False в прежних вызовах requests
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def post(self, url: str, headers: Dict, json: Optional[Dict] = None,
+                   data: Optional[Dict] = None) -> Tuple[int, object, Dict]:
+        """POST-запрос, возвращает (статус, тело, заголовки); тело - dict для JSON-ответов, иначе текст.
+
+        Сетевые сбои и таймауты превращаются в GigaChatTransportError.
+        """
+        import aiohttp
+
+        session = self._get_session()
+        self.in_flight += 1
+        try:
+            async with session.post(url, headers=headers, json=json, data=data) as response:
+                if response.content_type == 'application/json':
+                    body = await response.json()
+                else:
+                    body = await response.text()
+                return response.status, body, response.headers
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise GigaChatTransportError(f"{type(e).__name__}: {e}") from e
+        finally:
+            self.in_flight -= 1
+
+    async def fetch_token(self, auth_key: str, scope: str = 'GIGACHAT_API_PERS') -> Tuple[int, object]:
+        """Запрашивает access token на OAuth-эндпоинте ngw"""
+        headers = {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Accept': 'application/json',
+            'RqUID': str(uuid.uuid4()),
+            'Authorization': f'Basic {auth_key}'
+        }
+        status, body, _ = await self.post(self.oauth_url, headers=headers, data={'scope': scope})
+        return status, body
+
+    async def chat_completion(self, access_token: str, messages: List[Dict], max_tokens: int = 500,
+                              temperature: float = 0.7, model: str = 'GigaChat') -> Dict:
+        """Отправляет запрос /chat/completions; любой статус кроме 200 - типизированная GigaChatError"""
+        headers = {
+            'Authorization': f'Bearer {access_token}',
+            'Content-Type': 'application/json',
+            'Accept': 'application/json'
+        }
+        data = {
+            'model': model,
+            'messages': messages,
+            'temperature': temperature,
+            'max_tokens': max_tokens
+        }
+        _count_call()
+        status, body, response_headers = await self.post(
+            f"{self.base_url}/chat/completions", headers=headers, json=data
+        )
+        _raise_for_status(status, body, response_headers)
+        if not isinstance(body, dict):
+            raise GigaChatTransportError(f"Ожидался JSON, получено: {str(body)[:200]}")
+        _count_usage(body.get('usage', {}))
+        return body
+
+    async def chat_completion_stream(self, access_token: str, messages: List[Dict],
+                                     on_delta: Callable[[str], Awaitable[None]], max_tokens: int = 500,
+                                     temperature: float = 0.7, model: str = 'GigaChat') -> str:
+        """Потоковый /chat/completions (server-sent events).
+
+        on_delta вызывается на каждый фрагмент текста; возвращается полный ответ.
+        """
+        headers = {
+            'Authorization': f'Bearer {access_token}',
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream'
+        }
+        data = {
+            'model': model,
+            'messages': messages,
+            'temperature': temperature,
+            'max_tokens': max_tokens,
+            'stream': True
+        }
+        import aiohttp
+
+        _count_call()
+        session = self._get_session()
+        self.in_flight += 1
+        try:
+            # Общий таймаут сессии оборвал бы длинный поток - ограничиваем только паузы между фрагментами
+            timeout = aiohttp.ClientTimeout(total=None, sock_read=self.timeout)
+            async with session.post(f"{self.base_url}/chat/completions", headers=headers, json=data,
+                                    timeout=timeout) as response:
+                if response.status != 200:
+                    _raise_for_status(response.status, await response.text(), response.headers)
+
+                parts = []
+                async for raw_line in response.content:
+                    line = raw_line.decode('utf-8').strip()
+                    if not line.startswith('data:'):
+                        continue
+                    payload = line[len('data:'):].strip()
+                    if payload == '[DONE]':
+                        break
+                    chunk = json.loads(payload)
+                    if chunk.get('usage'):
+                        _count_usage(chunk['usage'])
+                    choices = chunk.get('choices') or [{}]
+                    delta = choices[0].get('delta', {}).get('content', '')
+                    if delta:
+                        parts.append(delta)
+                        await on_delta(delta)
+                return ''.join(parts)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            raise GigaChatTransportError(f"{type(e).__name__}: {e}") from e
+        finally:
+            self.in_flight -= 1
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+class TokenManager:
+    """Access token GigaChat, общий для всех клиентов процесса.
+
+    Токен обновляется в фоне за refresh_margin секунд до истечения,
+    а конкурентные вызовы refresh() ждут один и тот же запрос к ngw.
+    """
+
+    def __init__(self, transport: GigaChatTransport, auth_key: Optional[str] = None,
+                 scope: Optional[str] = None, refresh_margin: float = 120):
+        self.transport = transport
+        self.auth_key = auth_key or os.getenv("GIGACHAT_AUTH_CODE")
+        self.scope = scope or os.getenv("GIGACHAT_SCOPE", "GIGACHAT_API_PERS")
+        self.refresh_margin = refresh_margin
+        self.access_token: Optional[str] = None
+        self.expires_at = 0.0
+        self.refresh_count = 0
+        self._inflight: Optional[asyncio.Future] = None
+        self._background: Optional[asyncio.Task] = None
+
+    def _is_valid(self) -> bool:
+        return self.access_token is not None and time.time() < self.expires_at
+
+    async def get_token(self) -> str:
+        """Возвращает действующий токен, при необходимости дожидаясь обновления"""
+        if self._is_valid():
+            return self.access_token
+        return await self.refresh()
+
+    async def refresh(self) -> str:
+        """Обновляет токен; параллельные вызовы разделяют один запрос"""
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.ensure_future(self._fetch())
+        # shield: отмена одного ожидающего не должна отменять общий запрос
+        return await asyncio.shield(self._inflight)
+
+    def invalidate(self, token: Optional[str]):
+        """Помечает токен недействительным (например, после 401)"""
+        if token is not None and token == self.access_token:
+            self.access_token = None
+            self.expires_at = 0.0
+
+    async def _fetch(self) -> str:
+        """Запрос к ngw. Сеть и 5xx - GigaChatTransportError/GigaChatServerError, как у
+        /chat/completions: размыкатель цепи должен видеть и недоступность OAuth"""
+        logger.debug("🔐 Получаем токен GigaChat...")
+        status, token_data = await self.transport.fetch_token(self.auth_key, self.scope)
+
+        if status != 200:
+            logger.error("❌ Ошибка получения token: %s", status)
+            if status == 429 or status >= 500:
+                _raise_for_status(status, token_data, {})
+            raise GigaChatAuthError(f"Не удалось получить токен GigaChat: {status}: {str(token_data)[:200]}",
+                                    status=status)
+
+        try:
+            self.access_token = token_data['access_token']
+            self.expires_at = self._parse_expiry(token_data)
+        except (KeyError, TypeError, ValueError) as e:
+            raise GigaChatTransportError(f"Неразборчивый ответ OAuth: {type(e).__name__}: {e}") from e
+        self.refresh_count += 1
+        self._schedule_refresh()
+        logger.info("✅ GigaChat token получен", extra={"expires_at": self.expires_at})
+        return self.access_token
+
+    @staticmethod
+    def _parse_expiry(token_data: Dict) -> float:
+        # ngw отдает expires_at в миллисекундах, старые ответы - expires_in в секундах
+        if 'expires_at' in token_data:
+            return token_data['expires_at'] / 1000
+        return time.time() + token_data.get('expires_in', 1800)
+
+    def _schedule_refresh(self):
+        if self._background is not None and not self._background.done():
+            self._background.cancel()
+        delay = max(self.expires_at - time.time() - self.refresh_margin, 1)
+        self._background = asyncio.ensure_future(self._refresh_later(delay))
+
+    async def _refresh_later(self, delay: float):
+        await asyncio.sleep(delay)
+        self._background = None
+        try:
+            await self.refresh()
+        except GigaChatError as e:
+            # Не страшно: токен еще действует, а по истечении его запросит первый же вызов
+            logger.warning("⚠️ Фоновое обновление токена не удалось: %s", e)
+
+    async def call(self, request: Callable[[str], Awaitable]):
+        """Выполняет request(token); на 401 обновляет токен и повторяет запрос один раз"""
+        token = await self.get_token()
+        try:
+            return await request(token)
+        except GigaChatAuthError:
+            self.invalidate(token)
+            # Если токен уже обновил соседний запрос (или обновление идет) - берем его,
+            # а не запускаем еще одно: десять запросов со старым токеном - один поход в OAuth
+            fresh = await self.get_token()
+            if fresh == token:
+                fresh = await self.refresh()
+            return await request(fresh)
+
+    async def close(self):
+        if self._background is not None:
+            self._background.cancel()
+            self._background = None
+
+
+class GigaChatAPI:
+    """Полный путь запроса к /chat/completions, общий для обоих клиентов:
+    кэш ответов -> объединение одинаковых запросов -> размыкатель цепи ->
+    планировщик -> токен (с повтором на 401) -> транспорт.
+
+    Ошибки - только типизированные GigaChatError; временные сбои (429, 5xx, сеть)
+    повторяются с экспоненциальной задержкой и джиттером, с учетом Retry-After.
+
+    Каждый вызов GigaChat пишется в ledger; с replay ответы берутся из
+    записанного журнала по хешу промпта, без обращения к сети.
+    """
+
+    def __init__(self, transport: GigaChatTransport, tokens: TokenManager, scheduler: PriorityScheduler,
+                 cache: Optional[ResponseCache] = None, breaker: Optional[CircuitBreaker] = None,
+                 max_retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 max_retry_wait: float = 10.0, ledger: Optional[LLMLedger] = None,
+                 replay: Optional[LedgerReplay] = None):
+        self.transport = transport
+        self.tokens = tokens
+        self.scheduler = scheduler
+        self.cache = cache
+        self.breaker = breaker or CircuitBreaker()
+        self.singleflight = SingleFlight()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_wait = max_retry_wait
+        self.retries = 0
+        self.ledger = ledger
+        self.replay = replay
+
+    async def complete(self, messages: List[Dict], max_tokens: int = 500, temperature: float = 0.7,
+                       priority: Priority = Priority.INTERACTIVE, cache: bool = True,
+                       model: str = 'GigaChat') -> str:
+        """Возвращает текст ответа или бросает GigaChatError.
+
+        cache=False - для генерации, где нужны разные ответы на один и тот же промпт.
+        Одновременные байт-в-байт одинаковые запросы всегда разделяют один вызов GigaChat.
+        """
+        key = make_cache_key(model, messages, temperature, max_tokens)
+        use_cache = cache and self.cache is not None
+        if use_cache:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        return await self.singleflight.do(
+            key, lambda: self._fetch(key, messages, max_tokens, temperature, priority, use_cache, model)
+        )
+
+    async def complete_stream(self, messages: List[Dict], on_delta: Callable[[str], Awaitable[None]],
+                              max_tokens: int = 500, temperature: float = 0.7,
+                              priority: Priority = Priority.INTERACTIVE, model: str = 'GigaChat') -> str:
+        """Потоковый вариант complete: on_delta получает фрагменты по мере генерации.
+
+        Без кэша и объединения - у каждого вызывающего свой получатель фрагментов.
+        Повтор возможен, только пока ни один фрагмент не был отдан.
+        """
+        key = make_cache_key(model, messages, temperature, max_tokens)
+        if self.replay is not None:
+            content = self._replayed(key)
+            await on_delta(content)
+            return content
+
+        delivered = False
+
+        async def relay(delta: str):
+            nonlocal delivered
+            delivered = True
+            await on_delta(delta)
+
+        with self._ledger_entry(key, model, stream=True) as entry:
+            content = await self._with_retries(
+                lambda token: self.transport.chat_completion_stream(
+                    token, messages, relay, max_tokens=max_tokens, temperature=temperature, model=model
+                ),
+                priority,
+                can_retry=lambda: not delivered,
+                entry=entry
+            )
+            entry["response"] = content
+        return content
+
+    async def _fetch(self, key: str, messages: List[Dict], max_tokens: int, temperature: float,
+                     priority: Priority, use_cache: bool, model: str) -> str:
+        if self.replay is not None:
+            return self._replayed(key)
+
+        with self._ledger_entry(key, model, stream=False) as entry:
+            body = await self._with_retries(
+                lambda token: self.transport.chat_completion(
+                    token, messages, max_tokens=max_tokens, temperature=temperature, model=model
+                ),
+                priority,
+                entry=entry
+            )
+            content = body['choices'][0]['message']['content']
+            entry["response"] = content
+
+        if use_cache:
+            await self.cache.set(key, content)
+        return content
+
+    def _replayed(self, key: str) -> str:
+        content = self.replay.take(key)
+        if content is None:
+            raise GigaChatUnavailableError(f"В журнале нет ответа на промпт {key[:12]}")
+        return content
+
+    @contextmanager
+    def _ledger_entry(self, key: str, model: str, stream: bool):
+        """Запись журнала на один логический вызов: с повторами, токенами и итоговым статусом"""
+        tags = current_tags()
+        entry = {
+            "ts": time.time(),
+            "prompt_hash": key,
+            "call_site": current_stage(),
+            "agent": tags.get("agent"),
+            "question_type": tags.get("question_type"),
+            "role": tags.get("role"),
+            "model": model,
+            "stream": stream,
+            "retries": 0,
+        }
+        started = time.perf_counter()
+        usage = CallCounter()
+        try:
+            with usage:
+                yield entry
+            entry["status"] = 200
+        except GigaChatError as e:
+            entry["status"] = e.status or type(e).__name__
+            raise
+        except BaseException as e:
+            entry["status"] = type(e).__name__
+            raise
+        finally:
+            entry["latency_s"] = round(time.perf_counter() - started, 4)
+            entry["prompt_tokens"] = usage.prompt_tokens
+            entry["completion_tokens"] = usage.completion_tokens
+            if self.ledger is not None:
+                self.ledger.record(entry)
+
+    async def _with_retries(self, request: Callable[[str], Awaitable], priority: Priority,
+                            can_retry: Callable[[], bool] = lambda: True, entry: Optional[Dict] = None):
+        attempt = 0
+        while True:
+            try:
+                return await self._attempt(request, priority)
+            except (GigaChatRateLimitError, GigaChatServerError, GigaChatTransportError) as e:
+                delay = self._retry_delay(e, attempt)
+                if attempt >= self.max_retries or delay is None or not can_retry():
+                    raise
+                attempt += 1
+                self.retries += 1
+                if entry is not None:
+                    entry["retries"] = attempt
+                logger.warning("🔁 GigaChat: %s; повтор %s/%s через %.1f с", e, attempt, self.max_retries, delay,
+                               extra={"status": e.status, "sample": 0.2})
+                await asyncio.sleep(delay)
+
+    async def _attempt(self, request: Callable[[str], Awaitable], priority: Priority):
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError as e:
+            raise GigaChatUnavailableError(str(e)) from e
+
+        try:
+            # Токен - до слота планировщика: ожидание OAuth не должно занимать место в очереди
+            await self.tokens.get_token()
+            # Ожидание в очереди планировщика и сам запрос - отдельные этапы в трассировке
+            with span("gigachat.queue", priority=priority.name.lower()):
+                await self.scheduler.acquire(priority)
+            try:
+                with span("gigachat.request"):
+                    body = await self.tokens.call(request)
+            finally:
+                self.scheduler.release()
+        except (GigaChatServerError, GigaChatTransportError):
+            self.breaker.record_failure()
+            raise
+        except GigaChatError:
+            # Сервис ответил (401/429/4xx) - он жив, размыкать цепь не за что
+            self.breaker.record_success()
+            raise
+        except BaseException:
+            self.breaker.record_cancelled()
+            raise
+
+        self.breaker.record_success()
+        return body
+
+    def _retry_delay(self, error: GigaChatError, attempt: int) -> Optional[float]:
+        """Пауза перед повтором; None - ждать дольше max_retry_wait нет смысла"""
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_retry_wait else None
+        # Full jitter: случайная пауза в пределах экспоненциально растущего окна
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def stats(self) -> Dict:
+        return {
+            "retries": self.retries,
+            "breaker": self.breaker.stats(),
+            "ledger": self.ledger.stats() if self.ledger is not None else None,
+            "replay": self.replay.stats() if self.replay is not None else None
+        }
+
+    async def close(self):
+        if self.ledger is not None:
+            await self.ledger.close()
+        await self.tokens.close()
+        await self.transport.close()
+        if self.cache is not None:
+            self.cache.close()
+
+
+_transport: Optional[GigaChatTransport] = None
+_token_manager: Optional[TokenManager] = None
+_scheduler: Optional[PriorityScheduler] = None
+_api: Optional[GigaChatAPI] = None
+_ledger: Optional[LLMLedger] = None
+
+
+def get_transport() -> GigaChatTransport:
+    """Возвращает общий для всего процесса транспорт"""
+    global _transport
+    if _transport is None:
+        _transport = GigaChatTransport()
+    return _transport
+
+
+def get_token_manager() -> TokenManager:
+    """Возвращает общий для всего процесса менеджер токенов"""
+    global _token_manager
+    if _token_manager is None:
+        _token_manager = TokenManager(get_transport())
+    return _token_manager
+
+
+def get_scheduler() -> PriorityScheduler:
+    """Возвращает общий для всего процесса планировщик запросов к GigaChat"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = PriorityScheduler(
+            max_concurrency=int(os.getenv("GIGACHAT_MAX_CONCURRENCY", "10")),
+            rate=float(os.getenv("GIGACHAT_RATE_LIMIT", "5")),
+            burst=float(os.getenv("GIGACHAT_RATE_BURST", "10")),
+            aging=float(os.getenv("GIGACHAT_PRIORITY_AGING", "5"))
+        )
+    return _scheduler
+
+
+def get_ledger() -> Optional[LLMLedger]:
+    """Общий журнал вызовов GigaChat; LLM_LEDGER_PATH="" отключает его"""
+    global _ledger
+    path = os.getenv("LLM_LEDGER_PATH", os.path.join("logs", "llm_ledger.jsonl"))
+    if _ledger is None and path:
+        _ledger = LLMLedger(
+            path,
+            max_bytes=int(float(os.getenv("LLM_LEDGER_MAX_MB", "50")) * 1024 * 1024),
+            backup_count=int(os.getenv("LLM_LEDGER_BACKUPS", "5"))
+        )
+    return _ledger
+
+
+def _build_api(transport: GigaChatTransport, tokens: TokenManager, db: Optional[SQLitePool] = None) -> GigaChatAPI:
+    cache = None
+    if os.getenv("GIGACHAT_CACHE", "1") == "1":
+        cache = ResponseCache(
+            max_entries=int(os.getenv("GIGACHAT_CACHE_SIZE", "1000")),
+            ttl=float(os.getenv("GIGACHAT_CACHE_TTL", "3600")),
+            db_path=os.getenv("GIGACHAT_CACHE_DB") or None,
+            db=db
+        )
+    return GigaChatAPI(
+        transport, tokens, get_scheduler(), cache,
+        breaker=CircuitBreaker(
+            failure_threshold=int(os.getenv("GIGACHAT_BREAKER_THRESHOLD", "5")),
+            recovery_timeout=float(os.getenv("GIGACHAT_BREAKER_RECOVERY", "30"))
+        ),
+        max_retries=int(os.getenv("GIGACHAT_MAX_RETRIES", "2")),
+        ledger=get_ledger(),
+        replay=LedgerReplay(os.environ["LLM_REPLAY"]) if os.getenv("LLM_REPLAY") else None
+    )
+
+
+def get_api(db: Optional[SQLitePool] = None) -> GigaChatAPI:
+    """Возвращает общий для всего процесса путь запросов к GigaChat.
+
+    db - общий пул соединений для дискового кэша; учитывается при первом вызове.
+    """
+    global _api
+    if _api is None:
+        _api = _build_api(get_transport(), get_token_manager(), db)
+    return _api
+
+
+def create_api(base_url: Optional[str] = None, oauth_url: Optional[str] = None) -> GigaChatAPI:
+    """Отдельный путь запросов к GigaChat по другим адресам (например, к локальной заглушке).
+
+    Планировщик общий с get_api(): лимиты задаются на процесс.
+    """
+    transport = GigaChatTransport(base_url=base_url, oauth_url=oauth_url)
+    return _build_api(transport, TokenManager(transport))
@@ -0,0 +1,185 @@
+import sys
+import asyncio
+from array import array
+from enum import IntEnum
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class AgentId(IntEnum):
+    """Эксперт панели - в записях хранится вместо строк agent/emoji/role"""
+    TECHNICAL = 1
+    CAREER = 2
+    PSYCHOLOGIST = 3
+
+    @property
+    def role(self) -> str:
+        return self.name.lower()
+
+    @classmethod
+    def from_role(cls, role: str) -> "AgentId":
+        return cls[role.upper()]
+
+
+# Порядок баллов в Analysis.scores - как в RESPONSE_FORMAT агента
+SCORE_KEYS = {
+    AgentId.TECHNICAL: ("technical_correctness", "optimization", "code_quality", "scalability", "security"),
+    AgentId.CAREER: ("goal_clarity", "growth_potential", "realism", "learning_readiness", "market_understanding"),
+    AgentId.PSYCHOLOGIST: ("communication", "teamwork", "problem_solving", "leadership",
+                           "emotional_intelligence", "adaptability", "ethics"),
+}
+
+# Текстовые поля ответа агента, которые нужны финальному отчету. Остальное
+# (average_score, списки ресурсов, зарплатные ожидания...) после разбора не хранится
+NOTE_KEYS = {
+    AgentId.TECHNICAL: ("strengths", "weaknesses", "specific_errors", "improvement_suggestions"),
+    AgentId.CAREER: ("career_trajectory", "immediate_recommendations"),
+    AgentId.PSYCHOLOGIST: ("team_fit", "potential_issues", "development_areas"),
+}
+
+
+def _score(value) -> int:
+    """Балл 1-10 из ответа модели; 0 - балла нет или он не число"""
+    try:
+        return min(10, max(0, round(float(value))))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _confidence(value, default: float = 0.5) -> float:
+    try:
+        return min(1.0, max(0.0, float(value)))
+    except (TypeError, ValueError):
+        return default
+
+
+@dataclass(slots=True)
+class Analysis:
+    """Анализ одного агента: баллы упакованы по байту, из текста - вердикт и заметки для отчета"""
+    agent: AgentId
+    # Баллы в порядке SCORE_KEYS[agent], 0 - агент этот балл не поставил
+    scores: bytes
+    confidence: float
+    verdict: str
+    notes: str = ""
+
+    @classmethod
+    def from_json(cls, agent: AgentId, analysis: Dict, confidence: Optional[float] = None) -> "Analysis":
+        raw_scores = analysis.get("scores")
+        raw_scores = raw_scores if isinstance(raw_scores, dict) else {}
+        notes = []
+        for key in NOTE_KEYS[agent]:
+            value = analysis.get(key)
+            if isinstance(value, list):
+                value = ", ".join(str(item) for item in value if item)
+            if value:
+                notes.append(f"{key}: {value}")
+        return cls(
+            agent=agent,
+            scores=bytes(_score(raw_scores.get(key)) for key in SCORE_KEYS[agent]),
+            confidence=_confidence(analysis.get("confidence", 0.7) if confidence is None else confidence),
+            verdict=str(analysis.get("verdict") or "Нет вердикта"),
+            notes="; ".join(notes)
+        )
+
+    def score_map(self) -> Dict[str, int]:
+        return {key: value for key, value in zip(SCORE_KEYS[self.agent], self.scores) if value}
+
+    def average(self) -> Optional[float]:
+        given = [value for value in self.scores if value]
+        return sum(given) / len(given) if given else None
+
+    def report(self) -> Dict:
+        """Представление для промпта финального отчета"""
+        entry = {"scores": self.score_map(), "verdict": self.verdict, "confidence": self.confidence}
+        if self.notes:
+            entry["notes"] = self.notes
+        return entry
+
+    def to_dict(self) -> Dict:
+        return {"agent": int(self.agent), "scores": list(self.scores), "confidence": self.confidence,
+                "verdict": self.verdict, "notes": self.notes}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Analysis":
+        return cls(AgentId(data["agent"]), bytes(data["scores"]), data["confidence"], data["verdict"],
+                   data.get("notes", ""))
+
+
+@dataclass(slots=True)
+class Answer:
+    """Ответ кандидата; вопрос и его тип - по тому же индексу в InterviewSession"""
+    text: str
+    feedback: str = ""
+    analyses: Tuple[Analysis, ...] = ()
+
+    def to_dict(self) -> Dict:
+        return {"text": self.text, "feedback": self.feedback,
+                "analyses": [analysis.to_dict() for analysis in self.analyses]}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Answer":
+        return cls(data["text"], data["feedback"], tuple(Analysis.from_dict(a) for a in data["analyses"]))
+
+
+@dataclass(slots=True)
+class InterviewSession:
+    """Сессия интервью одного пользователя"""
+    session_id: str
+    role: str
+    role_name: str
+    interview_length: str
+    question_types: List[str]
+    total_questions: int
+    agents: Tuple[AgentId, ...]
+    state: str = "in_progress"
+    current_question: int = 0
+    questions: List[str] = field(default_factory=list)
+    question_categories: List[str] = field(default_factory=list)
+    answers: List[Answer] = field(default_factory=list)
+    # LLM-вызовов на каждый ответ
+    llm_calls: array = field(default_factory=lambda: array("H"))
+    consults_saved: int = 0
+    # Не сохраняются - строятся заново, когда сессия поднимается из хранилища
+    panel: Any = None
+    prefetch: Optional[asyncio.Future] = None
+    trace: Any = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "session_id": self.session_id,
+            "role": self.role,
+            "role_name": self.role_name,
+            "interview_length": self.interview_length,
+            "question_types": self.question_types,
+            "total_questions": self.total_questions,
+            "agents": [int(agent) for agent in self.agents],
+            "state": self.state,
+            "current_question": self.current_question,
+            "questions": self.questions,
+            "question_categories": self.question_categories,
+            "answers": [answer.to_dict() for answer in self.answers],
+            "llm_calls": list(self.llm_calls),
+            "consults_saved": self.consults_saved
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "InterviewSession":
+        # Повторяющиеся короткие строки - одним объектом на процесс
+        intern = sys.intern
+        return cls(
+            session_id=data["session_id"],
+            role=intern(data["role"]),
+            role_name=intern(data["role_name"]),
+            interview_length=intern(data["interview_length"]),
+            question_types=[intern(t) for t in data["question_types"]],
+            total_questions=data["total_questions"],
+            agents=tuple(AgentId(agent) for agent in data["agents"]),
+            state=intern(data["state"]),
+            current_question=data["current_question"],
+            questions=data["questions"],
+            question_categories=[intern(t) for t in data["question_categories"]],
+            answers=[Answer.from_dict(answer) for answer in data["answers"]],
+            llm_calls=array("H", data["llm_calls"]),
+            consults_saved=data["consults_saved"]
+        )
@@ -0,0 +1,114 @@
+import os
+import asyncio
+import inspect
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from gigachat_client import GigaChatHRClient
+from gigachat_transport import GigaChatAPI, get_api
+from question_pool import QuestionPool
+from utils.db import SQLitePool
+from utils.logger import get_logger
+from utils.session_store import SQLiteSessionBackend
+
+
+logger = get_logger("loader")
+
+
+class Container:
+    """Общие тяжелые ресурсы процесса: каждый создается один раз, при первом обращении.
+
+    register() описывает ресурс фабрикой, которая получает сам контейнер и берет из него
+    зависимости (container.api, container.db, ...). startup() создает eager-ресурсы
+    в порядке регистрации и запускает хуки on_startup; shutdown() закрывает созданное
+    в обратном порядке - потребители раньше соединений, которыми они пользуются.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[["Container"], Any]] = {}
+        self._closers: Dict[str, Optional[Callable[[Any], Any]]] = {}
+        self._eager: List[str] = []
+        self._instances: Dict[str, Any] = {}
+        self._order: List[str] = []
+        self._startup_hooks: List[Callable[[], Awaitable]] = []
+        # RLock: фабрика запрашивает зависимости из того же потока
+        self._lock = threading.RLock()
+        self.started = False
+
+    def register(self, name: str, factory: Callable[["Container"], Any],
+                 close: Optional[Callable[[Any], Any]] = None, eager: bool = True):
+        """close(ресурс) может быть корутиной; eager=False - создается только по запросу"""
+        self._factories[name] = factory
+        self._closers[name] = close
+        if eager:
+            self._eager.append(name)
+
+    def on_startup(self, hook: Callable[[], Awaitable]):
+        """Хук, который startup() выполнит после создания ресурсов, в порядке добавления"""
+        self._startup_hooks.append(hook)
+        return hook
+
+    def get(self, name: str) -> Any:
+        if name in self._instances:
+            return self._instances[name]
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"Ресурс {name} не зарегистрирован")
+                self._instances[name] = self._factories[name](self)
+                self._order.append(name)
+            return self._instances[name]
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self.get(name)
+        except KeyError:
+            raise AttributeError(name) from None
+
+    async def startup(self):
+        """Создает ресурсы (в потоке - фабрики читают диск) и запускает хуки; повторный вызов ничего не делает"""
+        if self.started:
+            return
+        for name in self._eager:
+            await asyncio.to_thread(self.get, name)
+        for hook in self._startup_hooks:
+            await hook()
+        self.started = True
+        logger.info("📦 Ресурсы готовы: %s", ", ".join(self._order))
+
+    async def shutdown(self):
+        for name in reversed(self._order):
+            close = self._closers.get(name)
+            if close is None:
+                continue
+            try:
+                result = close(self._instances[name])
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.exception("❌ Ошибка при закрытии %s: %s", name, e)
+        self._instances.clear()
+        self._order.clear()
+        self.started = False
+
+    def stats(self) -> Dict:
+        return {"resources": list(self._order), "started": self.started}
+
+
+container = Container()
+
+# Соединения SQLite закрываются последними: ими пользуются все, кто создан после
+container.register("db", lambda c: SQLitePool(), SQLitePool.close)
+container.register("api", lambda c: get_api(c.db), GigaChatAPI.close)
+# HTTP-сессия и токен принадлежат api и закрываются вместе с ним
+container.register("http", lambda c: c.api.transport)
+container.register("tokens", lambda c: c.api.tokens)
+# Постоянный уровень сессий; сами хранилища - по одному на пространство имен
+# (сессии бота регистрирует bot.py, он же знает, как восстановить их панели и трассы)
+container.register("session_backend",
+                   lambda c: SQLiteSessionBackend(c.db.connect(os.getenv("SESSION_DB", "sessions.db"))))
+container.register("question_pool", lambda c: QuestionPool(db=c.db), QuestionPool.close)
+container.register("hr_client", lambda c: GigaChatHRClient(api=c.api, db=c.db), GigaChatHRClient.close,
+                   eager=False)
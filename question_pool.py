@@ -0,0 +1,222 @@
+import os
+import json
+import random
+import sqlite3
+import asyncio
+import threading
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.db import SQLitePool
+from utils.logger import get_logger
+
+
+logger = get_logger("question_pool")
+
+# Роль общих вопросов из seed_from_json: они подходят любой позиции и в бакеты ролей не копируются
+GENERIC_ROLE = "*"
+
+
+class QuestionPool:
+    """Персистентный пул вопросов по ключу (роль, категория QUESTION_TYPES).
+
+    Выдача вопроса - локальный поиск в памяти; SQLite нужен только чтобы
+    пул переживал перезапуски. Пополняет пул фоновый воркер run_worker.
+
+    Пул ротируется: выдачи каждого вопроса считаются, и после max_uses выдач
+    вопрос уходит в отставку. Строка остается в базе, чтобы тот же вопрос
+    не вернулся при повторной генерации, а освободившееся место воркер
+    заполняет свежими вопросами. Общие вопросы (GENERIC_ROLE) выдаются,
+    только если в бакете роли ничего не нашлось, и в отставку не уходят.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, target_size: int = 15, db: Optional[SQLitePool] = None,
+                 max_uses: Optional[int] = None):
+        # db - общий пул соединений; без него пул вопросов открывает и закрывает свое
+        self.db = db
+        self.db_path = db_path or os.getenv("QUESTION_POOL_DB", "question_pool.db")
+        self.target_size = target_size
+        self.max_uses = max_uses or int(os.getenv("QUESTION_POOL_MAX_USES", "3"))
+        self.questions: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+        self.uses: Dict[Tuple[str, str, str], int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.retired = 0
+        # Выдачи, еще не записанные в базу: их пишет пачкой run_worker и close()
+        self._pending_uses: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._init_database()
+
+    def _init_database(self):
+        if self.db is not None:
+            self.conn = self.db.connect(self.db_path)
+        else:
+            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS questions (
+                role TEXT,
+                category TEXT,
+                question TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                uses INTEGER DEFAULT 0,
+                UNIQUE (role, category, question)
+            )
+        ''')
+        # Базы, созданные до учета выдач
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(questions)')}
+        if "uses" not in columns:
+            cursor.execute('ALTER TABLE questions ADD COLUMN uses INTEGER DEFAULT 0')
+        self.conn.commit()
+
+        rows = cursor.execute('SELECT role, category, question, uses FROM questions').fetchall()
+        for role, category, question, uses in rows:
+            self.uses[(role, category, question)] = uses
+            if role == GENERIC_ROLE or uses < self.max_uses:
+                self.questions[(role, category)].append(question)
+
+    def seed_from_json(self, path: str, category: str = "situational"):
+        """Засевает общий бакет (GENERIC_ROLE, category) вопросами из файла вида {"questions": [...]}"""
+        try:
+            with open(path, encoding='utf-8') as f:
+                seed = [q.strip() for q in json.load(f).get("questions", [])]
+        except (OSError, ValueError) as e:
+            logger.error("❌ Не удалось загрузить вопросы из %s: %s", path, e)
+            return
+
+        # Раньше общие вопросы копировались в бакет каждой роли - убираем эти копии
+        seeded = set(seed)
+        for (role, bucket_category), pool in self.questions.items():
+            if role != GENERIC_ROLE and bucket_category == category:
+                pool[:] = [q for q in pool if q not in seeded]
+        for key in [key for key in self.uses if key[0] != GENERIC_ROLE and key[1] == category and key[2] in seeded]:
+            del self.uses[key]
+        with self._lock:
+            self.conn.executemany(
+                'DELETE FROM questions WHERE role != ? AND category = ? AND question = ?',
+                [(GENERIC_ROLE, category, q) for q in seed]
+            )
+            self.conn.commit()
+
+        added = self._add_local(GENERIC_ROLE, category, seed)
+        self._persist([(GENERIC_ROLE, category, q) for q in added])
+
+    def take(self, role: str, category: str, exclude: Iterable[str] = ()) -> Optional[str]:
+        """Случайный вопрос, которого еще не было в этой сессии: из бакета роли, иначе из общих"""
+        excluded = set(exclude)
+        for bucket in (role, GENERIC_ROLE):
+            candidates = [q for q in self.questions.get((bucket, category), []) if q not in excluded]
+            if candidates:
+                break
+        else:
+            self.misses += 1
+            return None
+        self.hits += 1
+        question = random.choice(candidates)
+        self._use(bucket, category, question)
+        return question
+
+    def take_any(self, role: str, exclude: Iterable[str] = ()) -> Optional[Tuple[str, str]]:
+        """Запасной вариант, когда GigaChat недоступен: (вопрос, категория) из любой категории -
+        сначала бакеты роли, затем общие. None - если в пуле ничего не осталось"""
+        excluded = set(exclude)
+        for bucket in (role, GENERIC_ROLE):
+            candidates = [(question, category)
+                          for (bucket_role, category), pool in self.questions.items() if bucket_role == bucket
+                          for question in pool if question not in excluded]
+            if candidates:
+                break
+        else:
+            return None
+        question, category = random.choice(candidates)
+        self._use(bucket, category, question)
+        return question, category
+
+    def _use(self, role: str, category: str, question: str):
+        key = (role, category, question)
+        self.uses[key] = self.uses.get(key, 0) + 1
+        self._pending_uses[key] += 1
+        if role != GENERIC_ROLE and self.uses[key] >= self.max_uses:
+            # Отставка: место в бакете освобождается, воркер догенерирует свежий вопрос
+            self.questions[(role, category)].remove(question)
+            self.retired += 1
+
+    def flush_uses(self):
+        """Пишет накопленные выдачи в базу; синхронный - из event loop вызывать через to_thread"""
+        pending, self._pending_uses = self._pending_uses, defaultdict(int)
+        if not pending:
+            return
+        with self._lock:
+            self.conn.executemany(
+                'UPDATE questions SET uses = uses + ? WHERE role = ? AND category = ? AND question = ?',
+                [(count, role, category, question) for (role, category, question), count in pending.items()]
+            )
+            self.conn.commit()
+
+    def size(self, role: str, category: str) -> int:
+        return len(self.questions.get((role, category), []))
+
+    async def add(self, role: str, category: str, questions: Iterable[str]):
+        added = self._add_local(role, category, questions)
+        if added:
+            await asyncio.to_thread(self._persist, [(role, category, q) for q in added])
+
+    def _add_local(self, role: str, category: str, questions: Iterable[str]) -> List[str]:
+        pool = self.questions[(role, category)]
+        known = set(pool)
+        added = []
+        for question in questions:
+            question = question.strip()
+            # Вопрос в отставке не возвращается, даже если модель сгенерировала его снова
+            if question and question not in known and (role, category, question) not in self.uses:
+                pool.append(question)
+                known.add(question)
+                added.append(question)
+                self.uses[(role, category, question)] = 0
+        return added
+
+    def _persist(self, rows: List[Tuple[str, str, str]]):
+        with self._lock:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO questions (role, category, question) VALUES (?, ?, ?)', rows
+            )
+            self.conn.commit()
+
+    async def run_worker(self, keys: Iterable[Tuple[str, str]],
+                         generate: Callable[[str, str], Awaitable[List[str]]],
+                         is_idle: Callable[[], bool], interval: float = 30):
+        """Пополняет ключи до target_size, пока нагрузка на GigaChat низкая.
+
+        Выданные вопросы уходят в отставку, поэтому пул не замирает на target_size:
+        воркер все время подмешивает свежие.
+        """
+        keys = list(keys)
+        while True:
+            try:
+                await asyncio.to_thread(self.flush_uses)
+            except sqlite3.Error as e:
+                logger.error("❌ Не удалось сохранить счетчики выдач вопросов: %s", e)
+            for role, category in keys:
+                if self.size(role, category) >= self.target_size:
+                    continue
+                if not is_idle():
+                    break
+                try:
+                    await self.add(role, category, await generate(role, category))
+                except Exception as e:
+                    logger.exception("❌ Ошибка пополнения пула вопросов (%s, %s): %s", role, category, e)
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict:
+        return {
+            "keys": len(self.questions),
+            "questions": sum(len(pool) for pool in self.questions.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "retired": self.retired
+        }
+
+    def close(self):
+        self.flush_uses()
+        if self.db is None:
+            self.conn.close()
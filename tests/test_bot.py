@@ -0,0 +1,140 @@
+import json
+import sqlite3
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import bot
+from gigachat_transport import GigaChatUnavailableError
+from interview_records import AgentId, InterviewSession
+from question_pool import GENERIC_ROLE, QuestionPool
+from utils.session_store import SessionStore, SQLiteSessionBackend
+
+
+class UnavailableClient:
+    """GigaChat за открытым размыкателем: любой вызов отклоняется сразу"""
+
+    async def chat_completion(self, messages, **kwargs):
+        raise GigaChatUnavailableError("circuit open")
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    pool = QuestionPool(db_path=str(tmp_path / "pool.db"))
+    monkeypatch.setattr(bot, "question_pool", pool)
+    yield pool
+    pool.close()
+
+
+def make_session(question_types=("technical",)):
+    return InterviewSession(
+        session_id="test", role="python_developer", role_name="Python Developer",
+        interview_length="short", question_types=list(question_types), total_questions=3,
+        agents=(AgentId.TECHNICAL,)
+    )
+
+
+def test_question_falls_back_to_pool_when_gigachat_is_down(pool, monkeypatch):
+    monkeypatch.setattr(bot, "client", UnavailableClient())
+    asyncio.run(pool.add(GENERIC_ROLE, "situational", ["Расскажи о себе."]))
+    session = make_session()
+
+    # Бакет technical пуст, GigaChat недоступен - берем общий вопрос другой категории
+    assert asyncio.run(bot._generate_question(session)) == ("Расскажи о себе.", "situational")
+    session.questions.append("Расскажи о себе.")
+    assert asyncio.run(bot._generate_question(session)) is None
+
+
+def test_message_without_question_retries_generation(monkeypatch):
+    async def run():
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        store = SessionStore(SQLiteSessionBackend(conn), "test", encode=InterviewSession.to_dict,
+                             restore=InterviewSession.from_dict, flush_interval=60)
+        monkeypatch.setattr(bot, "user_sessions", store)
+        # Первый вопрос сгенерировать не удалось: сессия начата, а вопросов нет
+        store[1] = make_session()
+        retried = []
+
+        async def generate_next_question(update, user_id, context):
+            retried.append(user_id)
+
+        async def handle_answer(update, context):
+            raise AssertionError("сообщение не должно считаться ответом")
+
+        monkeypatch.setattr(bot, "generate_next_question", generate_next_question)
+        monkeypatch.setattr(bot, "_handle_answer", handle_answer)
+        update = SimpleNamespace(effective_user=SimpleNamespace(id=1))
+        await bot.handle_message(update, None)
+        await store.close()
+        conn.close()
+        return retried
+
+    assert asyncio.run(run()) == [1]
+
+
+def test_llmstats_is_admin_only(monkeypatch):
+    replies = []
+
+    class Message:
+        async def reply_text(self, text, **kwargs):
+            replies.append(text)
+
+    monkeypatch.setattr(bot, "ADMIN_USER_IDS", {42})
+    update = SimpleNamespace(effective_user=SimpleNamespace(id=1), message=Message())
+    asyncio.run(bot.llm_stats_command(update, None))
+    assert replies == []
+
+
+class SlowAgentClient:
+    """Агенты отвечают сразу, кроме того, чье имя в промпте - он думает дольше дедлайна"""
+
+    def __init__(self, slow_name):
+        self.slow_name = slow_name
+        self.cancelled = []
+
+    async def chat_completion(self, messages, **kwargs):
+        prompt = messages[0]["content"]
+        if self.slow_name in prompt:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                self.cancelled.append(self.slow_name)
+                raise
+        name = prompt.split("(", 1)[1].split(")", 1)[0] if "(" in prompt else "?"
+        return json.dumps({"verdict": f"вердикт: {name}", "confidence": 0.9}, ensure_ascii=False)
+
+
+def test_fanout_degrades_only_the_agent_past_its_deadline(monkeypatch):
+    pool = bot.AgentPool(client=None)
+    slow = pool.agents["technical"]
+    slow.deadline = 0.05
+    stub = SlowAgentClient(slow.name)
+    monkeypatch.setattr(bot, "client", stub)
+    monkeypatch.setattr(bot, "ANALYSIS_MODE", "fanout")
+    # Без обсуждения экспертов - оно здесь ни при чем
+    monkeypatch.setattr(bot.random, "random", lambda: 0.0)
+    panel = bot.AgentPanel(pool, ["all"])
+    context = SimpleNamespace(user_data={"role_name": "Python Developer"})
+    data = {"question": "Вопрос?", "answer": "Ответ", "type": "all", "level": "Middle"}
+
+    async def run():
+        started = asyncio.get_running_loop().time()
+        analyses = await panel.consult_all(data, context)
+        return analyses, asyncio.get_running_loop().time() - started
+
+    analyses, elapsed = asyncio.run(run())
+
+    # Порядок - как у active_agents, независимо от того, кто ответил первым
+    assert [analysis.agent for analysis in analyses] == [agent.id for agent in panel.active_agents]
+    assert len(analyses) == 3
+    timed_out, *others = analyses
+    assert timed_out.agent == slow.id
+    assert timed_out.verdict == "Эксперт не успел завершить анализ"
+    assert timed_out.confidence == pytest.approx(0.1)
+    assert stub.cancelled == [slow.name]
+    for analysis, agent in zip(others, panel.active_agents[1:]):
+        assert analysis.verdict == f"вердикт: {agent.name}"
+        assert analysis.confidence == pytest.approx(0.9)
+    # Медленный агент не задерживает ход дольше своего дедлайна
+    assert elapsed < 1
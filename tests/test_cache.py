@@ -0,0 +1,54 @@
+import asyncio
+
+from utils.cache import ResponseCache, make_cache_key
+
+
+def test_cache_key_depends_on_request():
+    messages = [{"role": "user", "content": "Привет"}]
+    key = make_cache_key("GigaChat", messages, 0.7, 100)
+    assert key == make_cache_key("GigaChat", [dict(messages[0])], 0.7, 100)
+    assert key != make_cache_key("GigaChat", messages, 0.7, 200)
+    assert key != make_cache_key("GigaChat-Pro", messages, 0.7, 100)
+
+
+def test_lru_evicts_oldest_entry():
+    async def run():
+        cache = ResponseCache(max_entries=2)
+        await cache.set("a", "1")
+        await cache.set("b", "2")
+        await cache.get("a")
+        await cache.set("c", "3")
+        return [await cache.get(key) for key in ("a", "b", "c")]
+
+    assert asyncio.run(run()) == ["1", None, "3"]
+
+
+def test_expired_entry_is_a_miss():
+    async def run():
+        cache = ResponseCache(ttl=-1)
+        await cache.set("a", "1")
+        return await cache.get("a"), cache.stats()
+
+    value, stats = asyncio.run(run())
+    assert value is None
+    assert stats["misses"] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+
+    async def run():
+        cache = ResponseCache(db_path=path)
+        await cache.set("a", "1")
+        cache.close()
+        cache = ResponseCache(db_path=path)
+        value = await cache.get("a")
+        again = await cache.get("a")
+        stats = cache.stats()
+        cache.close()
+        return value, again, stats
+
+    value, again, stats = asyncio.run(run())
+    assert value == again == "1"
+    # Первое чтение - с диска, дальше запись уже в памяти
+    assert stats["disk_hits"] == 1 and stats["hits"] == 1
@@ -0,0 +1,51 @@
+import pytest
+
+import gigachat_client
+from gigachat_client import BoundedSessions
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(gigachat_client.time, "monotonic", clock.monotonic)
+    return clock
+
+
+def test_least_recently_used_session_is_evicted(clock):
+    sessions = BoundedSessions(max_entries=2)
+    sessions[1] = {"id": 1}
+    sessions[2] = {"id": 2}
+    # Обращение освежает сессию 1 - выгружается 2
+    assert sessions[1] == {"id": 1}
+    sessions[3] = {"id": 3}
+    assert sorted(sessions) == [1, 3]
+    assert sessions.evicted == 1
+
+
+def test_idle_session_expires(clock):
+    sessions = BoundedSessions(ttl=60)
+    sessions[1] = {"id": 1}
+    clock.now += 30
+    assert 1 in sessions
+    clock.now += 59
+    assert sessions.get(1) == {"id": 1}
+    clock.now += 60
+    assert 1 not in sessions
+    assert sessions.get(1) is None
+    assert len(sessions) == 0
+
+
+def test_new_session_sweeps_expired(clock):
+    sessions = BoundedSessions(ttl=60)
+    sessions[1] = {"id": 1}
+    clock.now += 60
+    sessions[2] = {"id": 2}
+    assert list(sessions) == [2]
@@ -0,0 +1,78 @@
+import json
+from array import array
+
+import pytest
+
+from interview_records import SCORE_KEYS, AgentId, Analysis, Answer, InterviewSession
+
+
+def test_agent_id_roundtrips_role():
+    for agent in AgentId:
+        assert AgentId.from_role(agent.role) is agent
+
+
+def test_analysis_packs_scores_in_agent_order():
+    analysis = Analysis.from_json(AgentId.TECHNICAL, {
+        "scores": {"security": 3, "technical_correctness": "8", "optimization": 11.6, "code_quality": "n/a"},
+        "verdict": "Хорошо",
+        "strengths": ["GIL", "asyncio"],
+        "learning_resources": ["книга"],
+        "confidence": 0.9,
+    })
+    assert len(analysis.scores) == len(SCORE_KEYS[AgentId.TECHNICAL])
+    # Непонятный балл - 0 (нет балла), вне диапазона - обрезается до 10
+    assert analysis.score_map() == {"technical_correctness": 8, "optimization": 10, "security": 3}
+    assert analysis.average() == pytest.approx(7)
+    assert analysis.notes == "strengths: GIL, asyncio"
+    assert analysis.confidence == 0.9
+
+
+def test_analysis_without_scores():
+    analysis = Analysis.from_json(AgentId.CAREER, {"error": "timeout"}, confidence=0.1)
+    assert analysis.average() is None
+    assert analysis.verdict == "Нет вердикта"
+    assert analysis.report() == {"scores": {}, "verdict": "Нет вердикта", "confidence": 0.1}
+
+
+def _session():
+    session = InterviewSession(
+        session_id="abc123",
+        role="middle_python",
+        role_name="Middle Python разработчика",
+        interview_length="short",
+        question_types=["all"],
+        total_questions=3,
+        agents=(AgentId.TECHNICAL, AgentId.PSYCHOLOGIST),
+    )
+    session.questions.append("Что такое GIL?")
+    session.question_categories.append("technical")
+    session.answers.append(Answer("Глобальная блокировка", "Спасибо!", (
+        Analysis.from_json(AgentId.TECHNICAL, {"scores": {"technical_correctness": 7}, "verdict": "ok"}),
+        Analysis.from_json(AgentId.PSYCHOLOGIST, {"scores": {"ethics": 9}, "verdict": "ok",
+                                                  "team_fit": "хорошо"}),
+    )))
+    session.llm_calls.append(4)
+    session.current_question = 1
+    session.consults_saved = 1
+    session.panel = object()
+    return session
+
+
+def test_session_roundtrips_through_json():
+    session = _session()
+    restored = InterviewSession.from_dict(json.loads(json.dumps(session.to_dict(), ensure_ascii=False)))
+
+    assert restored.to_dict() == session.to_dict()
+    assert restored.agents == (AgentId.TECHNICAL, AgentId.PSYCHOLOGIST)
+    assert isinstance(restored.llm_calls, array)
+    assert restored.answers[0].analyses[1].score_map() == {"ethics": 9}
+    # Несериализуемые поля не сохраняются
+    assert restored.panel is None and restored.prefetch is None and restored.trace is None
+
+
+def test_records_use_slots():
+    session = _session()
+    with pytest.raises(AttributeError):
+        session.feedbacks = []
+    with pytest.raises(AttributeError):
+        session.answers[0].analyses[0].raw = {}
@@ -0,0 +1,52 @@
+import json
+import asyncio
+
+from utils.ledger import LedgerReplay, LLMLedger
+
+
+def _entry(prompt_hash, response, status=200):
+    return {"prompt_hash": prompt_hash, "response": response, "status": status}
+
+
+def test_ledger_writes_batches_and_rotates(tmp_path):
+    path = str(tmp_path / "logs" / "ledger.jsonl")
+
+    async def run():
+        ledger = LLMLedger(path, max_bytes=200, backup_count=2)
+        for i in range(3):
+            ledger.record(_entry(f"h{i}", "x" * 60))
+            await ledger.flush()
+        await ledger.close()
+        return ledger.stats()
+
+    stats = asyncio.run(run())
+    assert stats["written"] == 3
+    assert (tmp_path / "logs" / "ledger.jsonl.1").exists()
+    lines = (tmp_path / "logs" / "ledger.jsonl").read_text(encoding="utf-8").splitlines()
+    assert json.loads(lines[-1])["prompt_hash"] == "h2"
+
+
+def test_ledger_drops_when_backlog_is_full(tmp_path):
+    async def run():
+        ledger = LLMLedger(str(tmp_path / "ledger.jsonl"), max_pending=1)
+        ledger.record(_entry("a", "1"))
+        ledger.record(_entry("b", "2"))
+        await ledger.close()
+        return ledger.stats()
+
+    assert asyncio.run(run()) == {"pending": 0, "written": 1, "dropped": 1}
+
+
+def test_replay_cycles_recorded_responses_in_order(tmp_path):
+    path = tmp_path / "ledger.jsonl"
+    (tmp_path / "ledger.jsonl.1").write_text(json.dumps(_entry("h", "старый")) + "\n", encoding="utf-8")
+    path.write_text("\n".join([
+        json.dumps(_entry("h", "новый")),
+        json.dumps(_entry("h", None, status=500)),
+        "битая строка",
+    ]) + "\n", encoding="utf-8")
+
+    replay = LedgerReplay(str(path))
+    assert [replay.take("h") for _ in range(3)] == ["старый", "новый", "старый"]
+    assert replay.take("missing") is None
+    assert replay.stats() == {"prompts": 1, "hits": 3, "misses": 1}
@@ -0,0 +1,89 @@
+import json
+import sqlite3
+import asyncio
+
+from question_pool import GENERIC_ROLE, QuestionPool
+
+
+def make_pool(tmp_path, **kwargs):
+    return QuestionPool(db_path=str(tmp_path / "pool.db"), **kwargs)
+
+
+def test_question_retires_after_max_uses(tmp_path):
+    pool = make_pool(tmp_path, max_uses=2)
+    asyncio.run(pool.add("dev", "technical", ["Q1?"]))
+
+    assert pool.take("dev", "technical") == "Q1?"
+    assert pool.take("dev", "technical") == "Q1?"
+    assert pool.size("dev", "technical") == 0
+    assert pool.take("dev", "technical") is None
+    assert pool.stats()["retired"] == 1
+    pool.close()
+
+
+def test_retired_question_is_not_readmitted(tmp_path):
+    pool = make_pool(tmp_path, max_uses=1)
+    asyncio.run(pool.add("dev", "technical", ["Q1?"]))
+    pool.take("dev", "technical")
+    pool.close()
+
+    # После перезапуска отставка помнится, и повторная генерация не возвращает вопрос
+    pool = make_pool(tmp_path, max_uses=1)
+    assert pool.size("dev", "technical") == 0
+    asyncio.run(pool.add("dev", "technical", ["Q1?", "Q2?"]))
+    assert pool.questions[("dev", "technical")] == ["Q2?"]
+    pool.close()
+
+
+def test_take_excludes_session_questions(tmp_path):
+    pool = make_pool(tmp_path)
+    asyncio.run(pool.add("dev", "technical", ["Q1?", "Q2?"]))
+    assert pool.take("dev", "technical", exclude=["Q1?"]) == "Q2?"
+    assert pool.take("dev", "technical", exclude=["Q1?", "Q2?"]) is None
+    pool.close()
+
+
+def test_generic_seed_stays_out_of_role_buckets(tmp_path):
+    seed = tmp_path / "seed.json"
+    seed.write_text(json.dumps({"questions": ["Расскажи о себе."]}), encoding="utf-8")
+    # База старого формата: общий вопрос скопирован в бакет роли, колонки uses нет
+    conn = sqlite3.connect(str(tmp_path / "pool.db"))
+    conn.execute("CREATE TABLE questions (role TEXT, category TEXT, question TEXT, "
+                 "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, UNIQUE (role, category, question))")
+    conn.execute("INSERT INTO questions (role, category, question) VALUES ('dev', 'situational', 'Расскажи о себе.')")
+    conn.commit()
+    conn.close()
+
+    pool = make_pool(tmp_path, max_uses=1)
+    pool.seed_from_json(str(seed))
+
+    assert pool.size("dev", "situational") == 0
+    assert pool.size(GENERIC_ROLE, "situational") == 1
+    # Общий вопрос - запасной вариант, и в отставку он не уходит
+    assert pool.take("dev", "situational") == "Расскажи о себе."
+    assert pool.take("dev", "situational") == "Расскажи о себе."
+    pool.close()
+
+
+def test_uses_are_persisted_on_close(tmp_path):
+    pool = make_pool(tmp_path, max_uses=3)
+    asyncio.run(pool.add("dev", "technical", ["Q1?"]))
+    pool.take("dev", "technical")
+    pool.close()
+
+    pool = make_pool(tmp_path, max_uses=3)
+    assert pool.uses[("dev", "technical", "Q1?")] == 1
+    pool.close()
+
+
+def test_take_any_falls_back_to_other_categories(tmp_path):
+    pool = make_pool(tmp_path)
+    asyncio.run(pool.add("dev", "practical", ["P1?"]))
+    asyncio.run(pool.add(GENERIC_ROLE, "situational", ["S1?"]))
+
+    assert pool.take("dev", "technical") is None
+    # Сначала вопросы роли любой категории, затем общие
+    assert pool.take_any("dev") == ("P1?", "practical")
+    assert pool.take_any("dev", exclude=["P1?"]) == ("S1?", "situational")
+    assert pool.take_any("dev", exclude=["P1?", "S1?"]) is None
+    pool.close()
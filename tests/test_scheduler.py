@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from utils.scheduler import Priority, PriorityScheduler
+
+
+@pytest.mark.parametrize("kwargs", [{"rate": 0}, {"rate": -1}, {"max_concurrency": 0}, {"aging": -1}])
+def test_rejects_invalid_limits(kwargs):
+    with pytest.raises(ValueError):
+        PriorityScheduler(**kwargs)
+
+
+async def _run_order(aging, interactive):
+    scheduler = PriorityScheduler(max_concurrency=1, rate=1000, burst=1000, aging=aging)
+    order = []
+
+    async def job(priority, tag):
+        async with scheduler.slot(priority):
+            order.append(tag)
+            await asyncio.sleep(0.01)
+
+    # Первый вызов занимает единственный слот, остальные выстраиваются в очередь
+    tasks = [asyncio.ensure_future(job(Priority.INTERACTIVE, "first"))]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.ensure_future(job(Priority.BACKGROUND, "background")))
+    for i in range(interactive):
+        tasks.append(asyncio.ensure_future(job(Priority.INTERACTIVE, f"interactive{i}")))
+        await asyncio.sleep(0.005)
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_higher_priority_goes_first():
+    order = asyncio.run(_run_order(aging=10, interactive=3))
+    assert order[-1] == "background"
+
+
+def test_aging_prevents_starvation():
+    order = asyncio.run(_run_order(aging=0.02, interactive=20))
+    assert order.index("background") < len(order) - 5
+
+
+def test_stats_count_served_requests():
+    async def run():
+        scheduler = PriorityScheduler(max_concurrency=2, rate=1000)
+        await asyncio.gather(*(scheduler.acquire(Priority.ANALYSIS) for _ in range(2)))
+        return scheduler.stats()
+
+    stats = asyncio.run(run())
+    assert stats["active"] == 2
+    assert stats["classes"]["analysis"]["served"] == 2
@@ -0,0 +1,215 @@
+import sqlite3
+import asyncio
+
+import pytest
+
+from utils.session_store import SessionBackend, SessionStore, SQLiteSessionBackend
+
+
+@pytest.fixture
+def backend():
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    yield SQLiteSessionBackend(conn)
+    conn.close()
+
+
+def make_store(backend, **kwargs):
+    kwargs.setdefault("flush_interval", 0)
+    return SessionStore(backend, "test", **kwargs)
+
+
+def make_manual_store(backend, **kwargs):
+    """Фоновая запись не успевает сработать - flush() и _evict() тест вызывает сам"""
+    return SessionStore(backend, "test", flush_interval=60, **kwargs)
+
+
+def test_save_is_written_behind(backend):
+    async def run():
+        store = make_store(backend, flush_interval=0.01)
+        store[1] = {"answers": []}
+        written_before = backend.load("test", 1)
+        store[1]["answers"].append("ответ")
+        store.save(1)
+        await asyncio.sleep(0.05)
+        written_after = backend.load("test", 1)
+        await store.close()
+        return written_before, written_after
+
+    before, after = asyncio.run(run())
+    assert before is None
+    assert after == '{"answers": ["ответ"]}'
+
+
+def test_restart_rehydrates_without_transient_keys(backend):
+    async def run():
+        store = make_store(backend, transient=["panel"])
+        store[1] = {"state": "in_progress", "panel": object()}
+        await store.close()
+
+        restored = make_store(backend, transient=["panel"], restore=lambda s: dict(s, panel="new"))
+        session = await restored.ensure(1)
+        missing = await restored.ensure(2)
+        return session, missing, restored.stats()
+
+    session, missing, stats = asyncio.run(run())
+    assert session == {"state": "in_progress", "panel": "new"}
+    assert missing is None
+    assert stats["rehydrated"] == 1
+
+
+def test_encode_persists_objects(backend):
+    class Session:
+        def __init__(self, state):
+            self.state = state
+
+    async def run():
+        store = make_store(backend, encode=lambda s: {"state": s.state}, restore=lambda d: Session(d["state"]))
+        store[1] = Session("completed")
+        await store.close()
+        return await make_store(backend, restore=lambda d: Session(d["state"])).ensure(1)
+
+    assert asyncio.run(run()).state == "completed"
+
+
+def test_delete_removes_row(backend):
+    async def run():
+        store = make_store(backend)
+        store[1] = {"a": 1}
+        await store.flush()
+        del store[1]
+        await store.flush()
+        return await make_store(backend).ensure(1)
+
+    assert asyncio.run(run()) is None
+
+
+def test_lru_eviction_skips_dirty_and_pinned(backend):
+    async def run():
+        evicted = []
+        store = make_manual_store(backend, max_entries=1, on_evict=evicted.append)
+        store[1] = {"id": 1}
+        store[2] = {"id": 2}
+        store[3] = {"id": 3}
+        await store.flush()
+        store[3]["id"] = 33
+        store.save(3)
+        with store.pinned(1):
+            store._evict()
+            hot_while_pinned = sorted(store)
+        store._evict()
+        return hot_while_pinned, sorted(store), evicted, dict(store.evictions)
+
+    hot_while_pinned, hot, evicted, reasons = asyncio.run(run())
+    # 2 выгружена по LRU, 1 закреплена, 3 ждет записи
+    assert hot_while_pinned == [1, 3]
+    assert hot == [3]
+    assert evicted == [{"id": 2}, {"id": 1}]
+    assert reasons == {"lru": 2}
+
+
+def test_idle_and_spill_eviction(backend):
+    async def run():
+        store = make_manual_store(backend, idle_ttl=3600, spill=lambda s: s["state"] == "completed", spill_ttl=0)
+        store[1] = {"state": "completed"}
+        store[2] = {"state": "in_progress"}
+        await store.flush()
+        store._evict()
+        return sorted(store), dict(store.evictions)
+
+    assert asyncio.run(run()) == ([2], {"spill": 1})
+
+
+def test_evicted_session_is_still_visible(backend):
+    async def run():
+        store = make_manual_store(backend, max_entries=1)
+        store[1] = {"id": 1}
+        store[2] = {"id": 2}
+        await store.flush()
+        store._evict()
+        evicted = 1 not in list(store)
+        contained = 1 in store
+        value = store[1]
+        del store[2]
+        removed = 2 not in store
+        await store.flush()
+        return evicted, contained, value, removed, 2 in store, backend.exists("test", 2)
+
+    assert asyncio.run(run()) == (True, True, {"id": 1}, True, False, False)
+
+
+def test_resident_bytes_track_snapshots(backend):
+    async def run():
+        store = make_store(backend)
+        store[1] = {"text": "ж" * 10}
+        await store.flush()
+        size = store.resident_bytes
+        del store[1]
+        return size, store.resident_bytes
+
+    size, after = asyncio.run(run())
+    assert size == len('{"text": "жжжжжжжжжж"}'.encode("utf-8"))
+    assert after == 0
+
+
+class CountingBackend(SessionBackend):
+    """Обертка над backend, которая считает синхронные обращения"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.reads = 0
+
+    def load(self, namespace, user_id):
+        self.reads += 1
+        return self.backend.load(namespace, user_id)
+
+    def exists(self, namespace, user_id):
+        self.reads += 1
+        return self.backend.exists(namespace, user_id)
+
+    def save_many(self, namespace, items):
+        self.backend.save_many(namespace, items)
+
+    def delete_many(self, namespace, user_ids):
+        self.backend.delete_many(namespace, user_ids)
+
+
+def test_ensure_miss_is_remembered(backend):
+    async def run():
+        counting = CountingBackend(backend)
+        store = make_manual_store(counting)
+        missing = await store.ensure(1)
+        reads_after_ensure = counting.reads
+        # Проверки после ensure() уже не ходят в backend
+        contained = 1 in store
+        with pytest.raises(KeyError):
+            store[1]
+        reads_after_guards = counting.reads
+        store[1] = {"id": 1}
+        await store.flush()
+        store._forget(1)
+        # Сессия создана заново - промах забыт
+        restored = await store.ensure(1)
+        await store.close()
+        return missing, reads_after_ensure, contained, reads_after_guards, restored
+
+    missing, reads_after_ensure, contained, reads_after_guards, restored = asyncio.run(run())
+    assert missing is None
+    assert not contained
+    assert reads_after_guards == reads_after_ensure == 1
+    assert restored == {"id": 1}
+
+
+def test_flushed_delete_is_known_absent(backend):
+    async def run():
+        counting = CountingBackend(backend)
+        store = make_manual_store(counting)
+        store[1] = {"id": 1}
+        await store.flush()
+        del store[1]
+        await store.flush()
+        reads = counting.reads
+        contained = 1 in store
+        await store.close()
+        return contained, counting.reads - reads
+
+    assert asyncio.run(run()) == (False, 0)
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from utils.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_flight():
+    async def run():
+        flight = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "ответ"
+
+        results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)))
+        return results, len(calls), flight.stats()
+
+    results, calls, stats = asyncio.run(run())
+    assert results == ["ответ"] * 5
+    assert calls == 1
+    assert stats == {"in_flight": 0, "calls": 1, "coalesced": 4, "abandoned": 0}
+
+
+def test_error_reaches_every_waiter_and_is_not_cached():
+    async def run():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("сбой")
+
+        async def succeed():
+            return "ok"
+
+        results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+        # Следующий вызов после ошибки идет заново
+        second = await flight.do("key", succeed)
+        return results, second, flight.stats()
+
+    results, second, stats = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert second == "ok"
+    assert stats["calls"] == 2
+
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    async def run():
+        flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.02)
+            return "ответ"
+
+        first = asyncio.ensure_future(flight.do("key", fetch))
+        second = asyncio.ensure_future(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "ответ"
+
+
+def test_last_waiter_leaving_cancels_shared_call():
+    async def run():
+        flight = SingleFlight()
+        started, finished = asyncio.Event(), []
+
+        async def fetch():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                finished.append("cancelled")
+                raise
+            return "ответ"
+
+        async def other():
+            return "новый ответ"
+
+        waiters = [asyncio.ensure_future(flight.do("key", fetch)) for _ in range(2)]
+        await started.wait()
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        in_flight = flight.stats()["in_flight"]
+        # Следующий вызов с тем же ключом не цепляется за отмененный
+        again = await flight.do("key", other)
+        return finished, in_flight, again, flight.stats()
+
+    finished, in_flight, again, stats = asyncio.run(run())
+    assert finished == ["cancelled"]
+    assert in_flight == 0
+    assert again == "новый ответ"
+    assert stats["abandoned"] == 1
+
+
+def test_deadline_of_one_waiter_releases_call_for_others():
+    async def run():
+        flight = SingleFlight()
+        cancelled = []
+
+        async def fetch():
+            try:
+                await asyncio.sleep(0.05)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return "ответ"
+
+        short = asyncio.wait_for(flight.do("key", fetch), timeout=0.01)
+        long = flight.do("key", fetch)
+        results = await asyncio.gather(short, long, return_exceptions=True)
+        return results, cancelled
+
+    results, cancelled = asyncio.run(run())
+    assert isinstance(results[0], asyncio.TimeoutError)
+    # Второй ожидающий еще ждет - общий вызов продолжается
+    assert results[1] == "ответ"
+    assert cancelled == []
@@ -0,0 +1,131 @@
+import json
+import asyncio
+
+import pytest
+from aiohttp import web
+from telegram.error import BadRequest, RetryAfter, TimedOut
+
+from gigachat_transport import GigaChatRateLimitError, GigaChatTransport, GigaChatTransportError
+from utils.live_message import LiveMessage, render_html
+
+
+def _event(content=None, usage=None):
+    chunk = {"choices": [{"delta": {"content": content}}] if content is not None else []}
+    if usage:
+        chunk["usage"] = usage
+    return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+async def _stream(events, status=200, headers=None, **transport_kwargs):
+    """Поднимает локальный /chat/completions с заданными событиями SSE и читает поток транспортом"""
+
+    async def handle(request):
+        if status != 200:
+            return web.Response(status=status, text="ошибка", headers=headers)
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for event in events:
+            await response.write(event)
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_post("/chat/completions", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    transport = GigaChatTransport(base_url=f"http://127.0.0.1:{port}", **transport_kwargs)
+    deltas = []
+
+    async def on_delta(delta):
+        deltas.append(delta)
+
+    try:
+        text = await transport.chat_completion_stream("token", [{"role": "user", "content": "?"}], on_delta)
+        return text, deltas
+    finally:
+        await transport.close()
+        await runner.cleanup()
+
+
+def test_stream_joins_deltas_and_stops_at_done():
+    events = [b": keep-alive\n\n", _event("Привет"), _event(""), _event(", мир"),
+              _event(usage={"prompt_tokens": 3, "completion_tokens": 2}), b"data: [DONE]\n\n", _event("лишнее")]
+    text, deltas = asyncio.run(_stream(events))
+    assert text == "Привет, мир"
+    assert deltas == ["Привет", ", мир"]
+
+
+def test_stream_rejects_malformed_event():
+    with pytest.raises(GigaChatTransportError):
+        asyncio.run(_stream([_event("ok"), b"data: {not json\n\n"]))
+
+
+def test_stream_maps_http_errors():
+    with pytest.raises(GigaChatRateLimitError):
+        asyncio.run(_stream([], status=429, headers={"Retry-After": "2"}))
+
+
+def test_render_html_escapes_and_cuts_before_markup():
+    content = render_html("<b>H</b>", "a<b" * 100, "<i>f</i>", limit=40)
+    assert content.startswith("<b>H</b>") and content.endswith("<i>f</i>")
+    assert len(content) <= 40
+    body = content[len("<b>H</b>"):-len("<i>f</i>")]
+    assert "<" not in body
+    # Обрезка не оставляет половину сущности &lt;
+    assert body.count("&") == body.count(";")
+
+
+class FakeMessage:
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.calls = []
+
+    async def edit_text(self, text, **kwargs):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.calls.append(("edit", text, kwargs.get("reply_markup")))
+
+    async def reply_text(self, text, **kwargs):
+        self.calls.append(("reply", text, kwargs.get("reply_markup")))
+
+    async def delete(self):
+        self.calls.append(("delete",))
+
+
+def test_intermediate_edit_errors_do_not_escape():
+    async def run():
+        message = FakeMessage([TimedOut(), BadRequest("can't parse entities")])
+        live = LiveMessage(message, min_interval=0)
+        await live.update("1")
+        await live.update("<2")
+        await live.update("3")
+        return message.calls
+
+    assert asyncio.run(run()) == [("edit", "1&lt;23 ▌", None)]
+
+
+def test_finish_retries_after_retry_after():
+    async def run():
+        message = FakeMessage([RetryAfter(0.01)])
+        live = LiveMessage(message, min_interval=0)
+        ok = await live.finish("готово", reply_markup="keyboard")
+        return ok, message.calls
+
+    ok, calls = asyncio.run(run())
+    assert ok
+    assert calls == [("edit", "готово", "keyboard")]
+
+
+def test_finish_falls_back_to_new_message():
+    async def run():
+        message = FakeMessage([BadRequest("message to edit not found")])
+        live = LiveMessage(message, header="<b>H</b>\n", min_interval=0)
+        ok = await live.finish("готово")
+        return ok, message.calls
+
+    ok, calls = asyncio.run(run())
+    assert ok
+    assert calls == [("reply", "<b>H</b>\nготово", None), ("delete",)]
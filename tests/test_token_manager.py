@@ -0,0 +1,174 @@
+import asyncio
+import time
+
+import pytest
+
+from gigachat_transport import (GigaChatAPI, GigaChatAuthError, GigaChatServerError, GigaChatUnavailableError,
+                                TokenManager)
+from utils.circuit_breaker import CircuitBreaker
+from utils.scheduler import PriorityScheduler
+
+
+class FakeTransport:
+    """OAuth-эндпоинт: каждый fetch_token выдает новый токен"""
+
+    def __init__(self, expires_in=1800, delay=0.01, status=200):
+        self.expires_in = expires_in
+        self.delay = delay
+        self.status = status
+        self.fetches = 0
+        self.scheduler = None
+        self.active_at_fetch = []
+
+    async def fetch_token(self, auth_key, scope):
+        self.fetches += 1
+        if self.scheduler is not None:
+            self.active_at_fetch.append(self.scheduler.active)
+        await asyncio.sleep(self.delay)
+        if self.status != 200:
+            return self.status, "upstream unavailable"
+        return 200, {"access_token": f"token-{self.fetches}", "expires_in": self.expires_in}
+
+    async def chat_completion(self, access_token, messages, **kwargs):
+        return {"choices": [{"message": {"content": f"ответ для {access_token}"}}]}
+
+
+def make_tokens(transport, **kwargs):
+    return TokenManager(transport, auth_key="key", scope="scope", **kwargs)
+
+
+def test_concurrent_get_token_shares_one_fetch():
+    async def run():
+        transport = FakeTransport()
+        tokens = make_tokens(transport)
+        results = await asyncio.gather(*(tokens.get_token() for _ in range(10)))
+        await tokens.close()
+        return results, transport.fetches
+
+    results, fetches = asyncio.run(run())
+    assert results == ["token-1"] * 10
+    assert fetches == 1
+
+
+def test_background_refresh_before_expiry():
+    async def run():
+        # Запас больше срока жизни - обновление планируется через минимальную паузу в 1 с
+        transport = FakeTransport(expires_in=60)
+        tokens = make_tokens(transport, refresh_margin=120)
+        first = await tokens.get_token()
+        await asyncio.sleep(1.1)
+        second = await tokens.get_token()
+        await tokens.close()
+        return first, second, transport.fetches, tokens.refresh_count
+
+    first, second, fetches, refresh_count = asyncio.run(run())
+    assert first == "token-1"
+    assert second == "token-2"
+    assert fetches == refresh_count == 2
+
+
+def test_401_replay_shares_one_refresh():
+    async def run():
+        transport = FakeTransport()
+        tokens = make_tokens(transport)
+        await tokens.get_token()
+        # Токен отозван на сервере, но по часам еще действует
+        revoked = tokens.access_token
+        seen = []
+
+        async def request(token):
+            seen.append(token)
+            # 401 приходят вразнобой: часть - уже после того, как обновление завершилось
+            await asyncio.sleep(0.005 * len(seen))
+            if token == revoked:
+                raise GigaChatAuthError("401: revoked", status=401)
+            return token
+
+        results = await asyncio.gather(*(tokens.call(request) for _ in range(10)))
+        await tokens.close()
+        return results, transport.fetches
+
+    results, fetches = asyncio.run(run())
+    assert results == ["token-2"] * 10
+    # Первичная выдача и одно обновление на все десять 401
+    assert fetches == 2
+
+
+def test_401_after_refresh_is_raised():
+    async def run():
+        tokens = make_tokens(FakeTransport())
+
+        async def request(token):
+            raise GigaChatAuthError("401: denied", status=401)
+
+        try:
+            with pytest.raises(GigaChatAuthError):
+                await tokens.call(request)
+        finally:
+            await tokens.close()
+        return tokens.refresh_count
+
+    assert asyncio.run(run()) == 2
+
+
+def test_expired_token_is_refreshed():
+    async def run():
+        transport = FakeTransport()
+        tokens = make_tokens(transport)
+        await tokens.get_token()
+        tokens.expires_at = time.time() - 1
+        token = await tokens.get_token()
+        await tokens.close()
+        return token, transport.fetches
+
+    assert asyncio.run(run()) == ("token-2", 2)
+
+
+def make_api(transport, threshold=2):
+    scheduler = PriorityScheduler(max_concurrency=1, rate=100)
+    transport.scheduler = scheduler
+    return GigaChatAPI(transport, make_tokens(transport), scheduler,
+                       breaker=CircuitBreaker(failure_threshold=threshold, recovery_timeout=30), max_retries=0)
+
+
+def test_oauth_outage_opens_breaker():
+    async def run():
+        transport = FakeTransport(status=503)
+        api = make_api(transport)
+        errors = []
+        for i in range(3):
+            try:
+                await api.complete([{"role": "user", "content": str(i)}])
+            except Exception as e:
+                errors.append(type(e))
+        await api.tokens.close()
+        return errors, transport.fetches, api.breaker.state
+
+    errors, fetches, state = asyncio.run(run())
+    assert errors == [GigaChatServerError, GigaChatServerError, GigaChatUnavailableError]
+    assert fetches == 2
+    assert state == CircuitBreaker.OPEN
+
+
+def test_bad_auth_key_does_not_open_breaker():
+    async def run():
+        api = make_api(FakeTransport(status=400), threshold=1)
+        with pytest.raises(GigaChatAuthError):
+            await api.complete([{"role": "user", "content": "?"}])
+        await api.tokens.close()
+        return api.breaker.state
+
+    assert asyncio.run(run()) == CircuitBreaker.CLOSED
+
+
+def test_token_is_fetched_before_scheduler_slot():
+    async def run():
+        transport = FakeTransport()
+        api = make_api(transport)
+        answer = await api.complete([{"role": "user", "content": "?"}])
+        await api.tokens.close()
+        return answer, transport.active_at_fetch
+
+    answer, active_at_fetch = asyncio.run(run())
+    assert answer == "ответ для token-1"
+    assert active_at_fetch == [0]
@@ -0,0 +1,116 @@
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from utils.db import SQLitePool
+
+
+def make_cache_key(model: str, messages: List[Dict], temperature: float, max_tokens: int) -> str:
+    """Адрес ответа по содержимому запроса"""
+    payload = json.dumps([model, messages, temperature, max_tokens], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Кэш ответов LLM: LRU в памяти с TTL и необязательный уровень в SQLite.
+
+    Уровень в SQLite переживает перезапуски; найденные в нем записи
+    поднимаются обратно в память.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600, db_path: Optional[str] = None,
+                 db: Optional[SQLitePool] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.conn = None
+        self.db = db
+        self._lock = threading.Lock()
+        if db_path:
+            self._init_database()
+
+    def _init_database(self):
+        if self.db is not None:
+            self.conn = self.db.connect(self.db_path)
+        else:
+            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                expires_at REAL
+            )
+        ''')
+        self.conn.commit()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if time.time() < expires_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        if self.conn is not None:
+            row = await asyncio.to_thread(self._load, key)
+            if row is not None:
+                value, expires_at = row
+                self._remember(key, value, expires_at)
+                self.disk_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str):
+        expires_at = time.time() + self.ttl
+        self._remember(key, value, expires_at)
+        if self.conn is not None:
+            await asyncio.to_thread(self._store, key, value, expires_at)
+
+    def _remember(self, key: str, value: str, expires_at: float):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, key: str) -> Optional[tuple]:
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT value, expires_at FROM responses WHERE key = ? AND expires_at > ?', (key, time.time())
+            ).fetchone()
+        return row
+
+    def _store(self, key: str, value: str, expires_at: float):
+        with self._lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, value, expires_at)
+            )
+            self.conn.commit()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        if self.conn is not None and self.db is None:
+            self.conn.close()
+        self.conn = None
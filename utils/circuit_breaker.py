@@ -0,0 +1,71 @@
+import time
+from typing import Dict
+
+
+class CircuitOpenError(Exception):
+    """Цепь разомкнута: вызов отклонен без обращения к сервису"""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"Сервис недоступен, повторная попытка через {retry_in:.0f} с")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Размыкатель цепи: после failure_threshold сбоев подряд отклоняет вызовы
+    на recovery_timeout секунд, затем пропускает один пробный вызов (half-open).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._state = self.CLOSED
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+        return self._state
+
+    def before_call(self):
+        """Бросает CircuitOpenError, если вызов сейчас делать нельзя"""
+        state = self.state
+        if state == self.OPEN or (state == self.HALF_OPEN and self._probe_in_flight):
+            self.rejected += 1
+            raise CircuitOpenError(max(self.recovery_timeout - (time.monotonic() - self.opened_at), 0))
+        if state == self.HALF_OPEN:
+            self._probe_in_flight = True
+
+    def record_success(self):
+        self.failures = 0
+        self._probe_in_flight = False
+        self._state = self.CLOSED
+
+    def record_cancelled(self):
+        """Вызов отменен до результата - о здоровье сервиса он ничего не говорит"""
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self._state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.times_opened += 1
+            self._state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected
+        }
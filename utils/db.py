@@ -0,0 +1,34 @@
+import os
+import sqlite3
+import threading
+from typing import Dict
+
+
+class SQLitePool:
+    """Общие соединения SQLite: одно соединение на файл базы на весь процесс.
+
+    Пул вопросов, кэш ответов GigaChat и история собеседований берут соединения
+    отсюда, а не открывают свои, и закрываются они один раз - в close().
+    check_same_thread=False: соединениями пользуются и event loop, и потоки to_thread.
+    """
+
+    def __init__(self):
+        self._connections: Dict[str, sqlite3.Connection] = {}
+        self._lock = threading.Lock()
+
+    def connect(self, path: str) -> sqlite3.Connection:
+        key = path if path == ":memory:" else os.path.abspath(path)
+        with self._lock:
+            conn = self._connections.get(key)
+            if conn is None:
+                conn = self._connections[key] = sqlite3.connect(path, check_same_thread=False)
+            return conn
+
+    def stats(self) -> Dict:
+        return {"connections": len(self._connections)}
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
@@ -0,0 +1,147 @@
+import os
+import json
+import asyncio
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from utils.logger import get_logger
+
+
+logger = get_logger("ledger")
+
+
+class LLMLedger:
+    """Журнал вызовов LLM в формате JSON Lines.
+
+    record() только кладет строку в буфер; на диск пишет фоновая задача
+    пачками (по batch_size строк или раз в flush_interval секунд).
+    Файл ротируется по размеру: path -> path.1 -> ... -> path.<backup_count>.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 50 * 1024 * 1024, backup_count: int = 5,
+                 batch_size: int = 200, flush_interval: float = 1.0, max_pending: int = 10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.written = 0
+        self.dropped = 0
+        self._pending: List[str] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+
+    def record(self, entry: Dict):
+        if len(self._pending) >= self.max_pending:
+            # Диск не успевает - теряем записи журнала, но не тормозим запросы
+            self.dropped += 1
+            return
+        self._pending.append(json.dumps(entry, ensure_ascii=False))
+        if self._writer is None or self._writer.done():
+            self._wakeup = asyncio.Event()
+            self._writer = asyncio.ensure_future(self._run())
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                # Не wait_for: в 3.11 он теряет отмену, если событие уже взведено
+                async with asyncio.timeout(self.flush_interval):
+                    await self._wakeup.wait()
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        try:
+            await asyncio.to_thread(self._write, batch)
+        except OSError as e:
+            self.dropped += len(batch)
+            logger.error("❌ Не удалось записать журнал LLM в %s: %s", self.path, e)
+
+    def _write(self, lines: List[str]):
+        data = ("\n".join(lines) + "\n").encode('utf-8')
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if os.path.exists(self.path) and os.path.getsize(self.path) + len(data) > self.max_bytes:
+                self._rotate()
+            with open(self.path, 'ab') as f:
+                f.write(data)
+            self.written += len(lines)
+
+    def _rotate(self):
+        for i in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def stats(self) -> Dict:
+        return {"pending": len(self._pending), "written": self.written, "dropped": self.dropped}
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        await self.flush()
+
+
+class LedgerReplay:
+    """Ответы из журнала LLMLedger по хешу промпта.
+
+    Если один промпт встречался несколько раз (генерация с cache=False),
+    записанные ответы отдаются по кругу в исходном порядке.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.responses: Dict[str, List[str]] = defaultdict(list)
+        self._cursor: Dict[str, int] = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        # Сначала самые старые ротированные файлы, чтобы сохранить порядок записей
+        backups = []
+        i = 1
+        while os.path.exists(f"{self.path}.{i}"):
+            backups.append(f"{self.path}.{i}")
+            i += 1
+        for file_path in list(reversed(backups)) + [self.path]:
+            if not os.path.exists(file_path):
+                continue
+            with open(file_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get("status") == 200 and entry.get("response") is not None:
+                        self.responses[entry["prompt_hash"]].append(entry["response"])
+
+    def take(self, prompt_hash: str) -> Optional[str]:
+        recorded = self.responses.get(prompt_hash)
+        if not recorded:
+            self.misses += 1
+            return None
+        self.hits += 1
+        index = self._cursor[prompt_hash]
+        self._cursor[prompt_hash] = index + 1
+        return recorded[index % len(recorded)]
+
+    def stats(self) -> Dict:
+        return {"prompts": len(self.responses), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,126 @@
+import html
+import time
+import asyncio
+from typing import Optional
+
+from telegram.error import BadRequest, RetryAfter, TelegramError
+
+from utils.logger import get_logger
+
+
+logger = get_logger("live_message")
+
+# Лимит длины текста сообщения в Telegram
+MAX_MESSAGE_LENGTH = 4096
+CURSOR = " ▌"
+
+
+def _retry_seconds(error: RetryAfter) -> float:
+    retry_after = error.retry_after
+    return retry_after.total_seconds() if hasattr(retry_after, 'total_seconds') else retry_after
+
+
+def render_html(header: str, text: str, footer: str = "", limit: int = MAX_MESSAGE_LENGTH) -> str:
+    """header + экранированный text + footer в пределах limit символов.
+
+    header и footer - наша разметка, text - ответ модели: он экранируется и обрезается
+    до того, как к нему добавится разметка, поэтому обрезка не рвет ни теги, ни сущности.
+    """
+    body = html.escape(text, quote=False)
+    room = limit - len(header) - len(footer)
+    if len(body) > room:
+        body = body[:max(room, 0)]
+        # Не оставляем обрывок сущности вроде "&l" в конце
+        amp = body.rfind("&")
+        if amp != -1 and ";" not in body[amp:]:
+            body = body[:amp]
+    return header + body + footer
+
+
+class LiveMessage:
+    """Сообщение Telegram, которое дописывается по мере прихода токенов.
+
+    Правки идут не чаще min_interval секунд: Telegram ограничивает частоту
+    editMessageText, а на RetryAfter мы просто откладываем следующую правку.
+    Первый фрагмент показывается сразу. Промежуточные правки - по возможности:
+    любая ошибка Telegram только откладывает следующую, чтобы не оборвать ход.
+    Текст модели экранируется, если parse_mode - HTML.
+    """
+
+    def __init__(self, message, header: str = "", min_interval: float = 1.5, parse_mode: Optional[str] = "HTML"):
+        self.message = message
+        self.header = header
+        self.min_interval = min_interval
+        self.parse_mode = parse_mode
+        self.text = ""
+        self.edits = 0
+        self._shown = None
+        self._next_edit_at = 0.0
+
+    def _render(self, header: str, text: str, footer: str = "") -> str:
+        if self.parse_mode == "HTML":
+            return render_html(header, text, footer)
+        return (header + text)[:MAX_MESSAGE_LENGTH - len(footer)] + footer
+
+    async def update(self, delta: str):
+        self.text += delta
+        if time.monotonic() >= self._next_edit_at:
+            await self._edit(self._render(self.header, self.text, CURSOR))
+
+    async def finish(self, final_text: Optional[str] = None, header: Optional[str] = None, footer: str = "",
+                     reply_markup=None, attempts: int = 3) -> bool:
+        """Финальная правка полным текстом (или final_text вместо накопленного).
+
+        header/footer заменяют заголовок потока и дописываются после текста. На RetryAfter
+        правка повторяется после паузы; если сообщение так и не удалось поправить, полный
+        текст уходит новым сообщением, а недописанное удаляется. False - если не вышло и это.
+        """
+        if final_text is not None:
+            self.text = final_text
+        content = self._render(self.header if header is None else header, self.text, footer)
+        for _ in range(attempts):
+            delay = self._next_edit_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                if content != self._shown or reply_markup is not None:
+                    await self.message.edit_text(content, parse_mode=self.parse_mode, reply_markup=reply_markup)
+                    self._shown = content
+                    self.edits += 1
+                return True
+            except RetryAfter as e:
+                self._next_edit_at = time.monotonic() + _retry_seconds(e)
+            except BadRequest as e:
+                if "not modified" in str(e).lower():
+                    return True
+                logger.warning("⚠️ Финальная правка не прошла: %s", e)
+                break
+            except TelegramError as e:
+                logger.warning("⚠️ Финальная правка не прошла: %s", e)
+                self._next_edit_at = time.monotonic() + self.min_interval
+
+        try:
+            await self.message.reply_text(content, parse_mode=self.parse_mode, reply_markup=reply_markup)
+        except TelegramError as e:
+            logger.error("❌ Не удалось отправить итоговый текст: %s", e)
+            return False
+        try:
+            await self.message.delete()
+        except TelegramError:
+            pass
+        return True
+
+    async def _edit(self, content: str):
+        if content == self._shown:
+            return
+        try:
+            await self.message.edit_text(content, parse_mode=self.parse_mode)
+            self._shown = content
+            self.edits += 1
+            self._next_edit_at = time.monotonic() + self.min_interval
+        except RetryAfter as e:
+            self._next_edit_at = time.monotonic() + _retry_seconds(e)
+        except TelegramError as e:
+            # BadRequest, TimedOut, NetworkError: промежуточный кадр не важен - покажем следующий
+            logger.warning("⚠️ Не удалось обновить сообщение: %s", e, extra={"sample": 0.1})
+            self._next_edit_at = time.monotonic() + self.min_interval
@@ -0,0 +1,134 @@
+import os
+import sys
+import copy
+import json
+import queue
+import atexit
+import random
+import logging
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from utils.tracing import current_tags
+
+
+ROOT_LOGGER = "hrbot"
+
+# Поля контекста: user_id/session задает хендлер, agent/role/question_type приходят из тегов трассировки
+CONTEXT_FIELDS = ("user_id", "session", "agent", "role", "question_type")
+
+# Атрибуты, которые есть у любой LogRecord - все остальные считаются структурными полями из extra
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "sample"}
+
+_context: contextvars.ContextVar[dict] = contextvars.ContextVar("log_context", default={})
+_listener: Optional[QueueListener] = None
+_handler: Optional[QueueHandler] = None
+_sampler = random.Random()
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON: время, уровень, логгер, сообщение, контекст и поля из extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_") and value is not None:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _SamplingFilter(logging.Filter):
+    """extra={"sample": 0.1} - пропускается примерно каждая десятая такая запись.
+
+    У прошедших записей проставляется sampled, чтобы при подсчете их можно было взвесить.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, "sample", None)
+        if rate is None or rate >= 1:
+            return True
+        if _sampler.random() < rate:
+            record.sampled = rate
+            return True
+        return False
+
+
+class _ContextQueueHandler(QueueHandler):
+    """Кладет запись в очередь, сняв контекст в вызывающей задаче; пишет в поток уже listener"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        context = {**current_tags(), **_context.get()}
+        for field in CONTEXT_FIELDS:
+            if getattr(record, field, None) is None and context.get(field) is not None:
+                setattr(record, field, context[field])
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(level: Optional[str] = None, fmt: Optional[str] = None):
+    """Настраивает логгер hrbot: очередь + фоновый listener. Повторные вызовы ничего не делают.
+
+    LOG_LEVEL - уровень (INFO), LOG_FORMAT - json или text (для локальной отладки).
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return
+
+    log_queue = queue.SimpleQueue()
+    _handler = _ContextQueueHandler(log_queue)
+    _handler.addFilter(_SamplingFilter())
+
+    output = logging.StreamHandler(sys.stdout)
+    if (fmt or os.getenv("LOG_FORMAT", "json")) == "text":
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    else:
+        output.setFormatter(JsonFormatter())
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(level or os.getenv("LOG_LEVEL", "INFO"))
+    root.addHandler(_handler)
+    root.propagate = False
+
+    _listener = QueueListener(log_queue, output)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Дописывает очередь и останавливает listener"""
+    global _listener, _handler
+    if _listener is not None:
+        logging.getLogger(ROOT_LOGGER).removeHandler(_handler)
+        _listener.stop()
+        _listener = None
+        _handler = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Логгер модуля; вывод настраивает точка входа вызовом setup_logging()"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+@contextmanager
+def log_context(**fields):
+    """Поля контекста для всех записей внутри блока (и в задачах, запущенных из него)"""
+    token = _context.set({**_context.get(), **{k: v for k, v in fields.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _context.reset(token)
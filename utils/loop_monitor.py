@@ -0,0 +1,92 @@
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from typing import Dict, Optional
+
+from utils.logger import get_logger
+from utils.tracing import Metrics, registries
+
+
+logger = get_logger("loop_monitor")
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class LoopStallDetector:
+    """Сторож event loop: гистограмма задержки и стек кода, который держит loop.
+
+    В самом loop раз в interval секунд срабатывает колбэк-пульс и замеряет,
+    насколько позже положенного его вызвали. Отдельный поток следит за пульсом:
+    если его нет дольше threshold, снимает стек потока loop - это и есть
+    блокирующий вызов. Цена - один колбэк и одно пробуждение потока на interval.
+    """
+
+    def __init__(self, threshold: float = 0.25, interval: float = 0.1):
+        self.threshold = threshold
+        self.interval = interval
+        self.lag = Metrics("hrbot_event_loop_lag_seconds", LAG_BUCKETS,
+                           description="Задержка срабатывания колбэков event loop")
+        self.stalls = 0
+        self.max_lag = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = 0.0
+        self._reported_beat = 0.0
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Запускается из работающего event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._handle = self._loop.call_later(self.interval, self._beat, self._last_beat + self.interval)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-stall-detector", daemon=True)
+        self._thread.start()
+        if self.lag not in registries:
+            registries.append(self.lag)
+
+    def _beat(self, expected: float):
+        now = time.monotonic()
+        lag = max(0.0, now - expected)
+        self._last_beat = now
+        self.lag.observe("", lag, {})
+        self.max_lag = max(self.max_lag, lag)
+        if lag >= self.threshold:
+            self.stalls += 1
+        self._handle = self._loop.call_later(self.interval, self._beat, now + self.interval)
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            beat = self._last_beat
+            blocked = time.monotonic() - beat
+            # Один отчет на одну остановку: следующий - только после нового пульса
+            if blocked < self.threshold + self.interval or beat == self._reported_beat:
+                continue
+            self._reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            logger.warning("🧊 Event loop заблокирован уже %.2f с", blocked,
+                           extra={"blocked_s": round(blocked, 3), "stack": stack})
+
+    def stats(self) -> Dict:
+        lag = self.lag.summary().get("", {})
+        return {
+            "stalls": self.stalls,
+            "max_lag_s": self.max_lag,
+            "avg_lag_s": lag.get("mean_s", 0.0),
+            "threshold_s": self.threshold
+        }
+
+    def stop(self):
+        self._stop.set()
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
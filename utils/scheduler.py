@@ -0,0 +1,127 @@
+import time
+import heapq
+import asyncio
+import itertools
+from enum import IntEnum
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+
+class Priority(IntEnum):
+    """Классы приоритета запросов: меньше значение - раньше обслуживается"""
+    INTERACTIVE = 0  # то, чего кандидат ждет прямо сейчас: следующий вопрос, HR-фидбек
+    ANALYSIS = 1     # анализы агентов и их обсуждение
+    BACKGROUND = 2   # косметика и фон: реакции на шепот, пополнение пула
+
+
+class _ClassStats:
+    def __init__(self):
+        self.waiting = 0
+        self.served = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+
+class PriorityScheduler:
+    """Ограничитель запросов: лимит одновременных вызовов, token bucket и приоритеты.
+
+    Свободный слот получает ожидающий с наименьшим сроком: время постановки в очередь
+    плюс aging секунд за каждую ступень приоритета. Из пришедших одновременно первым
+    идет более приоритетный, но фоновый запрос, прождавший 2 * aging, обгоняет свежие
+    интерактивные - непрерывный поток INTERACTIVE не может заморить BACKGROUND.
+    """
+
+    def __init__(self, max_concurrency: int = 10, rate: float = 5.0, burst: Optional[float] = None,
+                 aging: float = 5.0):
+        if rate <= 0:
+            raise ValueError(f"rate должен быть положительным, получено {rate}")
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency должен быть не меньше 1, получено {max_concurrency}")
+        if aging < 0:
+            raise ValueError(f"aging не может быть отрицательным, получено {aging}")
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.aging = aging
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self.active = 0
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._waiters: List[Tuple[float, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._stats = {priority: _ClassStats() for priority in Priority}
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _dispatch(self):
+        self._timer = None
+        self._refill()
+        while self._waiters and self.active < self.max_concurrency:
+            if self._tokens < 1:
+                # Токенов нет - просыпаемся, когда накопится следующий
+                delay = (1 - self._tokens) / self.rate
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():  # ожидающий отменен
+                continue
+            self._tokens -= 1
+            self.active += 1
+            future.set_result(None)
+
+    async def acquire(self, priority: Priority = Priority.INTERACTIVE):
+        stats = self._stats[priority]
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (started + int(priority) * self.aging, next(self._seq), future))
+        stats.waiting += 1
+        try:
+            if self._timer is None:
+                self._dispatch()
+            await future
+        except asyncio.CancelledError:
+            # Слот мог быть выдан одновременно с отменой - возвращаем его
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            stats.waiting -= 1
+
+        waited = time.monotonic() - started
+        stats.served += 1
+        stats.total_wait += waited
+        stats.max_wait = max(stats.max_wait, waited)
+
+    def release(self):
+        self.active -= 1
+        if self._timer is None:
+            self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority = Priority.INTERACTIVE):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict:
+        """Глубина очереди и время ожидания по каждому классу приоритета"""
+        return {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "rate": self.rate,
+            "aging_s": self.aging,
+            "classes": {
+                priority.name.lower(): {
+                    "queued": s.waiting,
+                    "served": s.served,
+                    "avg_wait_s": s.total_wait / s.served if s.served else 0.0,
+                    "max_wait_s": s.max_wait
+                }
+                for priority, s in self._stats.items()
+            }
+        }
@@ -0,0 +1,394 @@
+import json
+import time
+import weakref
+import asyncio
+import sqlite3
+import threading
+from enum import Enum
+from collections import Counter, OrderedDict, defaultdict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils.logger import get_logger
+from utils.tracing import Collector, registries
+
+
+logger = get_logger("session_store")
+
+
+class SessionBackend:
+    """Постоянный уровень хранилища сессий - ДОЛЖЕН БЫТЬ ПЕРЕОПРЕДЕЛЕН.
+
+    Методы синхронные: SessionStore вызывает их в отдельном потоке.
+    """
+
+    def load(self, namespace: str, user_id: int) -> Optional[str]:
+        raise NotImplementedError
+
+    def exists(self, namespace: str, user_id: int) -> bool:
+        raise NotImplementedError
+
+    def save_many(self, namespace: str, items: List[Tuple[int, str]]):
+        raise NotImplementedError
+
+    def delete_many(self, namespace: str, user_ids: Iterable[int]):
+        raise NotImplementedError
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """Сессии в SQLite: одна строка JSON на (namespace, user_id).
+
+    WAL: запись пачки не блокирует чтение при подъеме сессии, а synchronous=NORMAL
+    не ждет fsync на каждый коммит - потерять можно только последнюю пачку при сбое ОС.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS sessions (
+                    namespace TEXT,
+                    user_id INTEGER,
+                    data TEXT,
+                    updated_at REAL,
+                    PRIMARY KEY (namespace, user_id)
+                )
+            ''')
+            self.conn.commit()
+
+    def load(self, namespace: str, user_id: int) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT data FROM sessions WHERE namespace = ? AND user_id = ?', (namespace, user_id)
+            ).fetchone()
+        return row[0] if row else None
+
+    def exists(self, namespace: str, user_id: int) -> bool:
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT 1 FROM sessions WHERE namespace = ? AND user_id = ?', (namespace, user_id)
+            ).fetchone()
+        return row is not None
+
+    def save_many(self, namespace: str, items: List[Tuple[int, str]]):
+        now = time.time()
+        with self._lock:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO sessions (namespace, user_id, data, updated_at) VALUES (?, ?, ?, ?)',
+                [(namespace, user_id, data, now) for user_id, data in items]
+            )
+            self.conn.commit()
+
+    def delete_many(self, namespace: str, user_ids: Iterable[int]):
+        with self._lock:
+            self.conn.executemany(
+                'DELETE FROM sessions WHERE namespace = ? AND user_id = ?',
+                [(namespace, user_id) for user_id in user_ids]
+            )
+            self.conn.commit()
+
+
+def _encode(value):
+    if isinstance(value, Enum):
+        return value.value
+    return str(value)
+
+
+# Все хранилища процесса - для общих метрик в /metrics
+_stores: "weakref.WeakSet[SessionStore]" = weakref.WeakSet()
+
+
+def _collect_resident_bytes():
+    return [({"namespace": store.namespace}, store.resident_bytes) for store in _stores]
+
+
+def _collect_evictions():
+    return [({"namespace": store.namespace, "reason": reason}, count)
+            for store in _stores for reason, count in store.evictions.items()]
+
+
+_collectors = [
+    Collector("hrbot_sessions_resident_bytes", "Размер сессий в памяти (по последнему снимку JSON)",
+              _collect_resident_bytes),
+    Collector("hrbot_sessions_resident", "Сессий в памяти",
+              lambda: [({"namespace": store.namespace}, len(store)) for store in _stores]),
+    Collector("hrbot_session_evictions_total", "Сессии, выгруженные из памяти, по причинам",
+              _collect_evictions, kind="counter"),
+]
+
+
+class SessionStore(MutableMapping):
+    """Сессии интервью: горячий уровень в памяти и постоянный - в backend.
+
+    Чтение и запись идут в словарь в памяти. Изменения уходят на диск с отложенной
+    записью: save(user_id) только помечает сессию, фоновая задача пишет помеченные
+    пачкой раз в flush_interval секунд. После перезапуска сессия поднимается
+    из backend при первом обращении - await ensure(user_id) в начале хендлера.
+
+    transient - ключи, которые не сериализуются (задачи, панели агентов, трассы);
+    restore(session) восстанавливает их у поднятой с диска сессии. Сессии-объекты
+    сохраняются через encode(session) -> dict, а restore получает этот dict.
+
+    Память ограничена: после каждой записи из памяти выгружаются уже сохраненные
+    сессии - простаивающие дольше idle_ttl, те, для которых spill(session) истинно
+    (например, завершенные), через spill_ttl простоя, и самые давние по LRU, пока
+    их больше max_entries или больше max_bytes. Выгруженная сессия вернется
+    через ensure(); сессии под pinned() не выгружаются.
+
+    Проверка `user_id in store`, store[user_id] и del store[user_id] видят и выгруженные
+    сессии: при промахе в памяти они синхронно обращаются к backend. Это запасной путь -
+    хендлеры сначала делают await ensure(), и дальше все обращения попадают в память.
+    Промахи ensure() тоже запоминаются, поэтому проверки после него на диск не ходят.
+    """
+
+    def __init__(self, backend: SessionBackend, namespace: str, transient: Iterable[str] = (),
+                 restore: Optional[Callable[[Dict], Any]] = None, encode: Optional[Callable[[Any], Dict]] = None,
+                 flush_interval: float = 0.5,
+                 max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024, idle_ttl: float = 1800,
+                 spill: Optional[Callable[[Any], bool]] = None, spill_ttl: float = 60,
+                 on_evict: Optional[Callable[[Any], None]] = None, sweep_interval: float = 10):
+        self.backend = backend
+        self.namespace = namespace
+        self.transient = frozenset(transient)
+        self.restore = restore
+        self.encode = encode
+        self.flush_interval = flush_interval
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.spill = spill
+        self.spill_ttl = spill_ttl
+        self.on_evict = on_evict
+        self.sweep_interval = sweep_interval
+        self.rehydrated = 0
+        self.written = 0
+        self.resident_bytes = 0
+        self.evictions: Counter = Counter()
+        # Порядок - от давно не использованных к недавним
+        self._hot: "OrderedDict[int, Dict]" = OrderedDict()
+        self._seen: Dict[int, float] = {}
+        self._sizes: Dict[int, int] = {}
+        self._pins: Dict[int, int] = defaultdict(int)
+        self._dirty: set = set()
+        self._deleted: set = set()
+        # Пользователи, которых нет ни в памяти, ни в backend; не больше 10 * max_entries
+        self._absent: set = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+        _stores.add(self)
+        for collector in _collectors:
+            if collector not in registries:
+                registries.append(collector)
+
+    # Хранилище - объект с identity, а не значение: Mapping сравнивал бы содержимое и не давал хешировать
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+
+    def __getitem__(self, user_id: int) -> Any:
+        session = self._hot.get(user_id)
+        if session is None:
+            data = None if self._known_absent(user_id) else self.backend.load(self.namespace, user_id)
+            if data is None:
+                raise KeyError(user_id)
+            return self._admit(user_id, data)
+        self._touch(user_id)
+        return session
+
+    def __setitem__(self, user_id: int, session: Any):
+        self._hot[user_id] = session
+        self._deleted.discard(user_id)
+        self._absent.discard(user_id)
+        self.save(user_id)
+
+    def __delitem__(self, user_id: int):
+        if user_id in self._hot:
+            self._forget(user_id)
+        elif self._known_absent(user_id) or not self.backend.exists(self.namespace, user_id):
+            raise KeyError(user_id)
+        self._dirty.discard(user_id)
+        self._deleted.add(user_id)
+        self._schedule()
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._hot)
+
+    def __len__(self) -> int:
+        return len(self._hot)
+
+    def __contains__(self, user_id) -> bool:
+        if user_id in self._hot:
+            return True
+        if self._known_absent(user_id):
+            return False
+        return self.backend.exists(self.namespace, user_id)
+
+    def _known_absent(self, user_id: int) -> bool:
+        return user_id in self._deleted or user_id in self._absent
+
+    def _mark_absent(self, user_ids: Iterable[int]):
+        if len(self._absent) >= 10 * self.max_entries:
+            # Только кэш промахов: сброс стоит лишь лишнего чтения с диска
+            self._absent.clear()
+        self._absent.update(user_id for user_id in user_ids if user_id not in self._hot)
+
+    def _touch(self, user_id: int):
+        self._hot.move_to_end(user_id)
+        self._seen[user_id] = time.monotonic()
+
+    def _forget(self, user_id: int) -> Any:
+        session = self._hot.pop(user_id)
+        self._seen.pop(user_id, None)
+        self.resident_bytes -= self._sizes.pop(user_id, 0)
+        return session
+
+    async def ensure(self, user_id: int) -> Optional[Any]:
+        """Сессия пользователя, при необходимости поднятая из backend"""
+        session = self._hot.get(user_id)
+        if session is not None:
+            self._touch(user_id)
+            return session
+        if self._known_absent(user_id):
+            return None
+        data = await asyncio.to_thread(self.backend.load, self.namespace, user_id)
+        # Пока читали, сессию могли создать заново - она новее записанной
+        if data is None or user_id in self._hot or user_id in self._deleted:
+            if data is None:
+                self._mark_absent((user_id,))
+            return self._hot.get(user_id)
+        return self._admit(user_id, data)
+
+    def _admit(self, user_id: int, data: str) -> Any:
+        """Кладет в память сессию, прочитанную из backend"""
+        session = json.loads(data)
+        if self.restore is not None:
+            session = self.restore(session)
+        self._hot[user_id] = session
+        self._touch(user_id)
+        self._resize(user_id, data)
+        self.rehydrated += 1
+        logger.info("♻️ Сессия %s поднята из хранилища", user_id, extra={"user_id": user_id})
+        return session
+
+    def save(self, user_id: int):
+        """Помечает сессию измененной; на диск она попадет со следующей пачкой"""
+        if user_id in self._hot:
+            self._touch(user_id)
+            self._dirty.add(user_id)
+            self._schedule()
+
+    @contextmanager
+    def pinned(self, user_id: int):
+        """Сессия не выгружается из памяти, пока хендлер с ней работает"""
+        self._pins[user_id] += 1
+        try:
+            yield
+        finally:
+            self._pins[user_id] -= 1
+            if not self._pins[user_id]:
+                del self._pins[user_id]
+
+    def _schedule(self):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Вне event loop (скрипты, отладка) фоновой задачи нет - допишет close()
+            return
+        if self._writer is None or self._writer.done():
+            self._wakeup = asyncio.Event()
+            self._writer = asyncio.ensure_future(self._run())
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                # asyncio.timeout, а не wait_for: в 3.11 wait_for теряет отмену, если событие
+                # уже взведено, и задача записи переживала close() и остановку loop
+                async with asyncio.timeout(self.sweep_interval):
+                    await self._wakeup.wait()
+                self._wakeup.clear()
+                # Изменения за интервал копятся и пишутся одной транзакцией
+                await asyncio.sleep(self.flush_interval)
+            except TimeoutError:
+                pass
+            await self.flush()
+            self._evict()
+
+    def _snapshot(self, session) -> str:
+        if self.encode is not None:
+            data = self.encode(session)
+        else:
+            data = {key: value for key, value in session.items() if key not in self.transient}
+        return json.dumps(data, ensure_ascii=False, default=_encode)
+
+    def _resize(self, user_id: int, data: str):
+        size = len(data.encode("utf-8"))
+        self.resident_bytes += size - self._sizes.get(user_id, 0)
+        self._sizes[user_id] = size
+
+    async def flush(self):
+        # Сериализуем в loop: хендлеры меняют сессии только здесь, снимок согласован
+        dirty, self._dirty = self._dirty, set()
+        deleted, self._deleted = self._deleted, set()
+        items = [(user_id, self._snapshot(self._hot[user_id])) for user_id in dirty if user_id in self._hot]
+        try:
+            if items:
+                await asyncio.to_thread(self.backend.save_many, self.namespace, items)
+                self.written += len(items)
+            if deleted:
+                await asyncio.to_thread(self.backend.delete_many, self.namespace, deleted)
+        except sqlite3.Error as e:
+            # Вернем в очередь: следующая пачка попробует еще раз
+            self._dirty |= dirty
+            self._deleted |= deleted
+            logger.error("❌ Не удалось сохранить сессии: %s", e)
+            return
+        for user_id, data in items:
+            if user_id in self._hot:
+                self._resize(user_id, data)
+        # Удаленных больше нет и на диске
+        self._mark_absent(deleted)
+
+    def _evict(self):
+        """Выгружает сохраненные сессии по простою, spill и LRU; несохраненные и закрепленные ждут"""
+        now = time.monotonic()
+        shortest_ttl = min(self.idle_ttl, self.spill_ttl) if self.spill is not None else self.idle_ttl
+        for user_id in list(self._hot):
+            over_limit = len(self._hot) > self.max_entries or self.resident_bytes > self.max_bytes
+            idle = now - self._seen.get(user_id, now)
+            if idle < shortest_ttl and not over_limit:
+                # Дальше по LRU только более свежие сессии
+                break
+            if user_id in self._dirty or user_id in self._pins:
+                continue
+            if idle >= self.idle_ttl:
+                reason = "idle"
+            elif self.spill is not None and idle >= self.spill_ttl and self.spill(self._hot[user_id]):
+                reason = "spill"
+            elif over_limit:
+                reason = "lru"
+            else:
+                continue
+            session = self._forget(user_id)
+            self.evictions[reason] += 1
+            if self.on_evict is not None:
+                self.on_evict(session)
+
+    def stats(self) -> Dict:
+        return {
+            "hot": len(self._hot),
+            "dirty": len(self._dirty),
+            "written": self.written,
+            "rehydrated": self.rehydrated,
+            "resident_bytes": self.resident_bytes,
+            "evictions": dict(self.evictions)
+        }
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        await self.flush()
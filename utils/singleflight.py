@@ -0,0 +1,60 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    __slots__ = ("future", "waiters")
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Объединяет одновременные одинаковые вызовы: пока вызов с ключом key
+    в полете, остальные вызывающие ждут его результат, а не делают свой.
+
+    Отмена одного ожидающего не трогает общий вызов, но когда уходит последний,
+    вызов отменяется: результат больше никому не нужен, а слот планировщика
+    и дедлайны вызывающих должны освобождаться сразу.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._inflight.get(key)
+        if call is None:
+            self.calls += 1
+            call = _Call(asyncio.ensure_future(fn()))
+            self._inflight[key] = call
+            call.future.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            # shield: отмена одного ожидающего не должна отменять общий вызов
+            return await asyncio.shield(call.future)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.future.done():
+                self.abandoned += 1
+                self._forget(key, call)
+                call.future.cancel()
+
+    def _forget(self, key: Hashable, call: _Call):
+        # Под тем же ключом уже может лететь новый вызов - его не трогаем
+        if self._inflight.get(key) is call:
+            del self._inflight[key]
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned
+        }
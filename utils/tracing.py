@@ -0,0 +1,201 @@
+import time
+import bisect
+import contextvars
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+
+# Границы бакетов в секундах: от быстрых отправок в Telegram до медленных отчетов
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60)
+LABELS = ("agent", "question_type", "role")
+
+_tags: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar("trace_tags", default={})
+_depth: contextvars.ContextVar[int] = contextvars.ContextVar("trace_depth", default=0)
+_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("trace", default=None)
+_stage: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_stage", default=None)
+
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float, buckets: Tuple[float, ...]):
+        index = bisect.bisect_left(buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Гистограммы длительности этапов в текстовом формате Prometheus.
+
+    Пустой stage - серия без меток (для гистограмм, у которых этапов нет).
+    """
+
+    def __init__(self, name: str = "hrbot_stage_seconds", buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+                 description: str = "Длительность этапов обработки ответа кандидата"):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, Tuple[str, ...]], _Histogram] = {}
+
+    def observe(self, stage: str, seconds: float, tags: Dict[str, str]):
+        key = (stage, tuple(str(tags.get(label, "")) for label in LABELS))
+        histogram = self._series.get(key)
+        if histogram is None:
+            histogram = self._series[key] = _Histogram(self.buckets)
+        histogram.observe(seconds, self.buckets)
+
+    def summary(self) -> Dict[str, Dict]:
+        """Число и суммарная длительность по этапам без разбивки по тегам"""
+        result: Dict[str, Dict] = {}
+        for (stage, _), histogram in self._series.items():
+            entry = result.setdefault(stage, {"count": 0, "sum_s": 0.0})
+            entry["count"] += histogram.count
+            entry["sum_s"] += histogram.sum
+        for entry in result.values():
+            entry["mean_s"] = entry["sum_s"] / entry["count"] if entry["count"] else 0.0
+        return result
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for (stage, values), histogram in sorted(self._series.items()):
+            labels = [f'stage="{stage}"'] if stage else []
+            labels += [f'{label}="{value}"' for label, value in zip(LABELS, values) if value]
+            prefix = ",".join(labels + [""])
+            suffix = "{" + ",".join(labels) + "}" if labels else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound:g}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {histogram.count}')
+            lines.append(f"{self.name}_sum{suffix} {histogram.sum:.6f}")
+            lines.append(f"{self.name}_count{suffix} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+class Collector:
+    """Gauge или counter, значения которого снимаются при каждом запросе /metrics.
+
+    collect() возвращает список (метки, значение).
+    """
+
+    def __init__(self, name: str, description: str, collect: Callable[[], List[Tuple[Dict[str, str], float]]],
+                 kind: str = "gauge"):
+        self.name = name
+        self.description = description
+        self.collect = collect
+        self.kind = kind
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for labels, value in self.collect():
+            suffix = "{" + ",".join(f'{key}="{val}"' for key, val in labels.items()) + "}" if labels else ""
+            lines.append(f"{self.name}{suffix} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+# Все гистограммы и коллекторы, которые отдает /metrics
+registries: List = [metrics]
+
+
+class Trace:
+    """Водопад одного интервью: все спаны с отметками относительно начала"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self.spans: List[Tuple[str, float, float, int, Dict[str, str]]] = []
+
+    def add(self, stage: str, started: float, duration: float, depth: int, tags: Dict[str, str]):
+        self.spans.append((stage, started - self._origin, duration, depth, tags))
+
+    def duration(self) -> float:
+        return max((offset + duration for _, offset, duration, _, _ in self.spans), default=0.0)
+
+    def waterfall(self, width: int = 40) -> str:
+        """Текстовый водопад: отступ - вложенность, полоса - положение спана во времени"""
+        total = self.duration() or 1.0
+        lines = [f"{self.name}: {self.duration():.2f} с, {len(self.spans)} спанов"]
+        for stage, offset, duration, depth, tags in sorted(self.spans, key=lambda s: (s[1], s[3])):
+            start = int(offset / total * width)
+            length = max(1, int(duration / total * width))
+            bar = " " * start + "█" * min(length, width - start)
+            tag = tags.get("agent", "")
+            label = ("  " * depth + stage + (f"[{tag}]" if tag else ""))[:32]
+            lines.append(f"{label:<32} {offset:7.2f} {duration:6.2f} |{bar:<{width}}|")
+        return "\n".join(lines)
+
+
+@contextmanager
+def span(stage: str, **tags):
+    """Замеряет этап; теги наследуются вложенными спанами (в том числе в дочерних задачах)"""
+    merged = dict(_tags.get())
+    merged.update({key: str(value) for key, value in tags.items() if value is not None})
+    tags_token = _tags.set(merged)
+    depth = _depth.get()
+    depth_token = _depth.set(depth + 1)
+    stage_token = _stage.set(stage)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        _stage.reset(stage_token)
+        _depth.reset(depth_token)
+        _tags.reset(tags_token)
+        metrics.observe(stage, duration, merged)
+        trace = _trace.get()
+        if trace is not None:
+            trace.add(stage, started, duration, depth, merged)
+
+
+def current_stage() -> Optional[str]:
+    """Имя самого внутреннего открытого спана"""
+    return _stage.get()
+
+
+def current_tags() -> Dict[str, str]:
+    return dict(_tags.get())
+
+
+@contextmanager
+def trace_scope(trace: Optional[Trace]):
+    """Спаны внутри блока попадают в водопад trace"""
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+
+
+async def start_metrics_server(port: int, host: str = "127.0.0.1") -> "web.AppRunner":
+    """Поднимает /metrics для Prometheus; остановка - await runner.cleanup()"""
+    from aiohttp import web
+
+    async def handle(request):
+        text = "".join(registry.render() for registry in registries)
+        return web.Response(body=text.encode("utf-8"),
+                            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner